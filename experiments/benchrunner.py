@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+
+"""Calibrates librunner's own overhead. Runs the full create/run/destroy
+lifecycle of many observations against cheap local stand-ins (a loop mounted
+raw backend in a scratch directory and a no-op experiment binary) and reports
+how long each traced phase takes, plus what every observation costs before a
+single byte of real I/O is measured. Reports can be saved as a baseline so
+later runner changes can be checked for regressions"""
+
+import os
+import sys
+import json
+import shutil
+import argparse
+import tempfile
+
+import initrunner
+from librunner import Librunner
+from librunner.trace import readTrace, phaseSpans, percentile
+from librunner.util import Configuration
+
+# ? Bump this whenever the phases or what they cover change; baselines from
+# ? another version are not comparable
+BENCHMARK_VERSION = 1
+
+# ? The bench wraps every observation (acquire, experiment, release) in this phase
+OBSERVATION_PHASE = 'observation'
+
+DATA_CLASS = '4k'
+DATA_CLASS_BYTES = 4096
+NOOP_EXECUTABLE = 'true'
+
+# ? Phases slower than their baseline median by more than this fraction (and
+# ? by at least REGRESSION_FLOOR_MS, which is noise) are regressions
+DEFAULT_TOLERANCE = 0.2
+REGRESSION_FLOOR_MS = 1
+
+def makeSandbox(scratch):
+    """Creates a throwaway REPO_PATH (holding the no-op experiment binaries and
+       a tiny data class), RAM0_PATH, and TMP_ROOT_PATH under scratch and
+       returns its root directory
+    """
+
+    root = tempfile.mkdtemp(prefix='benchrunner-', dir=scratch)
+    noop = shutil.which(NOOP_EXECUTABLE)
+
+    if not noop:
+        raise FileNotFoundError('could not find the {} executable'.format(NOOP_EXECUTABLE))
+
+    for directory in ('ram0', 'repo/bin', 'repo/data', 'repo/results'):
+        os.makedirs('{}/{}'.format(root, directory))
+
+    for binary in ('sequential-freerun', 'random-freerun'):
+        os.symlink(noop, '{}/repo/bin/{}'.format(root, binary))
+
+    with open('{}/repo/data/data{}.random'.format(root, DATA_CLASS), 'wb') as file:
+        file.write(os.urandom(DATA_CLASS_BYTES))
+
+    return root
+
+def makeConfig(config, root, args):
+    """Points a parsed config/vars.mk at the sandbox in root"""
+
+    config = dict(config)
+
+    config.update({
+        'REPO_PATH': '{}/repo'.format(root),
+        'RAM0_PATH': '{}/ram0'.format(root),
+        'TMP_ROOT_PATH': root,
+        'LOG_FILE_PATH': '{}/runner.log'.format(root),
+        'traceFilePath': '{}/runner.trace.jsonl'.format(root),
+        'verbose': False,
+        'commandBackend': args.command_backend,
+        'backendPolicy': args.policy,
+        'templateImages': not args.no_templates
+    })
+
+    if args.size:
+        config['BACKEND_SIZE_INT'] = args.size
+
+    return config
+
+def runObservations(lib, count, fsType, experiment):
+    """Runs count observations of a no-op experiment, each on a backend readied
+       by lib.acquireBackend
+    """
+
+    backendFn = (lib.createRawBackend, lib.destroyRawBackend, 'raw-vanilla')
+    conf = Configuration('calibration', fsType, [], [])
+
+    for device in lib.deviceList:
+        os.makedirs('{}/nbd{}'.format(lib.config['TMP_ROOT_PATH'], device), exist_ok=True)
+
+    try:
+        for i in range(count):
+            lib.print('=> observation {}/{}'.format(i + 1, count))
+
+            with lib.tracePhase(OBSERVATION_PHASE):
+                lib.acquireBackend(backendFn, conf)
+                observed = False
+
+                try:
+                    getattr(lib, experiment)(DATA_CLASS, 'calibration')
+                    observed = True
+
+                finally:
+                    lib.releaseBackend(backendFn, healthy=observed)
+
+    finally:
+        lib.retireBackend()
+
+def summarize(tracePath, skip=0):
+    """Returns the latency statistics (in milliseconds) of every phase in a
+       trace that finished successfully, leaving out the first skip
+       observations (warmup)
+    """
+
+    seconds = {}
+    observations = 0
+
+    for span in phaseSpans(readTrace(tracePath)):
+        if span.phase == OBSERVATION_PHASE:
+            observations += 1
+
+            if observations <= skip:
+                seconds = {}
+                continue
+
+        if span.ok:
+            seconds.setdefault(span.phase, []).append(span.seconds)
+
+    return {
+        phase: {
+            'count': len(values),
+            'p50': percentile(values, 0.5) * 1000,
+            'p95': percentile(values, 0.95) * 1000,
+            'max': values[-1] * 1000,
+            'total': sum(values) * 1000
+        } for phase, values in ((phase, sorted(values)) for phase, values in seconds.items())
+    }
+
+def printReport(stats):
+    observation = stats.get(OBSERVATION_PHASE)
+
+    if not observation:
+        sys.exit('no observation finished successfully')
+
+    width = max(len(phase) for phase in stats)
+
+    print('{:<{}}  {:>6}  {:>10}  {:>10}  {:>10}  {:>14}'.format(
+        'phase', width, 'count', 'p50 (ms)', 'p95 (ms)', 'max (ms)', 'per obs. (ms)'
+    ))
+
+    for phase, stat in sorted(stats.items(), key=lambda item: item[1]['total'], reverse=True):
+        print('{:<{}}  {:>6}  {:>10.3f}  {:>10.3f}  {:>10.3f}  {:>14.3f}'.format(
+            phase,
+            width,
+            stat['count'],
+            stat['p50'],
+            stat['p95'],
+            stat['max'],
+            stat['total'] / observation['count']
+        ))
+
+    print()
+    print('(phases nest, e.g. create.raw includes command.mkfs, so they overlap)')
+    print('overhead per observation: p50 {:.3f}ms, p95 {:.3f}ms, max {:.3f}ms'.format(
+        observation['p50'],
+        observation['p95'],
+        observation['max']
+    ))
+
+def compareToBaseline(stats, baseline, tolerance):
+    """Returns a line for every phase whose median regressed compared to the
+       baseline
+    """
+
+    regressions = []
+
+    for phase, stat in sorted(stats.items()):
+        before = baseline['phases'].get(phase)
+
+        if not before:
+            continue
+
+        if stat['p50'] > before['p50'] * (1 + tolerance) and stat['p50'] - before['p50'] >= REGRESSION_FLOOR_MS:
+            regressions.append('{}: p50 {:.3f}ms -> {:.3f}ms (+{:.0f}%)'.format(
+                phase,
+                before['p50'],
+                stat['p50'],
+                (stat['p50'] / before['p50'] - 1) * 100 if before['p50'] else float('inf')
+            ))
+
+    return regressions
+
+################################################################################
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='measure librunner overhead per observation using no-op experiments')
+
+    parser.add_argument('-n', '--observations', type=int, default=20, metavar='n', help='how many observations to run (default: 20)')
+    parser.add_argument('-w', '--warmup', type=int, default=1, metavar='n', help='leave out the first n observations (default: 1)')
+    parser.add_argument('-f', '--filesystem', default='ext4', help='the raw backend file system (default: ext4)')
+    parser.add_argument('-z', '--size', type=int, metavar='MiB', help='backend size (default: BACKEND_SIZE_INT)')
+
+    parser.add_argument(
+        '-e',
+        '--experiment',
+        default='sequentialFreerun',
+        choices=['sequentialFreerun', 'randomFreerun'],
+        help='the Librunner experiment to run (its binary is replaced with a no-op)'
+    )
+
+    parser.add_argument('-p', '--policy', default='fresh', choices=['fresh', 'warm'], help='the backend policy (default: fresh)')
+    parser.add_argument('-b', '--command-backend', default='spawn', choices=['spawn', 'syscall'], help='how mount/umount run')
+    parser.add_argument('--no-templates', action='store_true', help='run mkfs every time instead of cloning template images')
+
+    parser.add_argument(
+        '-d',
+        '--scratch',
+        default='/dev/shm' if os.path.isdir('/dev/shm') else None,
+        metavar='dir',
+        help='where the sandbox goes (default: /dev/shm, a tmpfs like RAM0_PATH)'
+    )
+
+    parser.add_argument('-s', '--save', metavar='file', help='save the results as a baseline')
+    parser.add_argument('-c', '--compare', metavar='file', help='compare the results to a saved baseline')
+
+    parser.add_argument(
+        '-t',
+        '--tolerance',
+        type=float,
+        default=DEFAULT_TOLERANCE,
+        help='how much slower (as a fraction) a phase may get before it counts as a regression (default: {})'.format(DEFAULT_TOLERANCE)
+    )
+
+    parser.add_argument('-k', '--keep', action='store_true', help='keep the sandbox (log and trace files) around')
+
+    args = parser.parse_args(sys.argv[1:])
+
+    try:
+        os.geteuid
+    except AttributeError:
+        os.geteuid = lambda: -1
+
+    if os.geteuid() != 0:
+        sys.exit('must be root/sudo')
+
+    baseline = None
+
+    if args.compare:
+        with open(args.compare, 'r') as file:
+            baseline = json.load(file)
+
+        if baseline.get('version') != BENCHMARK_VERSION:
+            sys.exit('baseline {} is from another benchmark version ({})'.format(args.compare, baseline.get('version')))
+
+    root = makeSandbox(args.scratch)
+    config = makeConfig(initrunner.parseConfigVars(), root, args)
+    lib = Librunner(config)
+
+    print('running {} observation(s) in {}'.format(args.observations, root))
+
+    try:
+        with open(config['LOG_FILE_PATH'], 'w') as file:
+            lib.logFile = file
+
+            try:
+                runObservations(lib, args.observations, args.filesystem, args.experiment)
+
+            finally:
+                lib.logFile = None
+                lib.tracer.close()
+
+        stats = summarize(config['traceFilePath'], args.warmup)
+
+    finally:
+        if args.keep:
+            print('sandbox kept at {}'.format(root))
+
+        else:
+            shutil.rmtree(root, ignore_errors=True)
+
+    printReport(stats)
+
+    settings = {
+        'observations': args.observations,
+        'warmup': args.warmup,
+        'filesystem': args.filesystem,
+        'size': config['BACKEND_SIZE_INT'],
+        'experiment': args.experiment,
+        'policy': args.policy,
+        'commandBackend': args.command_backend,
+        'templates': not args.no_templates
+    }
+
+    if args.save:
+        with open(args.save, 'w') as file:
+            json.dump({
+                'version': BENCHMARK_VERSION,
+                'settings': settings,
+                'phases': stats
+            }, file, indent=4)
+
+        print('baseline saved to {}'.format(args.save))
+
+    if baseline:
+        if baseline.get('settings') != settings:
+            print('(careful: the baseline was made with other settings: {})'.format(baseline.get('settings')))
+
+        regressions = compareToBaseline(stats, baseline, args.tolerance)
+
+        if regressions:
+            print('\n'.join(['', 'REGRESSIONS (compared to {}):'.format(args.compare)] + regressions))
+            sys.exit(1)
+
+        print('no regressions compared to {}'.format(args.compare))
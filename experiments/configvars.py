@@ -0,0 +1,112 @@
+"""Loads config/vars.mk (see vars.mk-dist) into a validated ConfigVars object.
+Importing this module has no side effects and pulls in nothing beyond the
+standard library, so plotters and other tools can read the config without
+paying for librunner or pexpect"""
+
+import os
+import re
+
+CONFIG_PATH = "{}/../config/vars.mk".format(os.path.dirname(os.path.realpath(__file__)))
+CONFIG_KEY = "CONFIG_COMPILE_FLAGS"
+
+# ? Every key the runners index directly; values of keys ending in _INT must be
+# ? integers (the C experiments are compiled with the same definitions)
+REQUIRED_KEYS = (
+    'REPO_PATH',
+    'BUSE_PATH',
+    'BUSELFS_PATH',
+    'LOG_FILE_PATH',
+    'DROP_CACHE_PATH',
+    'RAM0_PATH',
+    'TMP_ROOT_PATH',
+    'RAMDISK_SIZE',
+    'BACKEND_SIZE_INT',
+    'EXPAND_TABS_INT',
+    'FREERUN_TIMEOUT_INT',
+    'TRIALS_INT',
+)
+
+# ? One -DNAME=value definition; values may be quoted
+_DEFINITION = re.compile(r'-D(\w+)=("[^"]*"|\'[^\']*\'|[^\s\\]*)')
+
+# ? Parsed configs keyed by path, along with the (mtime, size) they were parsed at
+_cache = {}
+
+class ConfigError(RuntimeError):
+    def __init__(self, message):
+        self.message = message
+        super().__init__(message)
+
+class ConfigVars(dict):
+    """The definitions in vars.mk as a dict (so config['RAM0_PATH'] and
+       librunner's optional camelCase keys keep working) that also allows
+       attribute access (config.RAM0_PATH)
+    """
+
+    def __getattr__(self, name):
+        try:
+            return self[name]
+
+        except KeyError:
+            raise AttributeError('config has no {} key'.format(name))
+
+def parseDefinitions(text, path=CONFIG_PATH):
+    """Returns the (name, value) pairs of the CONFIG_KEY block in the text of a
+       vars.mk file, with _INT values converted to integers
+    """
+
+    definitions = []
+    inConfigVar = False
+
+    for lineNumber, line in enumerate(text.split('\n'), 1):
+        if line.startswith(CONFIG_KEY):
+            inConfigVar = True
+            continue
+
+        if not inConfigVar:
+            continue
+
+        line = line.rstrip()
+        inConfigVar = line.endswith('\\')
+
+        for name, value in _DEFINITION.findall(line):
+            value = value.strip('"\' ')
+
+            if name.endswith('_INT'):
+                try:
+                    value = int(value)
+
+                except ValueError:
+                    raise ConfigError('{}:{}: {} must be an integer, got "{}"'.format(path, lineNumber, name, value))
+
+            definitions.append((name, value))
+
+    return definitions
+
+def parseConfigVars(path=CONFIG_PATH):
+    """Parses and validates the vars.mk file at path, returning a ConfigVars.
+       Parsed files are cached until their mtime or size changes; every call
+       returns a fresh copy, so callers may modify it
+    """
+
+    try:
+        stat = os.stat(path)
+
+    except FileNotFoundError:
+        raise FileNotFoundError('{} not found'.format(path))
+
+    key = (stat.st_mtime_ns, stat.st_size)
+    cached = _cache.get(path)
+
+    if not cached or cached[0] != key:
+        with open(path, 'r') as varsFile:
+            definitions = parseDefinitions(varsFile.read(), path)
+
+        missing = [name for name in REQUIRED_KEYS if name not in dict(definitions)]
+
+        if missing:
+            raise ConfigError('{} is missing required key(s): {}'.format(path, ', '.join(missing)))
+
+        cached = _cache[path] = (key, tuple(definitions))
+
+    return ConfigVars(cached[1])
@@ -0,0 +1,167 @@
+"""Runs initialization steps as a dependency graph: every step whose
+dependencies have finished is started right away on a thread pool, steps whose
+postcondition already holds are skipped, and each step is timed. Like
+configvars, this only imports the standard library"""
+
+import time
+
+from collections import namedtuple
+
+# ? Steps don't do much more than wait on the kernel or on subprocesses
+DEFAULT_WORKERS = 8
+
+# ? done: the action ran; skipped: the postcondition already held; failed: the
+# ? action raised; blocked: a dependency failed; cancelled: a fatal step failed
+# ? before this one was started
+STEP_STATUSES = ('done', 'skipped', 'failed', 'blocked', 'cancelled')
+
+# ? action() does the work, raising on failure; done() (optional) returns True
+# ? when there's nothing left to do; a failed step with an exitCode is fatal
+# ? (nothing else is started), one without is only a warning
+InitStep = namedtuple('InitStep', ['name', 'action', 'done', 'after', 'exitCode'], defaults=[None, (), None])
+StepResult = namedtuple('StepResult', ['name', 'status', 'seconds', 'message', 'exitCode'])
+
+class InitGraphError(RuntimeError):
+    def __init__(self, message):
+        self.message = message
+        super().__init__(message)
+
+class InitStepError(RuntimeError):
+    """Raised by step actions; exitCode, if given, overrides the step's own"""
+
+    def __init__(self, message, exitCode=None):
+        self.message = message
+        self.exitCode = exitCode
+        super().__init__(message)
+
+def checkGraph(steps):
+    """Raises an InitGraphError if step names repeat, a step depends on a step
+       that doesn't exist, or the dependencies form a cycle
+    """
+
+    names = [step.name for step in steps]
+    byName = {step.name: step for step in steps}
+
+    if len(byName) != len(names):
+        raise InitGraphError('step names must be unique: {}'.format(', '.join(names)))
+
+    for step in steps:
+        unknown = [name for name in step.after if name not in byName]
+
+        if unknown:
+            raise InitGraphError('step {} depends on unknown step(s): {}'.format(step.name, ', '.join(unknown)))
+
+    remaining = set(names)
+
+    while remaining:
+        ready = {name for name in remaining if not remaining.intersection(byName[name].after)}
+
+        if not ready:
+            raise InitGraphError('steps have cyclic dependencies: {}'.format(', '.join(sorted(remaining))))
+
+        remaining -= ready
+
+def runStep(step, force=False):
+    """Runs a single step (unless its postcondition already holds and force is
+       False) and returns its StepResult
+    """
+
+    start = time.perf_counter()
+
+    try:
+        if not force and step.done and step.done():
+            return StepResult(step.name, 'skipped', time.perf_counter() - start, None, None)
+
+        message = step.action()
+        return StepResult(step.name, 'done', time.perf_counter() - start, message, None)
+
+    except Exception as e: # pylint: disable=broad-except
+        exitCode = getattr(e, 'exitCode', None)
+
+        return StepResult(
+            step.name,
+            'failed',
+            time.perf_counter() - start,
+            getattr(e, 'message', None) or str(e) or type(e).__name__,
+            step.exitCode if exitCode is None else exitCode
+        )
+
+def runGraph(steps, force=False, workers=DEFAULT_WORKERS, onResult=None):
+    """Runs steps (InitStep objects) as soon as everything they come after has
+       finished, at most workers at a time, and returns their StepResults in
+       the order given. onResult(result) is called as each step finishes.
+       After a fatal failure, running steps are waited for but nothing new is
+       started
+    """
+
+    # ? Imported here so that importing initrunner (e.g. just for its config
+    # ? parsing) stays cheap
+    from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+    checkGraph(steps)
+
+    results = {}
+    pending = list(steps)
+    running = {}
+    fatal = False
+
+    def record(result):
+        results[result.name] = result
+
+        if onResult:
+            onResult(result)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        while pending or running:
+            for step in list(pending):
+                if fatal:
+                    record(StepResult(step.name, 'cancelled', 0, None, None))
+
+                elif any(results.get(name) and results[name].status in ('failed', 'blocked') for name in step.after):
+                    record(StepResult(step.name, 'blocked', 0, None, None))
+
+                elif all(name in results for name in step.after):
+                    running[executor.submit(runStep, step, force)] = step
+
+                else:
+                    continue
+
+                pending.remove(step)
+
+            if not running:
+                continue
+
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+
+            for future in finished:
+                del running[future]
+                result = future.result()
+                record(result)
+
+                if result.status == 'failed' and result.exitCode is not None:
+                    fatal = True
+
+    return [results[step.name] for step in steps]
+
+def formatResults(results, wallSeconds=None):
+    """Returns a table of the step results (and the total wall time, if given)"""
+
+    width = max([len('step')] + [len(result.name) for result in results])
+    lines = ['{:<{}}  {:<9}  {:>10}'.format('step', width, 'status', 'time (ms)')]
+
+    for result in results:
+        lines.append('{:<{}}  {:<9}  {:>10.1f}{}'.format(
+            result.name,
+            width,
+            result.status,
+            result.seconds * 1000,
+            '  ({})'.format(result.message) if result.status == 'failed' else ''
+        ))
+
+    if wallSeconds is not None:
+        lines.append('total: {:.1f}ms wall, {:.1f}ms summed over steps'.format(
+            wallSeconds * 1000,
+            sum(result.seconds for result in results) * 1000
+        ))
+
+    return '\n'.join(lines)
@@ -9,9 +9,15 @@ script is responsible for ensuring the system is ready to run experiments"""
 import os
 import sys
 import json
-import pexpect
+import time
+import shutil
+import filecmp
 import argparse
 
+# ? Re-exported: the testrunners read their config through initrunner
+from configvars import CONFIG_PATH, parseConfigVars # pylint: disable=unused-import
+from initgraph import InitStep, InitStepError, runGraph, formatResults
+
 # ! All of these are dirs that will be prefixed with vars.mk['TMP_ROOT_PATH']/
 MODPROBE_DIRS = ['nbd0',
                  'nbd1',
@@ -34,202 +40,186 @@ MODPROBE_DIRS = ['nbd0',
 ] #*             vars.mk['RAM0_PATH']
   #*             '../config'
 
-# ? Config parameters
-CONFIG_PATH = "{}/../config/vars.mk".format(os.path.dirname(os.path.realpath(__file__)))
-CONFIG_KEY = "CONFIG_COMPILE_FLAGS"
-
 # ? Amount of time to wait before we consider a command as failed
 STANDARD_TIMEOUT=10
 
+KERNEL_MODULES = ('nbd', 'nilfs2', 'f2fs')
+PROC_MODULES_PATH = '/proc/modules'
+SYS_MODULE_PATH = '/sys/module/{}'
+ZLOG_CONFIG_FILE = '{}/config/zlog_conf.conf'
+
 ################################################################################
 
-def parseConfigLine(configLine):
-    """Parses a single configuration line and returns lhs and rhs values"""
+def checkMount(config, verbose=False):
+    """Ensure mount operation succeeded (returns 0 if the ramdisk is mounted and
+    1 if it isn't)"""
 
-    lhs_rhs = ''.join(configLine.split(' \\')[0].split('-D')[1:]).split('=')
-    rhs = ''.join(lhs_rhs[1:]).strip('"\' ')
-    lhs = lhs_rhs[0].strip(' ')
+    # ? Imported here so that importing initrunner (e.g. just for its config
+    # ? parsing) doesn't drag in all of librunner
+    from librunner.mounttable import isMounted
 
-    return (lhs, rhs)
+    mounted = isMounted(config['RAM0_PATH'])
 
-def parseConfigVars():
-    """Opens and parses config/vars.mk, returning a config object"""
+    if verbose:
+        print('{} is {}mounted'.format(config['RAM0_PATH'], '' if mounted else 'NOT '))
 
-    config = {}
+    return 0 if mounted else 1
 
-    try:
-        with open(CONFIG_PATH, 'r') as varsFile:
-            inConfigVar = False
+def cwdToRAMDir(config):
+    """Change the current working directory to the configured ramdisk path"""
 
-            for line in varsFile:
-                if line.startswith(CONFIG_KEY):
-                    inConfigVar = True
-                    continue
+    os.chdir(config['RAM0_PATH'])
 
-                if inConfigVar:
-                    line = line.strip('\n')
-                    if not line.endswith("\\"):
-                        inConfigVar = False
+def isModuleLoaded(name):
+    """Returns True if the kernel module is loaded (i.e. listed in /proc/modules)
+       or built into the kernel (those only show up under /sys/module)
+    """
 
-                    (varName, varValue) = parseConfigLine(line)
-                    config[varName] = int(varValue) if varName.endswith('_INT') else varValue
+    try:
+        with open(PROC_MODULES_PATH, 'r') as file:
+            if any(line.split(' ', 1)[0] == name for line in file):
+                return True
 
     except FileNotFoundError:
-        raise FileNotFoundError('{} not found'.format(CONFIG_PATH))
+        pass
 
-    return config
+    return os.path.isdir(SYS_MODULE_PATH.format(name))
 
-def checkMount(config, verbose=False):
-    """Ensure mount operation succeeded"""
+def isSameFile(source, destination):
+    """Returns True if destination exists and has the same contents as source"""
 
-    mount = pexpect.spawn('mount',
-                         echo=True if verbose else False,
-                         timeout=STANDARD_TIMEOUT,
-                         encoding='utf-8')
+    return os.path.isfile(destination) and filecmp.cmp(source, destination, shallow=False)
 
-    expecting = mount.expect([r'on {}'.format(config['RAM0_PATH']), pexpect.EOF])
-    mount.close()
+def runCommand(args):
+    """Runs a command, giving up after STANDARD_TIMEOUT seconds, and returns
+       its output. Raises an InitStepError if it exits non-zero
+    """
 
-    return expecting
+    # ? Imported here for the same reason as in checkMount
+    import subprocess
 
-def cwdToRAMDir(config):
-    """Change the current working directory to the configured ramdisk path"""
+    try:
+        proc = subprocess.run(args, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, timeout=STANDARD_TIMEOUT)
 
-    os.chdir(config['RAM0_PATH'])
+    except subprocess.TimeoutExpired:
+        raise InitStepError('{} timed out after {} seconds'.format(args[0], STANDARD_TIMEOUT))
 
-def initialize(config, verbose=False, force=False):
-    """Idempotent initialization of the experimental testbed."""
-
-    # 1 => not found
-    if force or checkMount(config, verbose) == 1:
-        print('(mounted ramdisk not found or re-initialization forced; executing primary initialization...)')
-
-        for mod in ('nbd', 'nilfs2', 'f2fs'):
-            modprobe = pexpect.spawn('modprobe', [mod], timeout=STANDARD_TIMEOUT, encoding='utf-8')
-
-            modprobe.logfile = sys.stdout if verbose else None
-            modprobe.expect(pexpect.EOF)
-            modprobe.close()
-
-            if modprobe.exitstatus != 0:
-                print('WARN: modprobe {} returned non-zero error code ({})'.format(mod, modprobe.exitstatus))
-
-                # if verbose:
-                #     print('(the above error was ignored because verbose=True)')
-
-                # else:
-                #     sys.exit(2)
-
-        # rmmod_brd = pexpect.spawn('rmmod', ['brd'], timeout=STANDARD_TIMEOUT, encoding='utf-8')
-
-        # rmmod_brd.logfile = sys.stdout if verbose else None
-        # rmmod_brd.expect(pexpect.EOF)
-        # rmmod_brd.close()
-
-        # if rmmod_brd.exitstatus != 0:
-        #     print('WARN: rmmod brd returned non-zero error code ({})'.format(rmmod_brd.exitstatus))
-
-        # modprobe_brd = pexpect.spawn(
-        #     'modprobe',
-        #     ['brd', 'rd_nr=1', 'rd_size={}'.format(config['RAMDEVICE_SIZE_KILOBYTES']), 'max_part=1'],
-        #     timeout=STANDARD_TIMEOUT,
-        #     encoding='utf-8'
-        # )
-
-        # modprobe_brd.logfile = sys.stdout if verbose else None
-        # modprobe_brd.expect(pexpect.EOF)
-        # modprobe_brd.close()
-
-        # if modprobe_brd.exitstatus != 0:
-        #     print('FATAL: modprobe brd returned non-zero error code ({})'.format(modprobe_brd.exitstatus))
-        #     sys.exit(2)
-
-        mkdir = pexpect.spawn('mkdir',
-            ['-p']
-                + ['{}/{}'.format(config['TMP_ROOT_PATH'], dirr) for dirr in MODPROBE_DIRS]
-                + [config['RAM0_PATH'], '../config'],
-            timeout=STANDARD_TIMEOUT,
-            encoding='utf-8'
-        )
-
-        mkdir.logfile = sys.stdout if verbose else None
-        mkdir.expect(pexpect.EOF)
-        mkdir.close()
-
-        if mkdir.exitstatus != 0:
-            print('FATAL: mkdir returned non-zero error code ({})'.format(mkdir.exitstatus))
-            sys.exit(3)
-
-        cp = pexpect.spawn('cp',
-            ['{}/config/zlog_conf.conf'.format(config['BUSELFS_PATH']), '{}/config/'.format(config['TMP_ROOT_PATH'])],
-            timeout=STANDARD_TIMEOUT,
-            encoding='utf-8'
-        )
-
-        cp.logfile = sys.stdout if verbose else None
-        cp.expect(pexpect.EOF)
-        cp.close()
-
-        if cp.exitstatus != 0:
-            print('FATAL: cp returned non-zero error code ({})'.format(cp.exitstatus))
-            sys.exit(4)
-
-        cp2 = pexpect.spawn('cp',
-            ['{}/config/zlog_conf.conf'.format(config['BUSELFS_PATH']), '../config/'],
-            timeout=STANDARD_TIMEOUT,
-            encoding='utf-8'
-        )
-
-        cp2.logfile = sys.stdout if verbose else None
-        cp2.expect(pexpect.EOF)
-        cp2.close()
-
-        if cp2.exitstatus != 0:
-            print('FATAL: cp returned non-zero error code ({})'.format(cp2.exitstatus))
-            sys.exit(42)
-
-        mount = pexpect.spawn('mount',
-            ['-t', 'tmpfs', '-o', 'size={}'.format(config['RAMDISK_SIZE']), 'tmpfs', config['RAM0_PATH']],
-            echo=True if verbose else False,
-            timeout=STANDARD_TIMEOUT,
-            encoding='utf-8'
-        )
-
-        mount.logfile = sys.stdout if verbose else None
-        mount.expect(pexpect.EOF)
-        mount.close()
-
-        if checkMount(config, verbose) == 1:
-            print('FATAL: could not verify successful initialization mount on {}'.format(config['RAM0_PATH']))
-            sys.exit(5)
-
-        if mount.exitstatus != 0:
-            print('FATAL: could not verify successful initialization mount on {} (bad exit status {})'.format(config['RAM0_PATH'], mount.exitstatus))
-            sys.exit(6)
-    else:
-        print('(found mounted ramdisk, primary initialization skipped! Use --force to  re-initialize)')
-
-    reset = pexpect.spawn('bash -c "{}/vendor/odroidxu3-reset.sh"'.format(config['REPO_PATH']),
-        echo=True if verbose else False,
-        timeout=STANDARD_TIMEOUT,
-        encoding='utf-8'
+    output = proc.stdout.decode('utf-8', 'replace').strip()
+
+    if proc.returncode != 0:
+        raise InitStepError('{} returned non-zero error code ({}){}'.format(
+            ' '.join(args),
+            proc.returncode,
+            ': {}'.format(output) if output else ''
+        ))
+
+    return output or None
+
+def makeDirectories(directories):
+    for directory in directories:
+        os.makedirs(directory, exist_ok=True)
+
+def copyInto(source, directory):
+    shutil.copy(source, directory)
+
+def mountRamdisk(config):
+    """Mounts a RAMDISK_SIZE tmpfs on RAM0_PATH and verifies that it worked"""
+
+    error = None
+
+    try:
+        output = runCommand(['mount', '-t', 'tmpfs', '-o', 'size={}'.format(config['RAMDISK_SIZE']), 'tmpfs', config['RAM0_PATH']])
+
+    except InitStepError as e:
+        error = e
+
+    if checkMount(config) == 1:
+        raise InitStepError('could not verify successful initialization mount on {}'.format(config['RAM0_PATH']), 5)
+
+    if error:
+        raise InitStepError('could not verify successful initialization mount on {} ({})'.format(config['RAM0_PATH'], error.message), 6)
+
+    return output
+
+def initSteps(config):
+    """Returns the steps (see initgraph) that ready the testbed. The exit codes
+       of the fatal ones are the ones initialize has always used
+    """
+
+    directories = ['{}/{}'.format(config['TMP_ROOT_PATH'], dirr) for dirr in MODPROBE_DIRS] + [config['RAM0_PATH'], '../config']
+    zlogConfig = ZLOG_CONFIG_FILE.format(config['BUSELFS_PATH'])
+    zlogCopies = (('{}/config'.format(config['TMP_ROOT_PATH']), 4), ('../config', 42))
+
+    steps = [
+        InitStep(
+            'modprobe {}'.format(mod),
+            lambda mod=mod: runCommand(['modprobe', mod]),
+            lambda mod=mod: isModuleLoaded(mod)
+        ) for mod in KERNEL_MODULES
+    ]
+
+    steps.append(InitStep(
+        'mkdir',
+        lambda: makeDirectories(directories),
+        lambda: all(os.path.isdir(directory) for directory in directories),
+        exitCode=3
+    ))
+
+    steps.extend(
+        InitStep(
+            'copy zlog config to {}'.format(destination),
+            lambda destination=destination: copyInto(zlogConfig, destination),
+            lambda destination=destination: isSameFile(zlogConfig, '{}/{}'.format(destination, os.path.basename(zlogConfig))),
+            after=('mkdir',),
+            exitCode=exitCode
+        ) for destination, exitCode in zlogCopies
     )
 
-    reset.logfile = sys.stdout if verbose else None
-    reset.expect(pexpect.EOF)
-    reset.close()
+    steps.append(InitStep(
+        'mount ramdisk',
+        lambda: mountRamdisk(config),
+        lambda: checkMount(config) == 0,
+        after=('mkdir',),
+        exitCode=6
+    ))
 
-    if reset.exitstatus != 0:
-        print('WARN: cpu clock reset failed', end='')
+    # ? Clocks are always reset; there's no cheap way to tell if they need it
+    steps.append(InitStep(
+        'reset cpu clocks',
+        lambda: runCommand(['bash', '-c', '{}/vendor/odroidxu3-reset.sh'.format(config['REPO_PATH'])])
+    ))
 
-        # if force:
-        #     print(' (this error was ignored because force=True)', end='')
+    return steps
 
-        # else:
-        #     sys.exit(16)
+def initialize(config, verbose=False, force=False):
+    """Idempotent initialization of the experimental testbed. Independent steps
+       run concurrently and steps that are already done (e.g. loading a module
+       that is already loaded) are skipped unless force is True. Exits if a
+       fatal step fails; otherwise returns the StepResults
+    """
+
+    def report(result):
+        if result.status == 'failed':
+            print('{}: {} failed: {}'.format('WARN' if result.exitCode is None else 'FATAL', result.name, result.message))
+
+        elif verbose and result.message:
+            print(result.message)
+
+    if force:
+        print('(re-initialization forced; executing every initialization step...)')
 
+    start = time.perf_counter()
+    results = runGraph(initSteps(config), force=force, onResult=report)
+
+    print(formatResults(results, time.perf_counter() - start))
     print()
 
+    for result in results:
+        if result.status == 'failed' and result.exitCode is not None:
+            sys.exit(result.exitCode)
+
+    return results
+
 if __name__ == "__main__":
     try:
         os.geteuid
@@ -4,26 +4,68 @@
 import os
 import time
 import glob
-import pexpect
+import shutil
+import functools
+import itertools
+import contextlib
 
 from subprocess import Popen
 from datetime import datetime
 from librunner.exception import CommandExecutionError, TaskError, ExperimentError
+from librunner.readiness import waitForDevice
+from librunner.mounttable import waitForMountState
+from librunner import syscalls
+from librunner.backstore import BackstorePool
+from librunner.templates import TemplateImageCache
+from librunner.logwriter import AsyncLogWriter, LogRecord, formatPreamble
+from librunner.trace import Tracer
 from librunner.util import (
-    STANDARD_WAIT,
     REDUCED_WAIT,
     NBD_DEVICE_UPPER_BOUND,
     DEFAULT_GLOBAL_TIMEOUT,
+    DEFAULT_COMMAND_PACING,
+    DEFAULT_COMMAND_BACKEND,
+    COMMAND_BACKENDS,
+    DEFAULT_BACKSTORE_RESET_MODE,
+    DEFAULT_BACKSTORE_PREALLOCATE,
+    DEFAULT_TEMPLATE_IMAGES,
+    BACKEND_POLICIES,
+    DEFAULT_BACKEND_POLICY,
+    TEMPLATE_CACHE_DIR_TEMPLATE,
+    MOUNT_CHECK_TIMEOUT,
+    DEFAULT_LOG_FSYNC_SEVERITY,
+    DEFAULT_LOG_FSYNC_INTERVAL,
+    DEFAULT_LOG_QUEUE_SIZE,
+    TRACE_FILE_TEMPLATE,
     KBYTES_IN_A_MB,
     BYTES_IN_A_KB,
     BACKEND_FILE_TEMPLATE,
     DEFAULT_DATA_FILE,
     DEFAULT_DATA_SYM,
-    SB_EXECUTABLE_FILE
+    SB_EXECUTABLE_FILE,
+    CommandTiming,
+    WarmBackend,
+    LazyModule
 )
 
+pexpect = LazyModule('pexpect')
+
+# ? Backend generations are unique per process (see Librunner.acquireBackend)
+_backendGenerations = itertools.count(1)
+
+def _traced(phase):
+    def __traced(fn):
+        @functools.wraps(fn)
+        def ___traced(self, *args, **kwargs):
+            with self.tracePhase(phase):
+                return fn(self, *args, **kwargs)
+        ___traced.trace_phase = phase
+        return ___traced
+    return __traced
+
 def _experiment(name):
     def __experiment(fn):
+        fn = _traced('experiment.{}'.format(name))(fn)
         fn.experiment_name = name
         return fn
     return __experiment
@@ -32,19 +74,53 @@ def _experiment(name):
 class Librunner():
     """This class is responsible for running and managing experiments in an automated fashion"""
 
-    def __init__(self, config):
+    def __init__(self, config, devices=None):
         self.config = config
         self._logFile = None
+        self._logWriter = None
         self.timeout = DEFAULT_GLOBAL_TIMEOUT
         self._backendSizeBytes = config['BACKEND_SIZE_INT'] * KBYTES_IN_A_MB * BYTES_IN_A_KB
         self._backendFilePath = BACKEND_FILE_TEMPLATE.format(config['RAM0_PATH'], '{}')
         self.verbose = config['verbose'] if 'verbose' in config else True
-        self._deviceList = list(range(NBD_DEVICE_UPPER_BOUND))
+        self.commandPacing = config['commandPacing'] if 'commandPacing' in config else DEFAULT_COMMAND_PACING
+        self.commandBackend = config['commandBackend'] if 'commandBackend' in config else DEFAULT_COMMAND_BACKEND
+        self.commandTimings = []
+        self.logFsyncSeverity = config['logFsyncSeverity'] if 'logFsyncSeverity' in config else DEFAULT_LOG_FSYNC_SEVERITY
+        self.logFsyncInterval = config['logFsyncInterval'] if 'logFsyncInterval' in config else DEFAULT_LOG_FSYNC_INTERVAL
+        self.logQueueSize = config['logQueueSize'] if 'logQueueSize' in config else DEFAULT_LOG_QUEUE_SIZE
+        self.backstorePool = BackstorePool(
+            config['backstoreResetMode'] if 'backstoreResetMode' in config else DEFAULT_BACKSTORE_RESET_MODE,
+            config['backstorePreallocate'] if 'backstorePreallocate' in config else DEFAULT_BACKSTORE_PREALLOCATE
+        )
+        self.templateCache = TemplateImageCache(
+            config['TEMPLATE_CACHE_PATH'] if 'TEMPLATE_CACHE_PATH' in config
+                else TEMPLATE_CACHE_DIR_TEMPLATE.format(config['TMP_ROOT_PATH'])
+        ) if (config['templateImages'] if 'templateImages' in config else DEFAULT_TEMPLATE_IMAGES) else None
+        self.backendPolicy = config['backendPolicy'] if 'backendPolicy' in config else DEFAULT_BACKEND_POLICY
+        self.backendGeneration = None
+        self.backendUses = 0
+        self.tracer = None
+        self.configurationId = None
+        self._warmBackend = None
+        self._deviceList = list(range(NBD_DEVICE_UPPER_BOUND)) if devices is None else list(devices)
         self._quarantinedDeviceList = []
         self._lingeringBackgroundProcess = None
+        self.cpuAffinity = None
 
         self._deviceList.reverse()
 
+        if 'traceFilePath' in config:
+            tracePath = config['traceFilePath']
+
+        elif 'LOG_FILE_PATH' in config:
+            tracePath = TRACE_FILE_TEMPLATE.format(os.path.splitext(config['LOG_FILE_PATH'])[0])
+
+        else:
+            tracePath = None
+
+        if tracePath:
+            self.tracer = Tracer(tracePath)
+
     # *
     # * Properties
     # *
@@ -105,15 +181,38 @@ class Librunner():
 
     @logFile.setter
     def logFile(self, logFile):
-        """Sets the internal file object to a user-defined value"""
+        """Sets the internal file object to a user-defined value. Messages are
+           written to it asynchronously (see librunner.logwriter); unsetting it
+           drains and fsyncs whatever is still queued
+        """
 
         if logFile:
             self.print('logging file set to {}'.format(logFile.name))
         else:
             self.print('logging file unset')
 
+        if self._logWriter:
+            self._logWriter.close()
+            self._logWriter = None
+
         self._logFile = logFile
 
+        if logFile:
+            self._logWriter = AsyncLogWriter(logFile, self.logFsyncSeverity, self.logFsyncInterval, self.logQueueSize)
+
+    # ! internal
+    @property
+    def preexecFn(self):
+        """Returns a function that pins spawned processes to self.cpuAffinity
+           (if set) or None
+        """
+
+        if not self.cpuAffinity:
+            return None
+
+        cpus = set(self.cpuAffinity)
+        return lambda: os.sched_setaffinity(0, cpus)
+
     # ! internal
     @property
     def backendFilePath(self):
@@ -153,28 +252,67 @@ class Librunner():
            info; also simultaneously outputs to log files
         """
 
-        timestamp = '{0:%B} {0:%d} at {0:%I:%M:%S%p} {0:%f}'.format(datetime.now())
-        preamble = '[{} | {}:{}]: '.format(timestamp, severity, self.currentDeviceName)
-        xpreamble = preamble.expandtabs(self.config['EXPAND_TABS_INT'])
+        timestamp = datetime.now()
 
         if self.verbose:
-            print(xpreamble, *args, flush=True)
+            preamble = formatPreamble(timestamp, severity, self.currentDeviceName)
+            print(preamble.expandtabs(self.config['EXPAND_TABS_INT']), *args, flush=True)
 
-        if self.logFile:
-            try:
-                fileno = self.logFile.fileno()
-                os.fsync(fileno)
-                print(preamble.expandtabs(0), *args, file=self.logFile)
-                self.logFile.flush()
-                os.fsync(fileno)
-
-            except ValueError:
-                print(
-                    xpreamble,
-                    '[logfile I/O write failed; did an interupt happen?]',
-                    flush=True
-                )
+        # ? Formatting and writing happen on the log writer's thread
+        if self._logWriter:
+            self._logWriter.log(LogRecord(timestamp, severity, self.currentDeviceName, args))
 
+    def syncLogFile(self):
+        """Blocks until every message logged so far is in the log file (e.g.
+           before handing the file to a background process)
+        """
+
+        if self._logWriter:
+            self._logWriter.sync()
+
+    @contextlib.contextmanager
+    def tracePhase(self, phase):
+        """Records the enclosed code as a phase in the trace (see
+           librunner.trace), tagged with the device and self.configurationId
+        """
+
+        if self.tracer is None:
+            yield
+            return
+
+        span = self.tracer.start(phase, self.currentDeviceNumber, self.configurationId)
+        ok = False
+
+        try:
+            yield
+            ok = True
+
+        finally:
+            self.tracer.end(span, phase, self.currentDeviceNumber, self.configurationId, ok)
+
+    def printCommandTimings(self, reset=True):
+        """Prints how many times each executable was spawned and how long those
+           spawns took in total (see self.commandTimings)
+        """
+
+        totals = {}
+
+        for timing in self.commandTimings:
+            count, seconds = totals.get(timing.executable, (0, 0))
+            totals[timing.executable] = (count + 1, seconds + timing.seconds)
+
+        for executable, (count, seconds) in sorted(totals.items(), key=lambda item: -item[1][1]):
+            self.print('{}: {} command(s) took {:.3f} seconds total ({:.3f} average)'.format(
+                os.path.basename(executable),
+                count,
+                seconds,
+                seconds / count
+            ))
+
+        if reset:
+            self.commandTimings = []
+
+    @_traced('cache.drop')
     def dropPageCache(self):
         """Drop the linux page cache programmatically"""
 
@@ -183,21 +321,60 @@ class Librunner():
         with open(self.config['DROP_CACHE_PATH'], 'w') as cache:
             cache.write('1\n')
 
+    @_traced('sleep')
     def sleep(self, seconds):
         """Pause for a little bit (typically a courtesy period)"""
 
         self.print('idling for {} seconds...'.format(seconds))
         time.sleep(seconds)
 
+    @_traced('device.wait')
+    def waitForDeviceReady(self, process=None, processName='backend'):
+        """Blocks until the current nbd device is serving I/O (see
+           librunner.readiness)
+        """
+
+        self.print('waiting for {} to come up...'.format(self.currentDeviceDevPath))
+
+        elapsed = waitForDevice(self.currentDeviceName, self.currentDeviceDevPath, process, processName)
+
+        self.print('{} is ready (took {:.3f} seconds)'.format(self.currentDeviceDevPath, elapsed))
+
+    @_traced('backstore.clear')
     def clearBackstoreFiles(self):
-        """Removes all RAM0_PATH/* files"""
+        """Removes all RAM0_PATH/* files (scratch files from self.backstorePool
+           are zeroed for reuse instead)
+        """
 
         self.print('clearing backstore files')
 
         files = glob.glob('{}/*'.format(self.config['RAM0_PATH']))
         for f in files:
-            os.remove(f)
+            if f in self.backstorePool:
+                self.backstorePool.release(f)
+
+            else:
+                os.remove(f)
+
+    @_traced('backstore.clear')
+    def clearBackstoreFile(self):
+        """Removes only the current device's backstore file (unlike
+           clearBackstoreFiles, this is safe to use with concurrent jobs)
+        """
+
+        self.print('clearing backstore file {}'.format(self.backendFilePath))
+
+        if self.backendFilePath in self.backstorePool:
+            self.backstorePool.release(self.backendFilePath)
+            return
+
+        try:
+            os.remove(self.backendFilePath)
 
+        except FileNotFoundError:
+            pass
+
+    @_traced('data.symlink')
     def symlinkDataClass(self, data_class):
         """Symlinks the proper data file to be written and read in by
            experiments
@@ -211,6 +388,10 @@ class Librunner():
         if not os.path.exists(datafile):
             raise TaskError('data class "{}" does not exist at {}'.format(data_class, datafile))
 
+        # ? Concurrent jobs share the symlink (see librunner.scheduler)
+        if os.path.islink(symlfile) and os.path.realpath(symlfile) == os.path.realpath(datafile):
+            return
+
         try:
             os.remove(symlfile)
 
@@ -265,15 +446,41 @@ class Librunner():
 
         self.print('creating scratch file of ({} bytes) at {}...'.format(filesize, filepath))
 
-        with open(filepath, 'wb') as f:
-            f.seek(filesize - 1)
-            f.write(b'\0')
+        if self.backstorePool.acquire(filepath, filesize):
+            self.print('reusing zeroed scratch file from the backstore pool')
 
         fsize = os.path.getsize(filepath)
 
         if fsize != filesize:
             raise TaskError('file creation failed (unexpected size returned: {} (expected) != {})'.format(fsize, filesize))
 
+    @_traced('backstore.clone')
+    def cloneTemplateImage(self, kind, fs_type, args, tools, formatFn):
+        """Fills the (freshly created) backstore file with a clone of the
+           template image formatFn(path) produces (see librunner.templates).
+           Returns False without doing anything if template images are off
+        """
+
+        if self.templateCache is None:
+            return False
+
+        def build(path):
+            self.print('building {} template image for {} at {}...'.format(kind, fs_type, path))
+            formatFn(path)
+
+        start = time.monotonic()
+        hit, method = self.templateCache.clone(kind, fs_type, self.backendSizeBytes, args, tools, self.backendFilePath, build)
+
+        self.print('cloned {} template image for {} via {} ({}; took {:.3f} seconds)'.format(
+            kind,
+            fs_type,
+            method,
+            'cached' if hit else 'new',
+            time.monotonic() - start
+        ))
+
+        return True
+
     # *
     # * CLI Wrappers (Commands)
     # * -----------------------
@@ -295,49 +502,121 @@ class Librunner():
         else:
             timeout = self.timeout
 
-        time.sleep(1)
-        proc = pexpect.spawn(executable, args, logfile=self.logFile, echo=False, timeout=timeout, encoding='utf-8')
+        # ? Inter-command pacing is off by default; it never touches the timed
+        # ? section of an experiment since it happens before the spawn
+        if self.commandPacing:
+            with self.tracePhase('sleep.pacing'):
+                time.sleep(self.commandPacing)
+
+        with self.tracePhase('command.{}'.format(os.path.basename(executable))):
+            start = time.monotonic()
+            proc = pexpect.spawn(
+                executable,
+                args,
+                logfile=self._logWriter,
+                echo=False,
+                timeout=timeout,
+                encoding='utf-8',
+                preexec_fn=self.preexecFn
+            )
 
-        if not spawn_expect:
-            proc.expect(pexpect.EOF)
-            proc.close()
+            try:
+                if not spawn_expect:
+                    proc.expect(pexpect.EOF)
+                    proc.close()
 
-            if proc.exitstatus != 0:
-                raise CommandExecutionError('process {} exited abnormally ({})'.format(executable, proc.exitstatus), proc.exitstatus)
+                    if proc.exitstatus != 0:
+                        raise CommandExecutionError('process {} exited abnormally ({})'.format(executable, proc.exitstatus), proc.exitstatus)
 
-        else:
-            spawn_expect(executable, args, proc)
+                else:
+                    spawn_expect(executable, args, proc)
+
+            finally:
+                self._record_timing(executable, args, time.monotonic() - start)
 
         return proc
 
+    def _record_timing(self, executable, args, seconds):
+        self.commandTimings.append(CommandTiming(executable, list(args), seconds))
+        self.print('<command `{}` took {:.3f} seconds>'.format(os.path.basename(executable), seconds))
+
     def _spawn(self, executable, args, runMessage=None, verifyMessage=None, spawn_expect=None):
         checkFn = getattr(self, '_check_{}'.format(executable))
 
         self.print((runMessage or 'running {}').format(executable))
 
-        proc = self._spawn_actual(executable, args)
+        proc = self._spawn_actual(executable, args, spawn_expect=spawn_expect)
 
         self.print((verifyMessage or 'verifying {} completed successfully').format(executable))
 
-        checkFn(executable, args, proc)
+        with self.tracePhase('verify.{}'.format(executable)):
+            checkFn(executable, args, proc)
 
         return proc
 
+    def _syscall(self, executable, args, fn):
+        """Same contract as _spawn (including the _check_X verification) but
+           calls fn(args) in-process rather than spawning the executable
+        """
+
+        checkFn = getattr(self, '_check_{}'.format(executable))
+
+        self.print('running {} (via syscalls)'.format(executable))
+        self._shell_saw(executable, args)
+
+        with self.tracePhase('command.{}'.format(executable)):
+            start = time.monotonic()
+
+            try:
+                fn(args)
+
+            except (OSError, ValueError) as e:
+                raise CommandExecutionError('{} failed ({})'.format(executable, e), getattr(e, 'errno', None) or '?')
+
+            finally:
+                self._record_timing(executable, args, time.monotonic() - start)
+
+        self.print('verifying {} completed successfully'.format(executable))
+
+        with self.tracePhase('verify.{}'.format(executable)):
+            checkFn(executable, args, None)
+
+    def _run_command(self, executable, args, syscallFn):
+        if self.commandBackend not in COMMAND_BACKENDS:
+            raise TaskError('unknown command backend "{}" (expected one of: {})'.format(
+                self.commandBackend,
+                ', '.join(COMMAND_BACKENDS)
+            ))
+
+        if self.commandBackend == 'syscall':
+            return self._syscall(executable, args, syscallFn)
+
+        return self._spawn(executable, args)
+
     def _mkfs(self, args):
         return self._spawn('mkfs', args)
 
     def _mount(self, args):
-        return self._spawn('mount', args)
+        return self._run_command('mount', args, syscalls.mount)
 
     def _umount(self, args):
-        return self._spawn('umount', args)
+        return self._run_command('umount', args, syscalls.umount)
+
+    def _cryptsetup_exited(self, executable, proc):
+        proc.expect(pexpect.EOF)
+        proc.close()
+
+        if proc.exitstatus != 0:
+            raise CommandExecutionError('process {} exited abnormally ({})'.format(executable, proc.exitstatus), proc.exitstatus)
 
     def _cryptsetup_init(self, args):
         def spawn_expect(executable, args, proc):
             try:
-                proc.expect(r'\(Type uppercase yes\): ')
+                # ? Newer cryptsetup versions word the confirmation differently
+                # ? and name the volume in the first passphrase prompt
+                proc.expect(r"\(Type (uppercase yes|'yes' in capital letters)\): ")
                 proc.sendline('YES')
-                proc.expect('Enter passphrase: ')
+                proc.expect(r'Enter passphrase( for .+)?: ')
                 proc.sendline('t')
                 proc.expect('Verify passphrase: ')
                 proc.sendline('t')
@@ -346,18 +625,22 @@ class Librunner():
             except pexpect.EOF:
                 raise TaskError('process {} failed (returned unexpected output)'.format(executable))
 
+            self._cryptsetup_exited(executable, proc)
+
         return self._spawn('cryptsetup', args, spawn_expect=spawn_expect)
 
     def _cryptsetup_open(self, args):
         def spawn_expect(executable, args, proc):
             try:
-                proc.expect('Enter passphrase for {}: '.format(self.backendFilePath))
+                # ? The volume might be a template image rather than the backstore file
+                proc.expect(r'Enter passphrase for .+: ')
                 proc.sendline('t')
-                proc.expect(pexpect.EOF)
 
             except pexpect.EOF:
                 raise TaskError('process {} failed (returned unexpected output)'.format(executable))
 
+            self._cryptsetup_exited(executable, proc)
+
         return self._spawn('cryptsetup', args, runMessage='opening dm-crypt LUKS volume', spawn_expect=spawn_expect)
 
     def _cryptsetup_close(self, args=None):
@@ -367,35 +650,31 @@ class Librunner():
     def _cp(self, args):
         return self._spawn('cp', args)
 
+    def _fstrim(self, args):
+        return self._run_command('fstrim', args, syscalls.fstrim)
+
     def _check_mkfs(self, executable, args, proc):
         # ? A good exit code will do just nicely
         pass
 
     def _check_mount(self, executable, args, proc):
-        def spawn_expect(executable, args, proc):
-            try:
-                proc.expect(r'on {}'.format(self.currentDeviceTmpPath))
-
-            except pexpect.EOF:
-                raise TaskError('could not verify successful mount onto {}'.format(self.currentDeviceTmpPath))
+        fsType = args[args.index('-t') + 1] if '-t' in args else None
 
-        self._spawn_actual('mount', [], spawn_expect=spawn_expect)
+        if not waitForMountState(self.currentDeviceTmpPath, True, fsType=fsType, timeout=MOUNT_CHECK_TIMEOUT):
+            raise TaskError('could not verify successful mount onto {}'.format(self.currentDeviceTmpPath))
 
     def _check_umount(self, executable, args, proc):
-        def spawn_expect(executable, args, proc):
-            try:
-                proc.expect(r'on {}'.format(self.currentDeviceTmpPath))
-                raise TaskError('could not verify successful umount from {}'.format(self.currentDeviceTmpPath))
-
-            except pexpect.EOF:
-                pass # ? Success!
-
-        self._spawn_actual('mount', [], spawn_expect=spawn_expect)
+        if not waitForMountState(self.currentDeviceTmpPath, False, timeout=MOUNT_CHECK_TIMEOUT):
+            raise TaskError('could not verify successful umount from {}'.format(self.currentDeviceTmpPath))
 
     def _check_cryptsetup(self, executable, args, proc):
         # ? A good exit code will do just nicely
         pass
 
+    def _check_fstrim(self, executable, args, proc):
+        # ? A good exit code will do just nicely
+        pass
+
     def _check_cp(self, executable, args, proc):
         # ? A good exit code will do just nicely
         pass
@@ -404,6 +683,7 @@ class Librunner():
     # * Backends (Creation)
     # *
 
+    @_traced('create.raw')
     def createRawBackend(self, fs_type, mount_args=None, device_args=None):
         """Creates a non-BUSE raw drive-backed backend. Does not advance current
            device.
@@ -416,10 +696,17 @@ class Librunner():
 
         self.print('creating RAW backend ({} @ {})'.format(self.backendFilePath, self.currentDeviceTmpPath))
 
+        mkfs_args = ['-t', fs_type]
+
         self.createScratchFile()
-        self._mkfs(['-t', fs_type, self.backendFilePath])
+
+        if not self.cloneTemplateImage('raw', fs_type, [mkfs_args], ['mkfs.{}'.format(fs_type)],
+                                       lambda path: self._mkfs(mkfs_args + [path])):
+            self._mkfs(mkfs_args + [self.backendFilePath])
+
         self._mount(mount_args + ['-t', fs_type, self.backendFilePath, self.currentDeviceTmpPath, '-o', 'loop'])
 
+    @_traced('create.raw_dmc')
     def createRawDmcBackend(self, fs_type, mount_args=None, device_args=None):
         """Creates a non-BUSE raw drive-backed dm-crypt backend and returns the
            path. Also advances the current device!"""
@@ -431,16 +718,36 @@ class Librunner():
 
         self.print('creating RAW dm-crypt LUKS volume backend ({} @ {})'.format(self.backendFilePath, self.currentDeviceTmpPath))
 
+        luks_args = [
+            '--verbose', '--cipher', 'aes-xts-plain64', '--key-size', '512', '--hash', 'sha512',
+            '--iter-time', '5000', '--use-urandom'] + device_args
+
+        mkfs_args = ['-t', fs_type]
+
+        def formatTemplate(path):
+            self._cryptsetup_init(luks_args + ['luksFormat', path])
+            self._cryptsetup_open(['open', '--type', 'luks', path, self.currentDeviceName])
+
+            try:
+                self._mkfs(mkfs_args + [self.currentDeviceMapperPath])
+
+            finally:
+                self._cryptsetup_close()
+
         self.createScratchFile()
 
-        self._cryptsetup_init([
-            '--verbose', '--cipher', 'aes-xts-plain64', '--key-size', '512', '--hash', 'sha512',
-            '--iter-time', '5000', '--use-urandom'] + device_args + ['luksFormat', self.backendFilePath])
+        # ? Cloning skips luksFormat's PBKDF benchmark (the open still pays for it)
+        if self.cloneTemplateImage('dmc', fs_type, [luks_args, mkfs_args], ['cryptsetup', 'mkfs.{}'.format(fs_type)], formatTemplate):
+            self._cryptsetup_open(['open', '--type', 'luks', self.backendFilePath, self.currentDeviceName])
+
+        else:
+            self._cryptsetup_init(luks_args + ['luksFormat', self.backendFilePath])
+            self._cryptsetup_open(['open', '--type', 'luks', self.backendFilePath, self.currentDeviceName])
+            self._mkfs(mkfs_args + [self.currentDeviceMapperPath])
 
-        self._cryptsetup_open(['open', '--type', 'luks', self.backendFilePath, self.currentDeviceName])
-        self._mkfs(['-t', fs_type, self.currentDeviceMapperPath])
         self._mount(mount_args + ['-t', fs_type, self.currentDeviceMapperPath, self.currentDeviceTmpPath, '-o', 'loop'])
 
+    @_traced('create.vanilla')
     def createVanillaBackend(self, fs_type, mount_args=None, device_args=None):
         """Creates a buselogfs backend and returns the path"""
 
@@ -456,20 +763,16 @@ class Librunner():
         self.print('creating vanilla backend (@ {})'.format(self.currentDeviceTmpPath))
         self._shell_saw(self.config['BUSE_PATH'], args)
 
-        buse = Popen([self.config['BUSE_PATH']] + args, stdout=self.logFile, stderr=self.logFile)
-
-        self.sleep(5)
-
-        bpoll = buse.poll()
-
-        if bpoll is not None:
-            CommandExecutionError('the buselogfs process does not appear to have survived ({})'.format(bpoll), bpoll)
+        self.syncLogFile()
+        buse = Popen([self.config['BUSE_PATH']] + args, stdout=self.logFile, stderr=self.logFile, preexec_fn=self.preexecFn)
 
+        self.waitForDeviceReady(buse, 'buselogfs')
         self._mkfs(['-t', fs_type, self.currentDeviceDevPath])
         self._mount(mount_args + ['-t', fs_type, self.currentDeviceDevPath, self.currentDeviceTmpPath])
 
         self._lingeringBackgroundProcess = buse
 
+    @_traced('create.sb')
     def createSbBackend(self, fs_type, mount_args=None, device_args=None):
         """Creates a StrongBox backend"""
 
@@ -490,17 +793,11 @@ class Librunner():
         self.print('creating StrongBox backend ({} @ {})'.format(self.backendFilePath, self.currentDeviceTmpPath))
         self._shell_saw(executable, args)
 
-        buse = Popen([executable] + args, stdout=self.logFile, stderr=self.logFile)
-        waittimes = [REDUCED_WAIT, STANDARD_WAIT]
+        self.syncLogFile()
+        buse = Popen([executable] + args, stdout=self.logFile, stderr=self.logFile, preexec_fn=self.preexecFn)
 
         while True:
-            self.sleep(waittimes[0])
-            waittimes.reverse()
-
-            bpoll = buse.poll()
-
-            if bpoll is not None:
-                raise CommandExecutionError('the StrongBox process does not appear to have survived (exit code {})'.format(bpoll), bpoll)
+            self.waitForDeviceReady(buse, 'StrongBox')
 
             try:
                 self._mkfs(['-t', fs_type, self.currentDeviceDevPath])
@@ -516,11 +813,107 @@ class Librunner():
 
                 else:
                     self.print('ignoring error during mkfs since StrongBox is still alive ("{}")'.format(e.message), severity='WARN')
+                    self.sleep(REDUCED_WAIT)
 
         self._mount(mount_args + ['-t', fs_type, self.currentDeviceDevPath, self.currentDeviceTmpPath])
 
         self._lingeringBackgroundProcess = buse
 
+    # *
+    # * Backends (Lifecycle)
+    # *
+
+    def acquireBackend(self, backendFn, conf):
+        """Readies a backend (a (create, destroy, name) tuple) for the next
+           observation of conf and drops the page cache. Under the warm backend
+           policy, the last observation's backend is kept if it matches (same
+           backend, file system, and arguments) and only its file system is
+           reset; otherwise, a fresh backend is created. backendGeneration
+           names the backend (observations sharing one share its generation)
+        """
+
+        if self.backendPolicy not in BACKEND_POLICIES:
+            raise TaskError('unknown backend policy "{}" (expected one of: {})'.format(
+                self.backendPolicy,
+                ', '.join(BACKEND_POLICIES)
+            ))
+
+        key = (backendFn[2], conf.fs_type, tuple(conf.mount_args), tuple(conf.device_args))
+
+        if self._warmBackend and self._warmBackend.key == key:
+            self.backendUses += 1
+            self.print('reusing warm {} backend {} (observation #{} on it)'.format(backendFn[2], self.backendGeneration, self.backendUses))
+            self.resetBackendFilesystem()
+
+        else:
+            self.retireBackend()
+
+            backendFn[0](conf.fs_type, conf.mount_args, conf.device_args)
+
+            self.backendGeneration = '{}.{}'.format(os.getpid(), next(_backendGenerations))
+            self.backendUses = 1
+
+            if self.backendPolicy == 'warm':
+                self._warmBackend = WarmBackend(key, backendFn[1], self.backendGeneration)
+
+        self.dropPageCache()
+
+    def releaseBackend(self, backendFn, healthy=True):
+        """Tears down the backend acquireBackend readied and clears its
+           backstore file, unless the warm backend policy keeps it for the next
+           observation. Backends that aren't healthy (e.g. the observation on
+           it failed) are never kept
+        """
+
+        if self._warmBackend and healthy:
+            return
+
+        self._warmBackend = None
+
+        backendFn[1]()
+        self.clearBackstoreFile()
+
+    def retireBackend(self):
+        """Tears down the backend the warm backend policy kept up (if any);
+           call this once the last observation is done
+        """
+
+        if self._warmBackend:
+            destroy = self._warmBackend.destroy
+            self._warmBackend = None
+
+            self.print('retiring warm backend {} after {} observation(s)'.format(self.backendGeneration, self.backendUses))
+
+            destroy()
+            self.clearBackstoreFile()
+
+    @_traced('backend.reset')
+    def resetBackendFilesystem(self):
+        """Returns a mounted backend's file system to a clean slate: removes
+           whatever the last observation left behind and discards the freed
+           blocks (if the backend supports it)
+        """
+
+        self.print('resetting file system mounted at {}'.format(self.currentDeviceTmpPath))
+
+        for entry in os.scandir(self.currentDeviceTmpPath):
+            if entry.name == 'lost+found':
+                continue
+
+            if entry.is_dir(follow_symlinks=False):
+                shutil.rmtree(entry.path)
+
+            else:
+                os.remove(entry.path)
+
+        os.sync()
+
+        try:
+            self._fstrim([self.currentDeviceTmpPath])
+
+        except CommandExecutionError as e:
+            self.print('fstrim failed; freed blocks were not discarded ("{}")'.format(e.message), severity='WARN')
+
     # *
     # * Backends (Destruction)
     # *
@@ -531,6 +924,7 @@ class Librunner():
         self._lingeringBackgroundProcess.terminate()
         self._lingeringBackgroundProcess = None
 
+    @_traced('teardown.raw')
     def destroyRawBackend(self):
         """Unmounts, deletes files, terminates proc but does not delete files in
            RAM0_PATH!
@@ -538,6 +932,7 @@ class Librunner():
 
         self._umount([self.currentDeviceTmpPath])
 
+    @_traced('teardown.raw_dmc')
     def destroyRawDmcBackend(self):
         """Unmounts, deletes files, terminates proc but does not delete files in
            RAM0_PATH!
@@ -546,6 +941,7 @@ class Librunner():
         self._umount([self.currentDeviceTmpPath])
         self._cryptsetup_close()
 
+    @_traced('teardown.vanilla')
     def destroyVanillaBackend(self):
         """Unmounts, deletes files, terminates proc but does not delete files in
            RAM0_PATH!
@@ -554,6 +950,7 @@ class Librunner():
         self._umount([self.currentDeviceTmpPath])
         self._terminateLingeringProcesses()
 
+    @_traced('teardown.sb')
     def destroySbBackend(self):
         """Unmounts, deletes files, terminates proc but does not delete files in
            RAM0_PATH!
@@ -562,6 +959,7 @@ class Librunner():
         self._umount([self.currentDeviceTmpPath])
         self._terminateLingeringProcesses()
 
+    @_traced('teardown.dmc')
     def destroyDmcBackend(self):
         """Unmounts, deletes files, terminates proc but does not delete files in
            RAM0_PATH!
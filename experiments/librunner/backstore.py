@@ -0,0 +1,100 @@
+"""Keeps backstore (aka: backend) scratch files around between observations and
+resets them in place instead of deleting and re-creating them every time"""
+
+import os
+import errno
+
+from librunner import syscalls
+from librunner.util import BACKSTORE_RESET_MODES
+
+class BackstorePool():
+    """Hands out one scratch file per path (i.e. per nbd device, see
+       Librunner.backendFilePath). Files are sparse unless preallocate is True,
+       in which case their blocks are reserved up front with fallocate. Released
+       files are zeroed in place either by punching a hole over their whole
+       range ("punch") or by truncating them to zero and back ("truncate"), so
+       handing out a zeroed file again takes constant time
+    """
+
+    def __init__(self, resetMode='punch', preallocate=False):
+        if resetMode not in BACKSTORE_RESET_MODES:
+            raise ValueError('unknown backstore reset mode "{}" (expected one of: {})'.format(
+                resetMode,
+                ', '.join(BACKSTORE_RESET_MODES)
+            ))
+
+        self.resetMode = resetMode
+        self.preallocate = preallocate
+        self._sizes = {}
+
+    def __contains__(self, path):
+        return os.path.realpath(path) in self._sizes
+
+    def acquire(self, path, size):
+        """Returns True if a zeroed file of the given size was already waiting
+           at path or False if it had to be created"""
+
+        path = os.path.realpath(path)
+
+        if self._sizes.get(path) == size and os.path.exists(path) and os.path.getsize(path) == size:
+            return True
+
+        fd = os.open(path, os.O_RDWR | os.O_CREAT | os.O_TRUNC, 0o644)
+
+        try:
+            os.ftruncate(fd, size)
+            self._preallocate(fd, size)
+
+        finally:
+            os.close(fd)
+
+        self._sizes[path] = size
+        return False
+
+    def release(self, path):
+        """Zeroes the file at path so it can be handed out again"""
+
+        path = os.path.realpath(path)
+        size = self._sizes[path]
+
+        try:
+            fd = os.open(path, os.O_RDWR)
+
+        except FileNotFoundError:
+            del self._sizes[path]
+            return
+
+        try:
+            if self.resetMode == 'punch':
+                try:
+                    syscalls.fallocate(fd, syscalls.FALLOC_FL_PUNCH_HOLE | syscalls.FALLOC_FL_KEEP_SIZE, 0, size)
+
+                except OSError as e:
+                    if e.errno not in (errno.EOPNOTSUPP, errno.ENOSYS):
+                        raise
+
+                    self.resetMode = 'truncate'
+
+            if self.resetMode == 'truncate':
+                os.ftruncate(fd, 0)
+                os.ftruncate(fd, size)
+
+            self._preallocate(fd, size)
+
+        finally:
+            os.close(fd)
+
+    def remove(self, path):
+        """Stops pooling the file at path and deletes it"""
+
+        self._sizes.pop(os.path.realpath(path), None)
+
+        try:
+            os.remove(path)
+
+        except FileNotFoundError:
+            pass
+
+    def _preallocate(self, fd, size):
+        if self.preallocate:
+            syscalls.fallocate(fd, 0, 0, size)
@@ -0,0 +1,232 @@
+"""Resumable campaigns. A campaign is a testrunner's fully expanded configuration
+matrix (written up front as its manifest) plus a ledger recording the state of
+every (configuration, repetition) pair, so a restarted testrunner picks up
+exactly where the last one stopped instead of guessing from whether a results
+file exists"""
+
+import os
+import json
+import threading
+import contextlib
+
+from librunner.util import CAMPAIGN_MANIFEST_FILE_NAME, CAMPAIGN_LEDGER_FILE_NAME
+
+PENDING = 'pending'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+def _fileSize(path):
+    try:
+        return os.path.getsize(path)
+
+    except FileNotFoundError:
+        return 0
+
+def _truncate(path, size):
+    if _fileSize(path) > size:
+        os.truncate(path, size)
+
+def writeFileAtomically(path, data):
+    """Replaces the file at path with data such that a crash leaves either the
+       old or the new contents behind (never a mix)
+    """
+
+    tmpPath = '{}.{}.tmp'.format(path, os.getpid())
+
+    with open(tmpPath, 'w') as file:
+        file.write(data)
+        file.flush()
+        os.fsync(file.fileno())
+
+    os.replace(tmpPath, path)
+
+    fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+
+    try:
+        os.fsync(fd)
+
+    finally:
+        os.close(fd)
+
+def manifestEntry(configId, resultsPath, experiment, dataClass, backend, configuration):
+    """Returns the manifest entry describing a single configuration"""
+
+    return {
+        'id': configId,
+        'resultsPath': resultsPath,
+        'experiment': experiment,
+        'dataClass': dataClass,
+        'backend': backend,
+        'configuration': configuration._asdict()
+    }
+
+class Campaign():
+    """Keeps a campaign's manifest and ledger in a directory. The ledger is an
+       append-only JSONL journal: every state change is a single fsync'd
+       O_APPEND write and the latest record for a (configuration, repetition)
+       wins when the journal is replayed, so a crash can at worst lose the
+       line being written (which is ignored). A repetition is recorded as
+       running along with the size of its results file beforehand; if it
+       fails (or the runner dies), the file is cut back to that size before
+       the repetition runs again, so trials are never lost or duplicated.
+       Safe to share between scheduler jobs.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.manifestPath = '{}/{}'.format(directory, CAMPAIGN_MANIFEST_FILE_NAME)
+        self.ledgerPath = '{}/{}'.format(directory, CAMPAIGN_LEDGER_FILE_NAME)
+        self._records = {}
+        self._lock = threading.Lock()
+
+        torn = False
+
+        os.makedirs(directory, exist_ok=True)
+
+        if os.path.exists(self.ledgerPath):
+            with open(self.ledgerPath, 'r') as file:
+                for line in file:
+                    torn = not line.endswith('\n')
+
+                    try:
+                        record = json.loads(line)
+
+                    except ValueError:
+                        continue
+
+                    self._records.setdefault(record['id'], {})[record['repetition']] = record
+
+        self._fd = os.open(self.ledgerPath, os.O_WRONLY | os.O_APPEND | os.O_CREAT | os.O_CLOEXEC, 0o644)
+
+        # ? Terminate a line torn by a crash so the next record isn't glued to it
+        if torn:
+            os.write(self._fd, b'\n')
+
+    def writeManifest(self, entries, repetitions):
+        """(Re)writes the manifest (see manifestEntry) and records every
+           repetition the ledger doesn't know about yet as pending
+        """
+
+        writeFileAtomically(self.manifestPath, json.dumps({
+            'repetitions': repetitions,
+            'configurations': entries
+        }, indent=4))
+
+        self._record([
+            { 'id': entry['id'], 'repetition': repetition, 'status': PENDING }
+                for entry in entries
+                    for repetition in range(1, repetitions + 1)
+                        if repetition not in self._records.get(entry['id'], {})
+        ])
+
+    def status(self, configId, repetition):
+        """Returns the ledger status of a repetition (or None if unknown)"""
+
+        record = self._records.get(configId, {}).get(repetition)
+        return record['status'] if record else None
+
+    def doneCount(self, configId):
+        """Returns how many repetitions of configId are done"""
+
+        return sum(1 for record in list(self._records.get(configId, {}).values()) if record['status'] == DONE)
+
+    def counts(self):
+        """Returns how many repetitions are in each status"""
+
+        counts = {}
+
+        for records in list(self._records.values()):
+            for record in list(records.values()):
+                counts[record['status']] = counts.get(record['status'], 0) + 1
+
+        return counts
+
+    def resume(self, configId, resultsPath, repetitions):
+        """Returns the repetitions (1-based) of configId that still need to run.
+           The results file is first cut back to the end of the last done
+           repetition, dropping whatever a failed or interrupted one left
+           behind. If it's shorter than that, none of it can be trusted: it's
+           emptied and every repetition is run again. A non-empty results file
+           the ledger has no runs for (it predates the campaign) is adopted as
+           complete, which is what the testrunners always assumed before
+           campaigns existed
+        """
+
+        records = list(self._records.get(configId, {}).values())
+        done = [record for record in records if record['status'] == DONE]
+        unfinished = [record for record in records if record['status'] in (RUNNING, FAILED)]
+        size = _fileSize(resultsPath)
+
+        if done and size < max(record['end'] for record in done):
+            # ? The results file was cleared (e.g. clearresults.sh), cut short,
+            # ? or replaced, so its runs are redone rather than adopted
+            self._record([
+                { 'id': configId, 'repetition': record['repetition'], 'status': PENDING } for record in done
+            ])
+
+            _truncate(resultsPath, 0)
+
+        elif done:
+            _truncate(resultsPath, max(record['end'] for record in done))
+
+        elif unfinished:
+            _truncate(resultsPath, min(record['start'] for record in unfinished))
+
+        elif size:
+            self._record([
+                { 'id': configId, 'repetition': repetition, 'status': DONE, 'start': 0, 'end': size, 'adopted': True }
+                    for repetition in range(1, repetitions + 1)
+            ])
+
+        return [repetition for repetition in range(1, repetitions + 1) if self.status(configId, repetition) != DONE]
+
+    @contextlib.contextmanager
+    def repetition(self, configId, repetition, resultsPath, backend=None):
+        """Records the enclosed code as a run of the given repetition; if it
+           raises, the repetition is marked failed and its partial results
+           are cut from the results file. backend (e.g. the Librunner's
+           backendGeneration) is recorded with the run, so runs that shared a
+           warm backend can be told apart from those on a fresh one
+        """
+
+        start = _fileSize(resultsPath)
+
+        self._record([{ 'id': configId, 'repetition': repetition, 'status': RUNNING, 'start': start }])
+
+        try:
+            yield
+
+        except BaseException:
+            _truncate(resultsPath, start)
+            self._record([{ 'id': configId, 'repetition': repetition, 'status': FAILED, 'start': start }])
+            raise
+
+        record = {
+            'id': configId,
+            'repetition': repetition,
+            'status': DONE,
+            'start': start,
+            'end': _fileSize(resultsPath)
+        }
+
+        if backend is not None:
+            record['backend'] = backend
+
+        self._record([record])
+
+    def close(self):
+        os.close(self._fd)
+
+    def _record(self, records):
+        if not records:
+            return
+
+        data = ''.join(json.dumps(record, separators=(',', ':')) + '\n' for record in records)
+
+        with self._lock:
+            os.write(self._fd, data.encode('utf-8'))
+            os.fsync(self._fd)
+
+            for record in records:
+                self._records.setdefault(record['id'], {})[record['repetition']] = record
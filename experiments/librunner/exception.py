@@ -15,3 +15,8 @@ class ExperimentError(RuntimeError):
     def __init__(self, message):
         self.message = message
         super().__init__(message)
+
+class DeviceReadinessError(RuntimeError):
+    def __init__(self, devPath, deadline):
+        self.message = '{} was still not serving I/O after {} seconds'.format(devPath, deadline)
+        super().__init__(self.message)
@@ -0,0 +1,169 @@
+"""Writes Librunner's log file from a background thread so logging a message
+costs a queue put rather than a write and a couple of fsyncs"""
+
+import os
+import time
+import queue
+import atexit
+import weakref
+import threading
+
+from collections import namedtuple
+from librunner.util import LOG_SEVERITIES, LOG_BATCH_SIZE
+
+LogRecord = namedtuple('LogRecord', ['timestamp', 'severity', 'deviceName', 'args'])
+
+_STOP = object()
+_liveWriters = weakref.WeakSet()
+
+def formatPreamble(timestamp, severity, deviceName):
+    """Returns the "[<timestamp> | <severity>:<device>]: " message prefix"""
+
+    return '[{} | {}:{}]: '.format('{0:%B} {0:%d} at {0:%I:%M:%S%p} {0:%f}'.format(timestamp), severity, deviceName)
+
+def formatRecord(record):
+    """Formats a LogRecord into a log file line"""
+
+    return ' '.join([formatPreamble(record.timestamp, record.severity, record.deviceName).expandtabs(0)]
+                    + [str(arg) for arg in record.args]) + '\n'
+
+def severityRank(severity):
+    """Orders severities (unknown ones rank above all of LOG_SEVERITIES)"""
+
+    return LOG_SEVERITIES.index(severity) if severity in LOG_SEVERITIES else len(LOG_SEVERITIES)
+
+class AsyncLogWriter():
+    """File-like object (pexpect logs child output to it too) that queues what
+       is written to it while a background thread appends it to the log file
+       in batches. The thread fsyncs whenever the file has been dirty for
+       fsyncInterval seconds (never if falsy) and right after writing a message
+       at or above fsyncSeverity, which log() waits for. Writes go through a
+       duplicate of the file's descriptor, so the queue can still be drained
+       after the file object itself is closed (e.g. by an interrupted `with`)
+    """
+
+    def __init__(self, file, fsyncSeverity, fsyncInterval, queueSize):
+        file.flush()
+
+        self.name = file.name
+        self.encoding = getattr(file, 'encoding', None) or 'utf-8'
+        self.fsyncInterval = fsyncInterval
+        self.failed = False
+
+        self._fsyncRank = severityRank(fsyncSeverity)
+        self._fd = os.dup(file.fileno())
+        self._queue = queue.Queue(maxsize=queueSize)
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name='log-writer:{}'.format(self.name), daemon=True)
+
+        self._thread.start()
+        _liveWriters.add(self)
+
+    def write(self, text):
+        if text and not self._closed:
+            self._queue.put((text, None))
+
+        return len(text)
+
+    def flush(self):
+        """Does nothing; every batch is flushed anyway (see sync)"""
+
+    def log(self, record):
+        """Queues a LogRecord, waiting for it to be fsync'd if it is severe"""
+
+        if severityRank(record.severity) >= self._fsyncRank:
+            self.sync(record)
+
+        elif not self._closed:
+            self._queue.put((record, None))
+
+    def sync(self, item=''):
+        """Blocks until everything queued so far is written and fsync'd"""
+
+        if self._closed:
+            return
+
+        done = threading.Event()
+        self._queue.put((item, done))
+        done.wait()
+
+    def close(self):
+        """Drains the queue, fsyncs, and stops the writer thread"""
+
+        if self._closed:
+            return
+
+        self._closed = True
+        self._queue.put(_STOP)
+        self._thread.join()
+
+        os.close(self._fd)
+        _liveWriters.discard(self)
+
+    def _run(self):
+        lastSync = time.monotonic()
+        dirty = False
+
+        while True:
+            timeout = None
+
+            if dirty and self.fsyncInterval:
+                timeout = max(0, lastSync + self.fsyncInterval - time.monotonic())
+
+            try:
+                batch = [self._queue.get(timeout=timeout)]
+
+            except queue.Empty:
+                batch = []
+
+            while len(batch) < LOG_BATCH_SIZE:
+                try:
+                    batch.append(self._queue.get_nowait())
+
+                except queue.Empty:
+                    break
+
+            stop = _STOP in batch
+            items = [item for item in batch if item is not _STOP]
+            waiters = [done for _, done in items if done is not None]
+            text = ''.join(formatRecord(item) if isinstance(item, LogRecord) else item for item, _ in items)
+
+            if text:
+                self._write(text.encode(self.encoding, 'replace'))
+                dirty = True
+
+            if dirty and (waiters or stop or (self.fsyncInterval and time.monotonic() - lastSync >= self.fsyncInterval)):
+                self._fsync()
+                dirty = False
+                lastSync = time.monotonic()
+
+            for done in waiters:
+                done.set()
+
+            if stop:
+                return
+
+    def _write(self, data):
+        try:
+            while data:
+                data = data[os.write(self._fd, data):]
+
+        except OSError as e:
+            self._fail(e)
+
+    def _fsync(self):
+        try:
+            os.fsync(self._fd)
+
+        except OSError as e:
+            self._fail(e)
+
+    def _fail(self, error):
+        if not self.failed:
+            self.failed = True
+            print('[logfile I/O write failed ({}); did an interupt happen?]'.format(error), flush=True)
+
+@atexit.register
+def _closeLiveWriters():
+    for writer in list(_liveWriters):
+        writer.close()
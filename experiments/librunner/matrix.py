@@ -0,0 +1,145 @@
+"""Declarative experiment matrices. Rather than hand-nesting a loop per
+configurable, a testrunner names its axes (plus optional constraints and
+transition costs) and ExperimentMatrix expands them lazily, in an order that
+keeps expensive switches rare. Also estimates how long a matrix will take from
+the phase latencies in past traces (see librunner.trace)"""
+
+import os
+import math
+import itertools
+
+from datetime import timedelta
+from collections import OrderedDict
+from librunner.trace import readTrace, phaseSpans, percentile
+
+def phaseOf(step):
+    """Returns the trace phase of a traced Librunner method (or step itself if
+       it is already a phase name)
+    """
+
+    return getattr(step, 'trace_phase', step)
+
+def phaseMedians(tracePath):
+    """Returns the median seconds of each phase that finished successfully in
+       a trace file (or nothing if there is no such file)
+    """
+
+    if not tracePath or not os.path.exists(tracePath):
+        return {}
+
+    seconds = {}
+
+    for span in phaseSpans(readTrace(tracePath)):
+        if span.ok:
+            seconds.setdefault(span.phase, []).append(span.seconds)
+
+    return { phase: percentile(sorted(values), 0.5) for phase, values in seconds.items() }
+
+class ExperimentMatrix():
+    """Expands axes (name => list of values) into points (dicts holding one
+       value per axis) that pass every constraint (a callable taking a point).
+       costs maps axis names to the estimated seconds it takes to switch that
+       axis from one value to another (e.g. rebuilding a template image); the
+       axes are nested so the total cost of all switches is as low as it can
+       be, with free axes nested in the order they were declared
+    """
+
+    def __init__(self, axes, constraints=None, costs=None):
+        self.axes = OrderedDict((name, list(values)) for name, values in axes.items())
+        self.constraints = list(constraints or [])
+        self.costs = dict(costs or {})
+        self.order = self._nestingOrder()
+
+    def _nestingOrder(self):
+        # ? An axis of n values nested inside outer axes that make P combinations
+        # ? switches about P * n times, so swapping two neighbors is a win when
+        # ? cost * n / (n - 1) of the inner one is larger; sorting on that
+        # ? weight minimizes the total. Single valued axes never switch
+        def weight(name):
+            size = len(self.axes[name])
+            return math.inf if size <= 1 else self.costs.get(name, 0) * size / (size - 1)
+
+        return sorted(self.axes, key=weight, reverse=True)
+
+    def points(self):
+        """Lazily yields every point passing the constraints, in execution
+           order (outermost axis first; see self.order)
+        """
+
+        for values in itertools.product(*(self.axes[name] for name in self.order)):
+            point = dict(zip(self.order, values))
+
+            if all(constraint(point) for constraint in self.constraints):
+                yield point
+
+    def count(self):
+        """Returns the number of points"""
+
+        return sum(1 for _ in self.points())
+
+    def transitions(self):
+        """Returns how many times each axis switches values over all points"""
+
+        counts = OrderedDict((name, 0) for name in self.order)
+        previous = None
+
+        for point in self.points():
+            if previous is not None:
+                for name in self.order:
+                    if point[name] != previous[name]:
+                        counts[name] += 1
+
+            previous = point
+
+        return counts
+
+    def dryRun(self, repetitions, steps, tracePath=None, doneRepetitions=None):
+        """Returns a report (list of lines) with the number of points and runs,
+           the switches per axis, and the estimated wall time. steps(point)
+           returns the (traced) Librunner methods or phase names every run of
+           the point goes through; their medians come from tracePath. Runs
+           doneRepetitions(point) says are finished already are left out
+        """
+
+        medians = phaseMedians(tracePath)
+        unknown = set()
+        points = 0
+        runs = 0
+        done = 0
+        seconds = 0
+
+        for point in self.points():
+            finished = min(repetitions, doneRepetitions(point)) if doneRepetitions else 0
+
+            points += 1
+            runs += repetitions
+            done += finished
+
+            for phase in (phaseOf(step) for step in steps(point)):
+                if phase in medians:
+                    seconds += medians[phase] * (repetitions - finished)
+
+                else:
+                    unknown.add(phase)
+
+        transitions = self.transitions()
+        seconds += sum(count * self.costs.get(name, 0) for name, count in transitions.items())
+
+        lines = [
+            '{} configurations x {} repetitions = {} runs ({} already done, {} to go)'.format(
+                points,
+                repetitions,
+                runs,
+                done,
+                runs - done
+            ),
+            'axes (outermost first): {}'.format(', '.join(
+                '{} ({} values, {} switches)'.format(name, len(self.axes[name]), transitions[name]) for name in self.order
+            )),
+            'estimated wall time: {}'.format(timedelta(seconds=round(seconds)))
+        ]
+
+        if unknown:
+            lines.append('(no trace history for {}; counted as 0 seconds)'.format(', '.join(sorted(unknown))))
+
+        return lines
@@ -0,0 +1,110 @@
+"""Reads the mount table straight out of /proc/self/mountinfo (see proc(5)) so
+mount state can be checked without spawning and scraping `mount`"""
+
+import os
+import re
+import time
+import select
+
+from collections import namedtuple
+
+MOUNTINFO_PATH = '/proc/self/mountinfo'
+
+MountEntry = namedtuple('MountEntry', [
+    'mountId',
+    'parentId',
+    'device',
+    'root',
+    'mountPoint',
+    'options',
+    'fsType',
+    'source',
+    'superOptions'
+])
+
+# ? Spaces, tabs, newlines, and backslashes are octal escaped (e.g. \040)
+_OCTAL_ESCAPE = re.compile(r'\\([0-7]{3})')
+
+def _unescape(field):
+    return _OCTAL_ESCAPE.sub(lambda match: chr(int(match.group(1), 8)), field)
+
+def parseMountInfoLine(line):
+    """Parses a single mountinfo line into a MountEntry"""
+
+    fields = line.split()
+    separator = fields.index('-', 6)
+
+    return MountEntry(
+        int(fields[0]),
+        int(fields[1]),
+        fields[2],
+        _unescape(fields[3]),
+        _unescape(fields[4]),
+        fields[5],
+        fields[separator + 1],
+        _unescape(fields[separator + 2]),
+        fields[separator + 3] if len(fields) > separator + 3 else ''
+    )
+
+def readMountTable(path=MOUNTINFO_PATH):
+    """Returns the current mount table as a list of MountEntry objects"""
+
+    with open(path, 'r') as file:
+        return [parseMountInfoLine(line) for line in file if line.strip()]
+
+def findMount(mountPoint, source=None, fsType=None, table=None):
+    """Returns the topmost MountEntry mounted at mountPoint (optionally also
+       requiring a source and/or fs type) or None if there isn't one
+    """
+
+    mountPoint = os.path.realpath(mountPoint)
+    match = None
+
+    for entry in readMountTable() if table is None else table:
+        if entry.mountPoint != mountPoint:
+            continue
+
+        # ? Later entries are stacked on top of earlier ones
+        match = entry
+
+    if match is None:
+        return None
+
+    if source is not None and os.path.realpath(match.source) != os.path.realpath(source):
+        return None
+
+    if fsType is not None and match.fsType != fsType:
+        return None
+
+    return match
+
+def isMounted(mountPoint, source=None, fsType=None):
+    """Answers "is source mounted at mountPoint with fs fsType?" """
+
+    return findMount(mountPoint, source, fsType) is not None
+
+def waitForMountState(mountPoint, mounted=True, source=None, fsType=None, timeout=0, path=MOUNTINFO_PATH):
+    """Returns True as soon as isMounted(...) == mounted or False if that's still
+       not the case after timeout seconds. Rather than spinning, this sleeps in
+       poll() until the kernel signals a mount table change (POLLPRI/POLLERR)
+    """
+
+    deadline = time.monotonic() + timeout
+
+    with open(path, 'r') as file:
+        poller = select.poll()
+        poller.register(file, select.POLLPRI | select.POLLERR)
+
+        while True:
+            file.seek(0)
+            table = [parseMountInfoLine(line) for line in file.read().splitlines() if line.strip()]
+
+            if (findMount(mountPoint, source, fsType, table) is not None) == mounted:
+                return True
+
+            remaining = deadline - time.monotonic()
+
+            if remaining <= 0:
+                return False
+
+            poller.poll(remaining * 1000)
@@ -0,0 +1,126 @@
+"""Readiness probes that tell when a freshly connected nbd device is actually
+serving I/O, so backends can be created without sleeping a fixed amount"""
+
+import os
+import time
+import errno
+import fcntl
+import ctypes
+import struct
+
+from librunner.exception import CommandExecutionError, DeviceReadinessError
+from librunner.util import (
+    READINESS_INITIAL_BACKOFF,
+    READINESS_MAX_BACKOFF,
+    READINESS_DEADLINE,
+    READINESS_PROBE_BYTES
+)
+
+# ? _IOR(0x12, 114, size_t); see linux/fs.h and asm-generic/ioctl.h. The size
+# ? of size_t is encoded in the number (0x80041272 on the 32-bit boards,
+# ? 0x80081272 on 64-bit machines) but the kernel always writes back a u64
+BLKGETSIZE64 = (2 << 30) | (ctypes.sizeof(ctypes.c_size_t) << 16) | (0x12 << 8) | 114
+
+# ? errnos meaning a probe isn't supported here rather than that the device
+# ? isn't ready yet
+UNSUPPORTED_PROBE_ERRNOS = (errno.ENOTTY, errno.EINVAL)
+
+def sysfsState(deviceName):
+    """Returns True if sysfs says the nbd device is connected (it has a pid and
+       a non-zero size), False if it isn't, or None if sysfs can't tell us
+    """
+
+    root = '/sys/block/{}'.format(deviceName)
+
+    if not os.path.isdir(root):
+        return None
+
+    # ? The pid attribute only exists while a client is connected
+    if not os.path.exists('{}/pid'.format(root)):
+        return False
+
+    try:
+        with open('{}/size'.format(root)) as file:
+            return int(file.read().strip() or 0) > 0
+
+    except (OSError, ValueError):
+        return None
+
+def blockDeviceSize(devPath):
+    """Returns the size in bytes of a block device (via BLKGETSIZE64) or None
+       if the ioctl isn't supported
+    """
+
+    fd = os.open(devPath, os.O_RDONLY | os.O_NONBLOCK)
+
+    try:
+        try:
+            buffer = fcntl.ioctl(fd, BLKGETSIZE64, b'\0' * 8)
+
+        except OSError as e:
+            if e.errno in UNSUPPORTED_PROBE_ERRNOS:
+                return None
+
+            raise
+
+        return struct.unpack('Q', buffer)[0]
+
+    finally:
+        os.close(fd)
+
+def probeRead(devPath, nbytes=READINESS_PROBE_BYTES):
+    """Returns True if the first nbytes of the device can be read back"""
+
+    fd = os.open(devPath, os.O_RDONLY)
+
+    try:
+        return len(os.pread(fd, nbytes, 0)) == nbytes
+
+    finally:
+        os.close(fd)
+
+def isDeviceReady(deviceName, devPath):
+    """Runs the probes from cheapest to most expensive; the device is ready once
+       every probe that can run agrees
+    """
+
+    if sysfsState(deviceName) is False:
+        return False
+
+    try:
+        size = blockDeviceSize(devPath)
+        return (size is None or size > 0) and probeRead(devPath)
+
+    except OSError:
+        return False
+
+def waitForDevice(deviceName, devPath, process=None, processName='backend', deadline=READINESS_DEADLINE):
+    """Polls the device with exponential backoff until it is ready and returns
+       the number of seconds that took. Raises CommandExecutionError as soon as
+       the (optional) process serving the device dies, and DeviceReadinessError
+       once deadline seconds have passed
+    """
+
+    start = time.monotonic()
+    backoff = READINESS_INITIAL_BACKOFF
+
+    while True:
+        if process is not None:
+            pollResult = process.poll()
+
+            if pollResult is not None:
+                raise CommandExecutionError(
+                    'the {} process does not appear to have survived (exit code {})'.format(processName, pollResult),
+                    pollResult
+                )
+
+        if isDeviceReady(deviceName, devPath):
+            return time.monotonic() - start
+
+        elapsed = time.monotonic() - start
+
+        if elapsed >= deadline:
+            raise DeviceReadinessError(devPath, deadline)
+
+        time.sleep(min(backoff, deadline - elapsed))
+        backoff = min(backoff * 2, READINESS_MAX_BACKOFF)
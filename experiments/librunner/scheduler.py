@@ -0,0 +1,245 @@
+"""Runs independent experiment jobs concurrently, each on its own nbd device"""
+
+import os
+
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from librunner import Librunner
+from librunner.exception import TaskError
+from librunner.util import ramdiskBackstoreCapacity
+
+class Scheduler():
+    """Runs Job objects (see librunner.util.Job) on up to `concurrency` worker
+       Librunner instances at once. Every running job leases one nbd device
+       (and so one backstore file and one mount point) from lib's device list,
+       logs to its own file (or, when jobs run one at a time, to
+       LOG_FILE_PATH), and has the processes it spawns pinned to its own
+       share of the CPUs. Exclusive jobs (anything measuring energy!) always
+       run alone. Since the experiments all read the same data class symlink,
+       only jobs sharing a data class ever run side by side. A worker whose job
+       succeeded is kept (along with its device and, under the warm backend
+       policy, its backend) for the next job; workers are retired once every
+       job is done. Every backstore file lives in the one RAMDISK_SIZE tmpfs,
+       so no more jobs run at once than it has room for.
+    """
+
+    def __init__(self, lib, concurrency=None, pinCpus=True, keepLogs=False, dieOnException=True):
+        self.lib = lib
+        self.keepLogs = keepLogs
+        self.dieOnException = dieOnException
+        self.cpus = sorted(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else []
+        self.concurrency = max(1, min(concurrency or len(self.cpus) or 1, len(lib.deviceList)))
+
+        # ? Past this, the backstore files fill RAM0_PATH partway through a run
+        capacity = ramdiskBackstoreCapacity(lib.config)
+
+        if capacity is not None and self.concurrency > max(1, capacity):
+            lib.print('a {} ramdisk only holds {} backstore file(s) of {} MiB; running {} job(s) at once instead of {}'.format(
+                lib.config['RAMDISK_SIZE'],
+                capacity,
+                lib.config['BACKEND_SIZE_INT'],
+                max(1, capacity),
+                self.concurrency
+            ), severity='WARN')
+
+            self.concurrency = max(1, capacity)
+
+        self.pinCpus = pinCpus and len(self.cpus) > 1 and self.concurrency > 1
+        self._leasedDevices = set()
+        self._idleWorkers = []
+
+    @property
+    def sharesLogFile(self):
+        """True when jobs run one at a time and so all write (in turn) to
+           LOG_FILE_PATH, like the testrunners always have
+        """
+
+        return self.concurrency == 1
+
+    def jobLogPath(self, job):
+        """Returns the path of the log file kept for the given job (next to
+           LOG_FILE_PATH, e.g. /tmp/runner-<job id>.log)
+        """
+
+        filename, fileext = os.path.splitext(os.path.basename(self.lib.config['LOG_FILE_PATH']))
+
+        return '{}/{}-{}{}'.format(
+            os.path.dirname(self.lib.config['LOG_FILE_PATH']),
+            filename,
+            job.identifier,
+            fileext
+        )
+
+    def _cpusForSlot(self, slot):
+        if not self.pinCpus:
+            return None
+
+        share = max(1, len(self.cpus) // self.concurrency)
+        return set(self.cpus[(slot * share) % len(self.cpus):][:share])
+
+    def _leaseDevice(self):
+        for _ in range(len(self.lib.deviceList)):
+            device = self.lib.currentDeviceNumber
+            self.lib.useNextDevice()
+
+            if device not in self._leasedDevices:
+                self._leasedDevices.add(device)
+                return device
+
+        raise TaskError('no nbd devices left to lease (all devices quarantined?)')
+
+    def _makeWorker(self, device, cpus):
+        worker = Librunner(self.lib.config, devices=[device])
+        worker.verbose = self.lib.verbose
+        worker.timeout = self.lib.timeout
+        worker.commandPacing = self.lib.commandPacing
+        worker.commandBackend = self.lib.commandBackend
+        worker.backendPolicy = self.lib.backendPolicy
+        worker.backstorePool = self.lib.backstorePool
+        worker.templateCache = self.lib.templateCache
+        worker.tracer = self.lib.tracer
+        worker.cpuAffinity = cpus
+
+        return worker
+
+    def _takeWorker(self, slot):
+        cpus = self._cpusForSlot(slot)
+
+        if self._idleWorkers:
+            worker = self._idleWorkers.pop(0)
+            worker.cpuAffinity = cpus
+            return worker
+
+        return self._makeWorker(self._leaseDevice(), cpus)
+
+    def _retireWorker(self, worker):
+        try:
+            worker.retireBackend()
+
+        finally:
+            self._leasedDevices.difference_update(worker.deviceList + worker.quarantinedDeviceList)
+
+    def _runJob(self, job, worker):
+        logPath = self.lib.config['LOG_FILE_PATH'] if self.sharesLogFile else self.jobLogPath(job)
+
+        with open(logPath, 'w') as file:
+            print(str(datetime.now()), '\n---------\n', file=file)
+
+            worker.logFile = file
+            worker.print('------------------ job: {} ------------------'.format(job.identifier))
+
+            if worker.cpuAffinity:
+                worker.print('pinned to cpu(s) {}'.format(', '.join(str(cpu) for cpu in sorted(worker.cpuAffinity))))
+
+            try:
+                job.run(worker)
+
+            finally:
+                worker.print('------------------ *** ------------------')
+                worker.logFile = None
+
+        # ? Like the testrunners always have, LOG_FILE_PATH is left for the next
+        # ? job to truncate (so it can be tailed and fed to rlanalyze.py) unless
+        # ? it's kept, in which case it's renamed to the job's own log file
+        if self.sharesLogFile:
+            if self.keepLogs:
+                os.rename(logPath, self.jobLogPath(job))
+
+        elif not self.keepLogs:
+            os.remove(logPath)
+
+    def _canStart(self, job, running):
+        if not running:
+            return True
+
+        if job.exclusive or len(running) >= self.concurrency:
+            return False
+
+        # ? Every running job has the same data class and none are exclusive
+        other = next(iter(running.values()))[0]
+        return not other.exclusive and other.dataClass == job.dataClass
+
+    def run(self, jobs, onJobDone=None):
+        """Runs every job, calling onJobDone(job) after each one finishes.
+           Returns the list of (job, exception) pairs of the jobs that failed
+           (if dieOnException is False; otherwise the first failure is raised
+           once the jobs still running have wound down)
+        """
+
+        pending = list(jobs)
+        running = {}
+        failures = []
+        freeSlots = list(range(self.concurrency))
+
+        self.lib.print('scheduling {} jobs on up to {} device(s) at once'.format(len(pending), self.concurrency))
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            try:
+                while pending or running:
+                    for job in list(pending):
+                        if failures and self.dieOnException:
+                            break
+
+                        if not self._canStart(job, running):
+                            # ? Exclusive jobs wait their turn at the head of the line
+                            if job.exclusive and job is pending[0]:
+                                break
+
+                            continue
+
+                        if not running and job.dataClass is not None:
+                            self.lib.symlinkDataClass(job.dataClass)
+
+                        slot = freeSlots.pop(0)
+                        worker = self._takeWorker(slot)
+                        pending.remove(job)
+
+                        running[executor.submit(self._runJob, job, worker)] = (job, worker, slot)
+
+                    if not running:
+                        break
+
+                    done, _ = wait(running, return_when=FIRST_COMPLETED)
+
+                    for future in done:
+                        job, worker, slot = running.pop(future)
+                        freeSlots.append(slot)
+                        freeSlots.sort()
+
+                        for device in worker.quarantinedDeviceList:
+                            if device in self.lib.deviceList:
+                                self.lib.quarantineDevice(device)
+
+                        try:
+                            future.result()
+
+                        except Exception as e: # pylint: disable=broad-except
+                            self.lib.print('job {} failed: {}'.format(job.identifier, e), severity='FATAL')
+                            failures.append((job, e))
+
+                            self._retireWorker(worker)
+
+                        else:
+                            if worker.deviceList:
+                                self._idleWorkers.append(worker)
+
+                            else:
+                                self._retireWorker(worker)
+
+                        if onJobDone:
+                            onJobDone(job)
+
+            except KeyboardInterrupt:
+                self.lib.print('keyboard interrupt received, waiting on {} running job(s)...'.format(len(running)), severity='WARN')
+                raise
+
+            finally:
+                # ? Warm backends outlive the jobs on them (see Librunner.acquireBackend)
+                while self._idleWorkers:
+                    self._retireWorker(self._idleWorkers.pop(0))
+
+        if failures and self.dieOnException:
+            raise failures[0][1]
+
+        return failures
@@ -0,0 +1,240 @@
+"""Runs every point of an ExperimentMatrix (see librunner.matrix) as a job of a
+resumable campaign (see librunner.campaign) on the Scheduler (see
+librunner.scheduler), so a testrunner only has to declare its axes and how a
+point becomes a configuration"""
+
+import os
+import sys
+
+from librunner.scheduler import Scheduler
+from librunner.campaign import Campaign, manifestEntry
+from librunner.util import (
+    outputProgressBarRedirection,
+    printInstabilityWarning,
+    Job,
+    RESULTS_PATH,
+    RESULTS_FILE_NAME,
+    CAMPAIGN_PATH,
+    DEFAULT_MAX_CONCURRENT_JOBS,
+    LazyModule
+)
+
+tqdm = LazyModule('tqdm')
+
+def runSteps(point):
+    """Returns the traced steps every run at a point goes through"""
+
+    return [point['backend'][0], point['experiment'], point['backend'][1]]
+
+def scriptName():
+    """Returns the name of the script being run, without its extension"""
+
+    return os.path.splitext(os.path.basename(sys.argv[0]))[0]
+
+class CampaignSweep():
+    """Runs each point of matrix, whose axes must include backend (a (create,
+       destroy, name) tuple of lib's methods), experiment (one of lib's
+       experiment methods), and dataClass, repetitions times. Every point is a
+       Job: configurationFor(point) returns its Configuration or
+       ExtendedConfiguration (whose swap ratio is passed on to the experiment).
+
+       Progress is tracked in results/.campaign-<name>/ (name defaults to the
+       testrunner's file name), so runs the ledger has as done are skipped;
+       delete that directory to start over. Jobs only share the machine, up
+       to concurrency at once, when exclusive is False (never when measuring
+       energy!). backendPolicy, if given, replaces lib's (see
+       Librunner.acquireBackend)
+    """
+
+    def __init__(
+        self,
+        lib,
+        matrix,
+        configurationFor,
+        repetitions=1,
+        name=None,
+        exclusive=True,
+        concurrency=DEFAULT_MAX_CONCURRENT_JOBS,
+        backendPolicy=None,
+        keepLogs=False,
+        dieOnException=True
+    ):
+        self.lib = lib
+        self.matrix = matrix
+        self.configurationFor = configurationFor
+        self.repetitions = repetitions
+        self.exclusive = exclusive
+        self.concurrency = concurrency
+        self.backendPolicy = backendPolicy
+        self.keepLogs = keepLogs
+        self.dieOnException = dieOnException
+        self.campaignPath = CAMPAIGN_PATH.format(lib.config['REPO_PATH'], name or scriptName())
+        self.campaign = None
+
+    def pointJob(self, point):
+        """Returns the Job running the given point of the matrix along with its
+           campaign manifest entry
+        """
+
+        conf = self.configurationFor(point)
+        backendFn = point['backend']
+        runFn = point['experiment']
+        dataClass = point['dataClass']
+        experimentArgs = (conf.swap_ratio,) if hasattr(conf, 'swap_ratio') else ()
+
+        identifier = '{}-{}-{}'.format(dataClass, conf.proto_test_name, backendFn[2])
+        jobIdentifier = '{}-{}'.format(runFn.experiment_name, identifier)
+
+        predictedResultFilePath = RESULTS_PATH.format(
+            os.path.realpath(self.lib.config['REPO_PATH']),
+            RESULTS_FILE_NAME.format(runFn.experiment_name, identifier)
+        )
+
+        def run(worker):
+            workerBackendFn = (getattr(worker, backendFn[0].__name__), getattr(worker, backendFn[1].__name__), backendFn[2])
+            experiment = getattr(worker, runFn.__name__)
+
+            worker.configurationId = jobIdentifier
+
+            worker.print('------------------ {} experiment: {} ------------------'.format(
+                runFn.experiment_name,
+                identifier
+            ))
+
+            # ? Only the runs the campaign ledger doesn't have as done are (re)run
+            repetitions = self.campaign.resume(jobIdentifier, predictedResultFilePath, self.repetitions)
+
+            if not repetitions:
+                worker.print('campaign ledger says all runs are done ({}), experiment skipped!'.format(predictedResultFilePath))
+                return
+
+            for i in repetitions:
+                worker.print('=> run {}/{}'.format(i, self.repetitions))
+
+                worker.acquireBackend(workerBackendFn, conf)
+                observed = False
+
+                try:
+                    with self.campaign.repetition(jobIdentifier, i, predictedResultFilePath, worker.backendGeneration):
+                        experiment(dataClass, identifier, *experimentArgs)
+
+                    observed = True
+
+                except KeyboardInterrupt:
+                    raise
+
+                except:
+                    worker.print('UNHANDLED EXCEPTION ENCOUNTERED!', severity='FATAL')
+
+                    if self.dieOnException:
+                        raise
+
+                finally:
+                    try:
+                        worker.releaseBackend(workerBackendFn, healthy=observed)
+
+                    except:
+                        printInstabilityWarning(worker, self.lib.config)
+                        raise
+
+            worker.printCommandTimings()
+
+        job = Job(jobIdentifier, dataClass, run, self.exclusive)
+        entry = manifestEntry(jobIdentifier, predictedResultFilePath, runFn.experiment_name, dataClass, backendFn[2], conf)
+
+        return job, entry
+
+    def dryRun(self):
+        """Returns the matrix's dry run report (see ExperimentMatrix.dryRun),
+           leaving out the runs an existing campaign has as done
+        """
+
+        campaign = Campaign(self.campaignPath) if os.path.exists(self.campaignPath) else None
+
+        return self.matrix.dryRun(
+            self.repetitions,
+            runSteps,
+            self.lib.tracer.path if self.lib.tracer else None,
+            (lambda point: campaign.doneCount(self.pointJob(point)[1]['id'])) if campaign else None
+        )
+
+    def run(self):
+        """Writes the campaign manifest and runs every job that isn't done yet
+           behind a progress bar. Returns the scheduler's failures (see
+           Scheduler.run)
+        """
+
+        self.lib.print('constructing configurations')
+
+        pointJobs = [self.pointJob(point) for point in self.matrix.points()]
+        jobs = [job for job, _ in pointJobs]
+
+        self.lib.print('starting experiment ({} configurations)'.format(len(jobs)))
+
+        self.campaign = Campaign(self.campaignPath)
+        self.campaign.writeManifest([entry for _, entry in pointJobs], self.repetitions)
+
+        self.lib.print('campaign manifest written to {} (ledger: {})'.format(self.campaign.manifestPath, ', '.join(
+            '{} {}'.format(count, status) for status, count in sorted(self.campaign.counts().items())
+        )))
+
+        # ? Exclusive jobs run one at a time whatever the concurrency
+        scheduler = Scheduler(
+            self.lib,
+            1 if self.exclusive else self.concurrency,
+            keepLogs=self.keepLogs,
+            dieOnException=self.dieOnException
+        )
+
+        with outputProgressBarRedirection() as originalStdOut:
+            with tqdm.tqdm(total=len(jobs), file=originalStdOut, unit='configuration', dynamic_ncols=True) as progressBar:
+                try:
+                    return scheduler.run(jobs, onJobDone=lambda job: progressBar.update())
+
+                except KeyboardInterrupt:
+                    progressBar.close()
+                    self.lib.print('keyboard interrupt received, cleaning up...')
+                    raise
+
+    def main(self, args=None):
+        """What a testrunner does when run: prints the dry run report if args
+           (default: sys.argv[1:]) has --dry-run, or else (as root) initializes
+           the testbed and runs the sweep
+        """
+
+        # ? Imported here since initrunner sits next to the testrunners rather
+        # ? than in librunner
+        import initrunner
+
+        args = sys.argv[1:] if args is None else args
+
+        if '--dry-run' in args:
+            print('\n'.join(self.dryRun()))
+            sys.exit(0)
+
+        try:
+            os.geteuid
+        except AttributeError:
+            os.geteuid = lambda: -1
+
+        if os.geteuid() != 0:
+            sys.exit('must be root/sudo')
+
+        try:
+            # Bare bones basic initialization
+            initrunner.initialize(self.lib.config)
+            initrunner.cwdToRAMDir(self.lib.config)
+            self.lib.checkSanity()
+
+            if self.backendPolicy is not None:
+                self.lib.backendPolicy = self.backendPolicy
+
+            self.lib.print('working directory set to {}'.format(self.lib.config['RAM0_PATH']))
+            self.lib.clearBackstoreFiles()
+
+            self.run()
+
+            self.lib.print('done', severity='OK')
+
+        except KeyboardInterrupt:
+            self.lib.print('done (experiment terminated via keyboard interrupt)', severity='WARN')
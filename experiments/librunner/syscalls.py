@@ -0,0 +1,241 @@
+"""Performs mount/umount and loop device setup directly through libc (mount(2),
+umount2(2), and the loop(4) ioctls) instead of spawning mount/umount. Also
+exposes fallocate(2), which the os module only partially wraps, and the FITRIM
+ioctl fstrim(8) uses"""
+
+import os
+import errno
+import fcntl
+import ctypes
+import ctypes.util
+import struct
+
+_libc = None
+
+# ? See linux/mount.h
+MOUNT_FLAGS = {
+    'ro': 1,
+    'nosuid': 2,
+    'nodev': 4,
+    'noexec': 8,
+    'sync': 16,
+    'dirsync': 128,
+    'noatime': 1024,
+    'nodiratime': 2048,
+    'relatime': 1 << 21,
+    'strictatime': 1 << 24,
+    'lazytime': 1 << 25,
+}
+
+# ? Options that just mean "don't set the matching flag above"
+NOOP_MOUNT_OPTIONS = ('rw', 'suid', 'dev', 'exec', 'async', 'atime', 'diratime', 'defaults')
+
+# ? See linux/loop.h
+LOOP_SET_FD = 0x4C00
+LOOP_SET_STATUS64 = 0x4C04
+LOOP_CONFIGURE = 0x4C0A
+LOOP_CTL_GET_FREE = 0x4C82
+LO_FLAGS_AUTOCLEAR = 4
+LO_NAME_SIZE = 64
+
+# ? See linux/falloc.h
+FALLOC_FL_KEEP_SIZE = 1
+FALLOC_FL_PUNCH_HOLE = 2
+
+# ? See linux/fs.h (_IOWR('X', 121, struct fstrim_range))
+FITRIM = 0xC0185879
+
+# ? Another process can grab the free loop device we were handed first
+LOOP_ATTACH_ATTEMPTS = 5
+
+# ? struct loop_info64 and struct loop_config
+_LOOP_INFO64 = struct.Struct('QQQQQIIII{0}s{0}s32sQQ'.format(LO_NAME_SIZE))
+_LOOP_CONFIG = struct.Struct('II{}s64x'.format(_LOOP_INFO64.size))
+
+# ? struct fstrim_range (start, len, minlen)
+_FSTRIM_RANGE = struct.Struct('QQQ')
+
+def libc():
+    """Returns the (lazily loaded) libc handle"""
+
+    global _libc # pylint: disable=global-statement
+
+    if _libc is None:
+        _libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+
+        _libc.mount.argtypes = [ctypes.c_char_p, ctypes.c_char_p, ctypes.c_char_p, ctypes.c_ulong, ctypes.c_char_p]
+        _libc.umount2.argtypes = [ctypes.c_char_p, ctypes.c_int]
+        # ? fallocate64 takes 64 bit offsets even on 32 bit ARM boards
+        _libc.fallocate64.argtypes = [ctypes.c_int, ctypes.c_int, ctypes.c_int64, ctypes.c_int64]
+
+    return _libc
+
+def _raiseErrno(what):
+    err = ctypes.get_errno()
+    raise OSError(err, '{} failed: {}'.format(what, os.strerror(err)))
+
+def parseMountArgs(args):
+    """Splits mount(8) style arguments (e.g. ['-o', 'noatime', '-t', 'f2fs',
+       source, target]) into (source, target, fsType, options)
+    """
+
+    args = [str(arg) for arg in args]
+    positional = []
+    fsType = None
+    options = []
+    ndx = 0
+
+    while ndx < len(args):
+        arg = args[ndx]
+
+        if arg in ('-t', '-o'):
+            if ndx + 1 >= len(args):
+                raise ValueError('mount argument {} is missing its value'.format(arg))
+
+            if arg == '-t':
+                fsType = args[ndx + 1]
+
+            else:
+                options.extend(option for option in args[ndx + 1].split(',') if option)
+
+            ndx += 2
+
+        elif arg.startswith('-'):
+            raise ValueError('unsupported mount argument "{}"'.format(arg))
+
+        else:
+            positional.append(arg)
+            ndx += 1
+
+    if len(positional) != 2:
+        raise ValueError('expected a source and a target, got {}'.format(positional))
+
+    return positional[0], positional[1], fsType, options
+
+def attachLoopDevice(backingFile):
+    """Attaches backingFile to a free loop device, retrying if someone else
+       claims the device first (see _attachLoopDevice)
+    """
+
+    for attempt in range(1, LOOP_ATTACH_ATTEMPTS + 1):
+        try:
+            return _attachLoopDevice(backingFile)
+
+        except OSError as e:
+            if e.errno != errno.EBUSY or attempt == LOOP_ATTACH_ATTEMPTS:
+                raise
+
+def _attachLoopDevice(backingFile):
+    """Attaches backingFile to a free loop device and returns its path along
+       with an open fd to it. The device detaches itself once that fd is closed
+       and nothing is mounted on it (i.e. after the umount), so keep the fd
+       open until the device is mounted!
+    """
+
+    with open('/dev/loop-control', 'rb') as control:
+        number = fcntl.ioctl(control.fileno(), LOOP_CTL_GET_FREE)
+
+    devPath = '/dev/loop{}'.format(number)
+    fileName = os.fsencode(backingFile)[:LO_NAME_SIZE - 1]
+    info = _LOOP_INFO64.pack(0, 0, 0, 0, 0, 0, 0, 0, LO_FLAGS_AUTOCLEAR, fileName, b'', b'', 0, 0)
+
+    backingFd = os.open(backingFile, os.O_RDWR)
+
+    try:
+        loopFd = os.open(devPath, os.O_RDWR)
+
+        try:
+            fcntl.ioctl(loopFd, LOOP_CONFIGURE, _LOOP_CONFIG.pack(backingFd, 0, info))
+
+        except OSError as e:
+            # ? LOOP_CONFIGURE is Linux 5.8+; fall back to the two step dance
+            if e.errno not in (errno.EINVAL, errno.ENOTTY):
+                os.close(loopFd)
+                raise
+
+            try:
+                fcntl.ioctl(loopFd, LOOP_SET_FD, backingFd)
+                fcntl.ioctl(loopFd, LOOP_SET_STATUS64, info)
+
+            except OSError:
+                os.close(loopFd)
+                raise
+
+    finally:
+        os.close(backingFd)
+
+    return devPath, loopFd
+
+def mount(args):
+    """mount(8) replacement supporting -t, -o (including "loop"), source, and
+       target; returns the source actually mounted (i.e. the loop device)
+    """
+
+    source, target, fsType, options = parseMountArgs(args)
+    flags = 0
+    data = []
+
+    for option in options:
+        if option in MOUNT_FLAGS:
+            flags |= MOUNT_FLAGS[option]
+
+        elif option not in NOOP_MOUNT_OPTIONS and option != 'loop':
+            data.append(option)
+
+    loopFd = None
+
+    if 'loop' in options:
+        source, loopFd = attachLoopDevice(source)
+
+    try:
+        result = libc().mount(
+            os.fsencode(source),
+            os.fsencode(target),
+            os.fsencode(fsType) if fsType else None,
+            flags,
+            ','.join(data).encode() if data else None
+        )
+
+        if result != 0:
+            _raiseErrno('mount {} on {}'.format(source, target))
+
+    finally:
+        if loopFd is not None:
+            os.close(loopFd)
+
+    return source
+
+def umount(args):
+    """umount(8) replacement for a single target"""
+
+    args = [str(arg) for arg in args]
+
+    if len(args) != 1 or args[0].startswith('-'):
+        raise ValueError('expected a single umount target, got {}'.format(args))
+
+    if libc().umount2(os.fsencode(args[0]), 0) != 0:
+        _raiseErrno('umount {}'.format(args[0]))
+
+def fallocate(fd, mode, offset, length):
+    """fallocate(2); raises OSError (e.g. EOPNOTSUPP) on failure"""
+
+    if libc().fallocate64(fd, mode, offset, length) != 0:
+        _raiseErrno('fallocate')
+
+def fstrim(args):
+    """fstrim(8) replacement for a single mount point; discards every unused
+       block of the file system
+    """
+
+    args = [str(arg) for arg in args]
+
+    if len(args) != 1 or args[0].startswith('-'):
+        raise ValueError('expected a single fstrim mount point, got {}'.format(args))
+
+    fd = os.open(args[0], os.O_RDONLY | os.O_DIRECTORY)
+
+    try:
+        fcntl.ioctl(fd, FITRIM, bytearray(_FSTRIM_RANGE.pack(0, 2 ** 64 - 1, 0)))
+
+    finally:
+        os.close(fd)
@@ -0,0 +1,200 @@
+"""Caches pre-formatted (mkfs'd and/or luksFormat'd) backstore images so raw
+backends can be cloned from a template instead of being formatted from scratch
+for every single observation"""
+
+import os
+import json
+import errno
+import fcntl
+import shutil
+import hashlib
+import threading
+
+from librunner.util import TEMPLATE_IMAGE_VERSION
+
+# ? _IOW(0x94, 9, int); see linux/fs.h
+FICLONE = 0x40049409
+
+# ? Errors meaning "this filesystem (pair) can't do that, try something else"
+_UNSUPPORTED_ERRNOS = (errno.EOPNOTSUPP, errno.EXDEV, errno.EINVAL, errno.ENOTTY, errno.ENOSYS)
+
+_COPY_CHUNK_BYTES = 1 << 20
+
+def toolStamp(executable):
+    """Identifies the installed version of an executable (by path, size, and
+       mtime) so upgrading mkfs or cryptsetup invalidates their templates
+    """
+
+    path = shutil.which(executable)
+
+    if path is None:
+        return None
+
+    path = os.path.realpath(path)
+    stat = os.stat(path)
+
+    return [path, stat.st_size, stat.st_mtime_ns]
+
+def dataExtents(fd, size):
+    """Yields the (offset, length) of every non-hole region of the file"""
+
+    offset = 0
+
+    while offset < size:
+        try:
+            start = os.lseek(fd, offset, os.SEEK_DATA)
+
+        except OSError as e:
+            # ? ENXIO: nothing but hole left; anything else: no SEEK_DATA support
+            if e.errno != errno.ENXIO:
+                yield offset, size - offset
+
+            return
+
+        end = min(os.lseek(fd, start, os.SEEK_HOLE), size)
+        yield start, end - start
+        offset = end
+
+def _copyRange(srcFd, dstFd, offset, length):
+    end = offset + length
+
+    # ? os.copy_file_range is Python 3.8+
+    if hasattr(os, 'copy_file_range'):
+        try:
+            while offset < end:
+                copied = os.copy_file_range(srcFd, dstFd, end - offset, offset, offset)
+
+                if copied == 0:
+                    break
+
+                offset += copied
+
+            return
+
+        except OSError as e:
+            if e.errno not in _UNSUPPORTED_ERRNOS:
+                raise
+
+    while offset < end:
+        data = os.pread(srcFd, min(_COPY_CHUNK_BYTES, end - offset), offset)
+
+        if not data:
+            break
+
+        offset += os.pwrite(dstFd, data, offset)
+
+def cloneFile(src, dst):
+    """Clones src onto dst, which must already be a zeroed (e.g. sparse) file
+       of the same size. Shares src's blocks via reflink where the filesystem
+       allows it; otherwise only src's data extents are copied in-kernel with
+       copy_file_range. Returns the method used ("reflink" or "copy")
+    """
+
+    srcFd = os.open(src, os.O_RDONLY)
+
+    try:
+        return cloneFd(srcFd, dst)
+
+    finally:
+        os.close(srcFd)
+
+def cloneFd(srcFd, dst):
+    """Like cloneFile, but clones from an already open file descriptor (which
+       keeps working even if its file is deleted in the meantime)
+    """
+
+    dstFd = os.open(dst, os.O_WRONLY)
+
+    try:
+        try:
+            fcntl.ioctl(dstFd, FICLONE, srcFd)
+            return 'reflink'
+
+        except OSError as e:
+            if e.errno not in _UNSUPPORTED_ERRNOS:
+                raise
+
+        for offset, length in dataExtents(srcFd, os.fstat(srcFd).st_size):
+            _copyRange(srcFd, dstFd, offset, length)
+
+        return 'copy'
+
+    finally:
+        os.close(dstFd)
+
+class TemplateImageCache():
+    """Keeps one template image per (kind, fs type, size, arguments, tool
+       versions) combination in a directory. Templates are named after a digest
+       of all of those, so changing any mkfs/cryptsetup argument simply misses
+       the cache; the stale templates of that kind and fs type are deleted
+       once their replacement has been built. Each template has the apparent
+       size of a backstore file (BACKEND_SIZE_INT MiB), though mkfs leaves
+       most of it sparse
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._lock = threading.Lock()
+
+    def templatePath(self, kind, fsType, size, args, tools):
+        """Returns where the template for the given combination lives"""
+
+        key = json.dumps([TEMPLATE_IMAGE_VERSION, kind, fsType, size, args, [toolStamp(tool) for tool in tools]])
+
+        return '{}/{}-{}-{}.img'.format(
+            self.directory,
+            kind,
+            fsType,
+            hashlib.sha1(key.encode('utf-8')).hexdigest()[:16]
+        )
+
+    def clone(self, kind, fsType, size, args, tools, dst, build):
+        """Clones the matching template onto dst (see cloneFile), calling
+           build(path) to format a new template first if there isn't one yet.
+           Returns a (hit, method) pair
+        """
+
+        path = self.templatePath(kind, fsType, size, args, tools)
+        hit = True
+
+        # ? Concurrent jobs (see librunner.scheduler) must not build the same
+        # ? template twice. The template is opened under the lock too, so a job
+        # ? pruning it (after building one with other arguments) can't pull it
+        # ? out from under a clone that is still in progress
+        with self._lock:
+            if not os.path.exists(path):
+                hit = False
+                self._build(path, size, build)
+                self._prune(kind, fsType, path)
+
+            srcFd = os.open(path, os.O_RDONLY)
+
+        try:
+            return hit, cloneFd(srcFd, dst)
+
+        finally:
+            os.close(srcFd)
+
+    def _build(self, path, size, build):
+        os.makedirs(self.directory, exist_ok=True)
+        tmpPath = '{}.{}.tmp'.format(path, os.getpid())
+
+        try:
+            with open(tmpPath, 'wb') as file:
+                file.truncate(size)
+
+            build(tmpPath)
+            os.replace(tmpPath, path)
+
+        finally:
+            if os.path.exists(tmpPath):
+                os.remove(tmpPath)
+
+    def _prune(self, kind, fsType, keep):
+        prefix = '{}-{}-'.format(kind, fsType)
+
+        for name in os.listdir(self.directory):
+            path = '{}/{}'.format(self.directory, name)
+
+            if name.startswith(prefix) and name.endswith('.img') and path != keep:
+                os.remove(path)
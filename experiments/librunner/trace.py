@@ -0,0 +1,135 @@
+"""Structured trace of runner phases (backend creation, commands, experiments,
+teardown, etc). Every phase appends a start and an end event to a JSONL file,
+one compact JSON object per line, which readTrace/phaseSpans read back so setup
+overhead can be measured without scraping the free text log"""
+
+import os
+import json
+import math
+import time
+import threading
+import itertools
+
+from collections import namedtuple
+
+# ? One finished phase; device and config are taken from the end event since
+# ? phases like backend creation switch devices partway through
+PhaseSpan = namedtuple('PhaseSpan', ['phase', 'device', 'config', 'pid', 'startNs', 'seconds', 'ok'])
+
+# ? Span ids are unique per process, even with several Tracer instances around
+_spanIds = itertools.count(1)
+
+class Tracer():
+    """Appends events to a trace file (opened on the first event). Each event
+       is a single O_APPEND write, so concurrent jobs (and processes) can share
+       the same file
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._fd = None
+        self._lock = threading.Lock()
+
+    def start(self, phase, device=None, config=None):
+        """Records the start of a phase and returns its span id"""
+
+        span = next(_spanIds)
+        self._emit('start', phase, span, device, config)
+
+        return span
+
+    def end(self, span, phase, device=None, config=None, ok=True):
+        """Records the end of the phase started as span"""
+
+        self._emit('end', phase, span, device, config, ok)
+
+    def close(self):
+        with self._lock:
+            if self._fd is not None:
+                os.close(self._fd)
+                self._fd = None
+
+    def _emit(self, kind, phase, span, device, config, ok=None):
+        event = {
+            'ns': time.monotonic_ns(),
+            'kind': kind,
+            'phase': phase,
+            'span': span,
+            'pid': os.getpid(),
+            'device': device,
+            'config': config
+        }
+
+        if ok is not None:
+            event['ok'] = ok
+
+        with self._lock:
+            if self._fd is None:
+                self._fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT | os.O_CLOEXEC, 0o644)
+
+            os.write(self._fd, (json.dumps(event, separators=(',', ':')) + '\n').encode('utf-8'))
+
+def readTrace(path):
+    """Yields every event (as a dict) in a trace file, skipping lines that
+       can't be parsed (e.g. one cut short by a crash)
+    """
+
+    with open(path, 'r') as file:
+        for line in file:
+            try:
+                yield json.loads(line)
+
+            except ValueError:
+                continue
+
+def phaseSpans(events):
+    """Pairs start and end events up into PhaseSpan objects (in order of their
+       end events); phases that never ended are left out
+    """
+
+    started = {}
+
+    for event in events:
+        key = (event.get('pid'), event.get('span'))
+
+        if event.get('kind') == 'start':
+            started[key] = event
+
+        elif event.get('kind') == 'end' and key in started:
+            start = started.pop(key)
+
+            yield PhaseSpan(
+                event['phase'],
+                event.get('device'),
+                event.get('config'),
+                event.get('pid'),
+                start['ns'],
+                (event['ns'] - start['ns']) / 1e9,
+                event.get('ok', True)
+            )
+
+def latencyHistogram(seconds):
+    """Buckets latencies by powers of two milliseconds, returning a sorted list
+       of (upper bound in ms, count) pairs; the first bucket holds everything
+       under a millisecond
+    """
+
+    buckets = {}
+
+    for value in seconds:
+        bound = 1
+
+        while bound < value * 1000:
+            bound *= 2
+
+        buckets[bound] = buckets.get(bound, 0) + 1
+
+    return sorted(buckets.items())
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+
+    if not values:
+        return None
+
+    return values[min(len(values) - 1, max(0, math.ceil(fraction * len(values)) - 1))]
@@ -1,27 +1,107 @@
 """Utility objects for use with the librunner library"""
 
+import os
 import sys
+import importlib
 import contextlib
 
-from tqdm import tqdm
 from collections import namedtuple
 
 STANDARD_WAIT = 10
 REDUCED_WAIT = 5
 NBD_DEVICE_UPPER_BOUND = 16
 DEFAULT_GLOBAL_TIMEOUT = None
+DEFAULT_COMMAND_PACING = 0 # ? Seconds to wait before each spawned command
+# ? "spawn" runs mount/umount as processes, "syscall" calls into libc directly
+COMMAND_BACKENDS = ('spawn', 'syscall')
+DEFAULT_COMMAND_BACKEND = 'spawn'
+MOUNT_CHECK_TIMEOUT = 1 # ? Seconds to wait for the mount table to settle
+
+# ? Severities in increasing order; see librunner.logwriter. Messages at or above
+# ? DEFAULT_LOG_FSYNC_SEVERITY are fsync'd right away, the rest every few seconds
+LOG_SEVERITIES = ('INFO', 'OK', 'WARN', 'FATAL', 'CRITICAL')
+DEFAULT_LOG_FSYNC_SEVERITY = 'WARN'
+DEFAULT_LOG_FSYNC_INTERVAL = 1
+DEFAULT_LOG_QUEUE_SIZE = 4096
+LOG_BATCH_SIZE = 256
+
+# ? See librunner.trace; by default, the trace sits next to LOG_FILE_PATH
+TRACE_FILE_TEMPLATE = '{}.trace.jsonl'
+
+# ? How librunner.backstore.BackstorePool zeroes scratch files for reuse;
+# ? preallocating reserves every block up front (careful: RAM0_PATH is a tmpfs!)
+BACKSTORE_RESET_MODES = ('punch', 'truncate')
+DEFAULT_BACKSTORE_RESET_MODE = 'punch'
+DEFAULT_BACKSTORE_PREALLOCATE = False
+
+# ? See librunner.templates; bump the version to throw away every cached image.
+# ! Opt-in (set templateImages True): cloned raw backends all start from one
+# ! image, and cloned dm-crypt ones share its LUKS header, master key, and salt.
+# ! Every backend kind/fs type pair keeps a template of the backstore file's
+# ! size (BACKEND_SIZE_INT MiB, mostly sparse) under TMP_ROOT_PATH/templates
+# ! (override with TEMPLATE_CACHE_PATH)
+DEFAULT_TEMPLATE_IMAGES = False
+TEMPLATE_CACHE_DIR_TEMPLATE = '{}/templates'
+TEMPLATE_IMAGE_VERSION = 1
+
+# ? See Librunner.acquireBackend; "warm" keeps a backend up across observations
+# ? of the same configuration and only resets its file system in between
+BACKEND_POLICIES = ('fresh', 'warm')
+DEFAULT_BACKEND_POLICY = 'fresh'
+
+# ? How many non-exclusive jobs librunner.sweep.CampaignSweep runs at once (e.g.
+# ? on the XU3's four big cores); librunner.scheduler.Scheduler runs fewer if
+# ? RAMDISK_SIZE can't hold that many BACKEND_SIZE_INT backstore files
+DEFAULT_MAX_CONCURRENT_JOBS = 4
+
 KBYTES_IN_A_MB = 1024
 BYTES_IN_A_KB = 1024
+# ? Size suffixes tmpfs understands (see RAMDISK_SIZE and initrunner.mountRamdisk)
+TMPFS_SIZE_EXPONENTS = {'k': 1, 'm': 2, 'g': 3, 't': 4, 'p': 5, 'e': 6}
 BACKEND_FILE_TEMPLATE = '{}/logfs-{}.bkstr'
 DEFAULT_DATA_FILE = '{}/data/data{}.random'
 DEFAULT_DATA_SYM = '{}/data/data.target'
 SB_EXECUTABLE_FILE = '{}/build/sb'
 RESULTS_FILE_NAME = '{}.ram.{}.results'
 RESULTS_PATH = '{}/results/{}'
+CAMPAIGN_PATH = '{}/results/.campaign-{}'
+CAMPAIGN_MANIFEST_FILE_NAME = 'manifest.json'
+CAMPAIGN_LEDGER_FILE_NAME = 'ledger.jsonl'
+
+# ? Seconds; see librunner.readiness
+READINESS_INITIAL_BACKOFF = 0.05
+READINESS_MAX_BACKOFF = 1
+READINESS_DEADLINE = 120
+READINESS_PROBE_BYTES = 4096
 
 Configuration = namedtuple('Configuration', ['proto_test_name', 'fs_type', 'mount_args', 'device_args'])
+CommandTiming = namedtuple('CommandTiming', ['executable', 'args', 'seconds'])
+WarmBackend = namedtuple('WarmBackend', ['key', 'destroy', 'generation'])
 ExtendedConfiguration = namedtuple('ExtendedConfiguration', ['proto_test_name', 'fs_type', 'swap_ratio', 'mount_args', 'device_args'])
 
+# ? A unit of work for librunner.scheduler.Scheduler; run(worker) is called with
+# ? a Librunner instance that owns a single nbd device for the job's duration.
+# ? Exclusive jobs never share the machine (keep this on when measuring energy!)
+Job = namedtuple('Job', ['identifier', 'dataClass', 'run', 'exclusive'], defaults=[True])
+
+class LazyModule():
+    """Stands in for a module that isn't imported until one of its attributes
+       is first used, keeping heavy dependencies (e.g. pexpect, tqdm) out of
+       the startup of tools that never need them
+    """
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attr):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+
+        return getattr(self._module, attr)
+
+_tqdm = LazyModule('tqdm')
+
 class DummyTqdmFile():
     """Dummy file-like object that will write to the tqdm progress bar"""
 
@@ -35,7 +115,7 @@ class DummyTqdmFile():
         # Avoid print() second call (useless \n)
         if len(string.rstrip()) > 0:
             if not string.endswith(' '):
-                tqdm.write('{}{}'.format(self.accumulator, string), file=self.fd)
+                _tqdm.tqdm.write('{}{}'.format(self.accumulator, string), file=self.fd)
                 self.accumulator = ''
 
             else:
@@ -59,6 +139,37 @@ def outputProgressBarRedirection():
     finally:
         sys.stdout = originalOutputFile
 
+def tmpfsSizeBytes(size):
+    """Returns the number of bytes a tmpfs size= option (e.g. 1400M, 2g, 50%)
+       stands for, or None if it can't be worked out
+    """
+
+    size = str(size).strip().lower()
+
+    try:
+        if size.endswith('%'):
+            return os.sysconf('SC_PHYS_PAGES') * os.sysconf('SC_PAGE_SIZE') * int(size[:-1]) // 100
+
+        if size[-1:] in TMPFS_SIZE_EXPONENTS:
+            return int(size[:-1]) * BYTES_IN_A_KB ** TMPFS_SIZE_EXPONENTS[size[-1]]
+
+        return int(size)
+
+    except (ValueError, OSError):
+        return None
+
+def ramdiskBackstoreCapacity(config):
+    """Returns how many BACKEND_SIZE_INT backstore files fit in the RAMDISK_SIZE
+       tmpfs at once (or None if RAMDISK_SIZE can't be made sense of)
+    """
+
+    ramdiskBytes = tmpfsSizeBytes(config['RAMDISK_SIZE'])
+
+    if ramdiskBytes is None:
+        return None
+
+    return ramdiskBytes // (config['BACKEND_SIZE_INT'] * KBYTES_IN_A_MB * BYTES_IN_A_KB)
+
 def printInstabilityWarning(lib, config):
     lib.print('THE SYSTEM IS VERY LIKELY IN AN UNSTABLE STATE! TO PROCEED:', severity='CRITICAL')
     lib.print('1. `umount` any mounted NBD/mapper devices', severity='CRITICAL')
@@ -3,13 +3,14 @@
 import os
 import sys
 from datetime import datetime
-from tqdm import tqdm
 
 import initrunner
 from librunner import Librunner
-from librunner.util import outputProgressBarRedirection, printInstabilityWarning, Configuration, RESULTS_PATH, RESULTS_FILE_NAME
+from librunner.util import outputProgressBarRedirection, printInstabilityWarning, Configuration, RESULTS_PATH, RESULTS_FILE_NAME, LazyModule
 from librunner.exception import ExperimentError
 
+tqdm = LazyModule('tqdm')
+
 config = initrunner.parseConfigVars()
 lib = Librunner(config)
 
@@ -62,7 +63,7 @@ if __name__ == "__main__":
     # TODO: factor this all out and replace the custom parts with lambda/function pointers
     # ! This is old code. If we use this to gather results, it must be updated like optflknug and swap2019 are
     with outputProgressBarRedirection() as originalStdOut:
-        with tqdm(total=confcount, file=originalStdOut, dynamic_ncols=True) as progressBar:
+        with tqdm.tqdm(total=confcount, file=originalStdOut, dynamic_ncols=True) as progressBar:
             for conf in configurations:
                 for backendFn in backendFnTuples:
                     for runFn in experiments:
@@ -72,6 +73,7 @@ if __name__ == "__main__":
 
                                 lib.logFile = file
                                 identifier = '{}-{}-{}'.format(dataClass, conf.proto_test_name, backendFn[2])
+                                lib.configurationId = '{}-{}'.format(runFn.experiment_name, identifier)
 
                                 predictedResultFileName = RESULTS_FILE_NAME.format(runFn.experiment_name, identifier)
 
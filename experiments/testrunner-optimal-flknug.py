@@ -2,14 +2,11 @@
 """An experimental framework meant to find the optimal flk/nug configuration;
 used to generate tradeoff spaces and other things too"""
 
-import os
-import sys
-from datetime import datetime
-from tqdm import tqdm
-
 import initrunner
 from librunner import Librunner
-from librunner.util import outputProgressBarRedirection, printInstabilityWarning, Configuration, RESULTS_PATH, RESULTS_FILE_NAME
+from librunner.matrix import ExperimentMatrix
+from librunner.sweep import CampaignSweep
+from librunner.util import Configuration
 
 config = initrunner.parseConfigVars()
 lib = Librunner(config)
@@ -87,126 +84,43 @@ backendFnTuples = [
     (lib.createSbBackend, lib.destroySbBackend, 'strongbox'),
 ]
 
+TRANSITION_COSTS = {
+    'filesystem': 30,
+    'backend': 30,
+}
+
+matrix = ExperimentMatrix({
+    'filesystem': filesystems,
+    'fpn': fpns,
+    'flksize': flksizes,
+    'cipher': ciphers,
+    'backend': backendFnTuples,
+    'experiment': experiments,
+    'dataClass': dataClasses,
+}, costs=TRANSITION_COSTS)
+
 ### *** ###
 
+def configurationFor(point):
+    """Returns the configuration at a point of the matrix"""
+
+    return Configuration(
+        '{}#{}#{}#{}'.format(point['filesystem'], point['cipher'], point['flksize'], point['fpn']),
+        point['filesystem'],
+        [],
+        [
+            '--cipher', point['cipher'],
+            '--flake-size', str(point['flksize']),
+            '--flakes-per-nugget', str(point['fpn'])
+        ]
+    )
+
+sweep = CampaignSweep(
+    lib,
+    matrix,
+    configurationFor,
+    dieOnException=DIE_ON_EXCEPTION
+)
+
 if __name__ == "__main__":
-    try:
-        os.geteuid
-    except AttributeError:
-        os.geteuid = lambda: -1
-
-    if os.geteuid() != 0:
-        sys.exit('must be root/sudo')
-
-    try:
-        # Bare bones basic initialization
-        initrunner.initialize(config)
-        initrunner.cwdToRAMDir(config)
-        lib.checkSanity()
-
-        lib.print('working directory set to {}'.format(config['RAM0_PATH']))
-        lib.clearBackstoreFiles()
-        lib.print('constructing configurations')
-
-        # * Optimal flake/nugget size perf test
-        configurations = []
-        for filesystem in filesystems:
-            for fpn in fpns:
-                for flk_size in flksizes:
-                    configurations.extend([
-                        Configuration(
-                            '{}#{}#{}#{}'.format(filesystem, cipher, flk_size, fpn),
-                            filesystem,
-                            [],
-                            [
-                                '--cipher', cipher,
-                                '--flake-size', str(flk_size),
-                                '--flakes-per-nugget', str(fpn)
-                            ]
-                        ) for cipher in ciphers
-                    ])
-
-        confcount = len(configurations) * len(backendFnTuples) * len(dataClasses) * len(experiments)
-
-        lib.clearBackstoreFiles()
-        lib.print('starting experiment ({} configurations)'.format(confcount))
-
-        # TODO: factor this all out and replace the custom parts with lambda/function pointers
-        with outputProgressBarRedirection() as originalStdOut:
-            with tqdm(total=confcount, file=originalStdOut, unit='observation', dynamic_ncols=True) as progressBar:
-                for conf in configurations:
-                    for backendFn in backendFnTuples:
-                        for runFn in experiments:
-                            for dataClass in dataClasses:
-                                with open(config['LOG_FILE_PATH'], 'w') as file:
-                                    print(str(datetime.now()), '\n---------\n', file=file)
-
-                                    lib.logFile = file
-                                    identifier = '{}-{}-{}'.format(
-                                        dataClass,
-                                        conf.proto_test_name,
-                                        backendFn[2]
-                                    )
-
-                                    predictedResultFileName = RESULTS_FILE_NAME.format(runFn.experiment_name, identifier)
-
-                                    predictedResultFilePath = RESULTS_PATH.format(
-                                        os.path.realpath(config['REPO_PATH']),
-                                        predictedResultFileName
-                                    )
-
-                                    lib.print('------------------ {} experiment: {} ------------------'.format(
-                                        runFn.experiment_name,
-                                        identifier
-                                    ))
-
-                                    # ? If the results file exists already, then skip this experiment!
-                                    if os.path.exists(predictedResultFilePath):
-                                        lib.print('results file {} was found, experiment skipped!'.format(predictedResultFilePath))
-
-                                    else:
-                                        try:
-                                            backendFn[0](conf.fs_type, conf.mount_args, conf.device_args)
-                                            lib.dropPageCache()
-
-                                        except KeyboardInterrupt:
-                                            progressBar.close()
-                                            lib.print('keyboard interrupt received, cleaning up...')
-                                            raise
-
-                                        try:
-                                            runFn(dataClass, identifier)
-
-                                        except KeyboardInterrupt:
-                                            progressBar.close()
-                                            lib.print('keyboard interrupt received, cleaning up...')
-                                            raise
-
-                                        except:
-                                            if DIE_ON_EXCEPTION:
-                                                progressBar.close()
-
-                                            lib.print('UNHANDLED EXCEPTION ENCOUNTERED!', severity='FATAL')
-
-                                            if DIE_ON_EXCEPTION:
-                                                raise
-
-                                        finally:
-                                            try:
-                                                backendFn[1]()
-                                                lib.clearBackstoreFiles()
-
-                                            except:
-                                                progressBar.close()
-                                                printInstabilityWarning(lib, config)
-                                                raise
-
-                                    lib.print('------------------ *** ------------------')
-                                    lib.logFile = None
-
-                                    progressBar.update()
-
-        lib.print('done', severity='OK')
-
-    except KeyboardInterrupt:
-        lib.print('done (experiment terminated via keyboard interrupt)', severity='WARN')
+    sweep.main()
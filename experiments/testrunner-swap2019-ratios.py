@@ -1,14 +1,11 @@
 #!/usr/bin/env python3
 """An experimental framework meant to trigger cipher switching using ratios"""
 
-import os
-import sys
-from datetime import datetime
-from tqdm import tqdm
-
 import initrunner
 from librunner import Librunner
-from librunner.util import outputProgressBarRedirection, printInstabilityWarning, ExtendedConfiguration, RESULTS_PATH, RESULTS_FILE_NAME
+from librunner.matrix import ExperimentMatrix
+from librunner.sweep import CampaignSweep
+from librunner.util import ExtendedConfiguration
 
 config = initrunner.parseConfigVars()
 lib = Librunner(config)
@@ -104,147 +101,51 @@ backendFnTuples = [
     (lib.createSbBackend, lib.destroySbBackend, 'strongbox')
 ]
 
+TRANSITION_COSTS = {
+    'filesystem': 30,
+    'backend': 30,
+}
+
+matrix = ExperimentMatrix({
+    'filesystem': filesystems,
+    'fpn': fpns,
+    'flksize': flksizes,
+    'swapRatio': range(SWAP_LOWER_BOUND, SWAP_UPPER_BOUND + 1),
+    'cipherpair': cipherpairs,
+    'backend': backendFnTuples,
+    'experiment': experiments,
+    'dataClass': dataClasses,
+}, costs=TRANSITION_COSTS)
+
 ### *** ###
 
+def configurationFor(point):
+    """Returns the extended configuration at a point of the matrix"""
+
+    cipherpair = point['cipherpair']
+
+    return ExtendedConfiguration(
+        '{}#{}#{}#{}#{}#{}+{}'.format(point['filesystem'], cipherpair[0], point['flksize'], point['fpn'], cipherpair[1], cipherpair[2], point['swapRatio']),
+        point['filesystem'],
+        point['swapRatio'],
+        [],
+        [
+            '--cipher', cipherpair[0],
+            '--flake-size', str(point['flksize']),
+            '--flakes-per-nugget', str(point['fpn']),
+            '--swap-cipher', cipherpair[1],
+            '--swap-strategy', cipherpair[2]
+        ]
+    )
+
+sweep = CampaignSweep(
+    lib,
+    matrix,
+    configurationFor,
+    REPEAT_TEST_TIMES,
+    keepLogs=KEEP_RUNNER_LOGS,
+    dieOnException=DIE_ON_EXCEPTION
+)
+
 if __name__ == "__main__":
-    try:
-        os.geteuid
-    except AttributeError:
-        os.geteuid = lambda: -1
-
-    if os.geteuid() != 0:
-        sys.exit('must be root/sudo')
-
-    try:
-        # Bare bones basic initialization
-        initrunner.initialize(config)
-        initrunner.cwdToRAMDir(config)
-        lib.checkSanity()
-
-        lib.print('working directory set to {}'.format(config['RAM0_PATH']))
-        lib.clearBackstoreFiles()
-        lib.print('constructing extended configurations')
-
-        # * And it begins!
-        configurations = []
-        for filesystem in filesystems:
-            for fpn in fpns:
-                for flk_size in flksizes:
-                    for swap_rat in range(SWAP_LOWER_BOUND, SWAP_UPPER_BOUND + 1):
-                        configurations.extend([
-                            ExtendedConfiguration(
-                                '{}#{}#{}#{}#{}#{}+{}'.format(filesystem, cipherpair[0], flk_size, fpn, cipherpair[1], cipherpair[2], swap_rat),
-                                filesystem,
-                                swap_rat,
-                                [],
-                                [
-                                    '--cipher', cipherpair[0],
-                                    '--flake-size', str(flk_size),
-                                    '--flakes-per-nugget', str(fpn),
-                                    '--swap-cipher', cipherpair[1],
-                                    '--swap-strategy', cipherpair[2]
-                                ]
-                            ) for cipherpair in cipherpairs
-                        ])
-
-        confcount = len(configurations) * len(backendFnTuples) * len(dataClasses) * len(experiments)
-
-        lib.clearBackstoreFiles()
-        lib.print('starting experiment ({} extended configurations)'.format(confcount))
-
-        # TODO: factor this all out and replace the custom parts with lambda/function pointers
-        with outputProgressBarRedirection() as originalStdOut:
-            with tqdm(total=confcount, file=originalStdOut, unit='observation', dynamic_ncols=True) as progressBar:
-                for conf in configurations:
-                    for backendFn in backendFnTuples:
-                        for runFn in experiments:
-                            for dataClass in dataClasses:
-                                identifier = '[unknown]'
-
-                                with open(config['LOG_FILE_PATH'], 'w') as file:
-                                    print(str(datetime.now()), '\n---------\n', file=file)
-
-                                    lib.logFile = file
-                                    identifier = '{}-{}-{}'.format(
-                                        dataClass,
-                                        conf.proto_test_name,
-                                        backendFn[2]
-                                    )
-
-                                    predictedResultFileName = RESULTS_FILE_NAME.format(runFn.experiment_name, identifier)
-
-                                    predictedResultFilePath = RESULTS_PATH.format(
-                                        os.path.realpath(config['REPO_PATH']),
-                                        predictedResultFileName
-                                    )
-
-                                    lib.print('------------------ {} experiment: {} ------------------'.format(
-                                        runFn.experiment_name,
-                                        identifier
-                                    ))
-
-                                    # ? If the results file exists already, then skip this experiment!
-                                    if os.path.exists(predictedResultFilePath):
-                                        lib.print('results file {} was found, experiment skipped!'.format(predictedResultFilePath))
-
-                                    else:
-                                        for i in range(1, REPEAT_TEST_TIMES + 1):
-                                            lib.print('=> run {}/{}'.format(i, REPEAT_TEST_TIMES))
-
-                                            try:
-                                                backendFn[0](conf.fs_type, conf.mount_args, conf.device_args)
-                                                lib.dropPageCache()
-
-                                            except KeyboardInterrupt:
-                                                progressBar.close()
-                                                lib.print('keyboard interrupt received, cleaning up...')
-                                                raise
-
-                                            try:
-                                                runFn(dataClass, identifier, conf.swap_ratio)
-
-                                            except KeyboardInterrupt:
-                                                progressBar.close()
-                                                lib.print('keyboard interrupt received, cleaning up...')
-                                                raise
-
-                                            except:
-                                                if DIE_ON_EXCEPTION:
-                                                    progressBar.close()
-
-                                                lib.print('UNHANDLED EXCEPTION ENCOUNTERED!', severity='FATAL')
-
-                                                if DIE_ON_EXCEPTION:
-                                                    raise
-
-                                            finally:
-                                                try:
-                                                    backendFn[1]()
-                                                    lib.clearBackstoreFiles()
-
-                                                except:
-                                                    progressBar.close()
-                                                    printInstabilityWarning(lib, config)
-                                                    raise
-
-                                    lib.print('------------------ *** ------------------')
-                                    lib.logFile = None
-
-                                    progressBar.update()
-
-                                if KEEP_RUNNER_LOGS:
-                                    filename, fileext = os.path.splitext(os.path.basename(config['LOG_FILE_PATH']))
-                                    os.rename(
-                                        config['LOG_FILE_PATH'],
-                                        '{}/{}-{}{}'.format(
-                                            os.path.dirname(config['LOG_FILE_PATH']),
-                                            filename,
-                                            identifier,
-                                            fileext
-                                        )
-                                    )
-
-        lib.print('done', severity='OK')
-
-    except KeyboardInterrupt:
-        lib.print('done (experiment terminated via keyboard interrupt)', severity='WARN')
+    sweep.main()
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+
+"""Summarizes a librunner trace file (see librunner/trace.py) into per-phase
+latency statistics and histograms, making setup overhead (mkfs, mount, device
+readiness, etc) measurable and regressions in it visible"""
+
+import sys
+import argparse
+
+from librunner.trace import readTrace, phaseSpans, latencyHistogram, percentile
+
+# ? Width of the longest histogram bar
+HISTOGRAM_WIDTH = 50
+
+def groupName(phase, depth):
+    """Truncates a dotted phase name (e.g. command.mkfs) to depth components"""
+
+    return '.'.join(phase.split('.')[:depth]) if depth else phase
+
+def printReport(groups, showHistograms=True):
+    for name, seconds in sorted(groups.items()):
+        seconds = sorted(seconds)
+
+        print('{}: {} span(s), total {:.3f}s, median {:.1f}ms, p90 {:.1f}ms, p99 {:.1f}ms, max {:.1f}ms'.format(
+            name,
+            len(seconds),
+            sum(seconds),
+            percentile(seconds, 0.5) * 1000,
+            percentile(seconds, 0.9) * 1000,
+            percentile(seconds, 0.99) * 1000,
+            seconds[-1] * 1000
+        ))
+
+        if not showHistograms:
+            continue
+
+        histogram = latencyHistogram(seconds)
+        most = max(count for _, count in histogram)
+
+        for bound, count in histogram:
+            print('    {:>10} | {} {}'.format(
+                '<{}ms'.format(bound),
+                '#' * max(1, round(count / most * HISTOGRAM_WIDTH)),
+                count
+            ))
+
+        print()
+
+################################################################################
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='print per-phase latency histograms from a librunner trace file')
+
+    parser.add_argument('trace', help='the trace file to read (by default, librunner writes one next to LOG_FILE_PATH)')
+
+    parser.add_argument(
+        '-p',
+        '--phase',
+        metavar='prefix',
+        help='only consider phases starting with this prefix (e.g. command. or create.)'
+    )
+
+    parser.add_argument(
+        '-c',
+        '--config',
+        metavar='substring',
+        help='only consider phases whose configuration id contains this substring'
+    )
+
+    parser.add_argument(
+        '-d',
+        '--depth',
+        type=int,
+        default=0,
+        metavar='n',
+        help='group phases by their first n dotted components (default is 0: no grouping)'
+    )
+
+    parser.add_argument('-f', '--failed', action='store_true', help='include phases that raised an exception')
+    parser.add_argument('-s', '--summary', action='store_true', help='print summary lines only (no histograms)')
+
+    args = parser.parse_args(sys.argv[1:])
+    groups = {}
+    failed = 0
+
+    for span in phaseSpans(readTrace(args.trace)):
+        if args.phase and not span.phase.startswith(args.phase):
+            continue
+
+        if args.config and args.config not in (span.config or ''):
+            continue
+
+        if not span.ok:
+            failed += 1
+
+            if not args.failed:
+                continue
+
+        groups.setdefault(groupName(span.phase, args.depth), []).append(span.seconds)
+
+    if not groups:
+        sys.exit('no matching phases found in {}'.format(args.trace))
+
+    printReport(groups, not args.summary)
+
+    if failed:
+        print('({} failed phase(s) {})'.format(failed, 'included' if args.failed else 'skipped; see --failed'))
@@ -8,6 +8,8 @@ import re
 import os
 import sys
 
+from concurrent.futures import ProcessPoolExecutor
+
 from pathlib import Path
 from decimal import Decimal, getcontext, FloatOperation
 
@@ -17,92 +19,256 @@ c.prec = 6
 
 from libcruncher.exception import (ResultPropertyAttributeError,
                                    EmptyResultsSubsetError,
+                                   InvalidRangeFilterError,
                                    InvalidPathError,
                                    FilenameTranslationError,
+                                   MalformedResultFileError,
                                    SudoRequired)
 
 from libcruncher.util import (ResultProperties,
+                              ResultPropertiesCollection,
+                              ResultSample,
                               ExecutionProperties,
                               ResultProperty,
                               DEFAULT_CIPHER_IDENT,
                               DEFAULT_FLAKESIZE,
                               DEFAULT_FPN,
-                              DEFAULT_STRATEGY)
+                              DEFAULT_STRATEGY,
+                              DEFAULT_SWAP_RATIO,
+                              RESULT_SAMPLE_PREFIXES,
+                              RESULTS_ROW_STORE_FILE_NAME,
+                              INGEST_CHUNK_SIZE)
+
+from libcruncher.cache import ResultsCache, encodeColumn, decodeColumn
+from libcruncher.aggregate import aggregateColumns, derivePower
+from libcruncher.index import ResultsIndex
+from libcruncher.filename import decodeResultFilename, encodeResultFilename, cipherToShortName
 
 def lineToNumber(line):
     """Converts a line string like "energy: 55" into a number"""
     return Decimal(line.split(': ')[1])
 
+def _classifySampleKey(key):
+    """Returns the (op, metric) pair of a sample key (e.g. "r_energy") or None
+    if the key isn't a valid sample key"""
+    op, _, metric = key.partition('_')
+    return (op, metric) if op in RESULT_SAMPLE_PREFIXES and metric else None
+
+# ? Dispatch table mapping every sample key seen so far to its (op, metric) pair
+# ? (or None for invalid keys) so each line is classified with one dict lookup
+_SAMPLE_KEY_TABLE = {}
+
+def _scanResultLines(lines, path):
+    """Yields a (trial, key, classification, value) tuple for every sample line
+    (see tokenizeResultLines)"""
+    trial = 0
+    trialKeys = set()
+    blockKeys = set()
+    table = _SAMPLE_KEY_TABLE
+
+    for currentLine in lines:
+        key, sep, value = currentLine.partition(': ')
+
+        if sep:
+            classification = table.get(key, False)
+
+            if classification is False:
+                classification = table[key] = _classifySampleKey(key)
+
+            if classification is not None:
+                if key in trialKeys or key in blockKeys:
+                    trial += 1
+                    trialKeys.clear()
+                    blockKeys.clear()
+
+                blockKeys.add(key)
+
+                yield (trial, key, classification, Decimal(value))
+                continue
+
+        # These are technically comments/blank lines and are ignored
+        if currentLine.startswith('---') or len(currentLine.strip()) == 0 or currentLine.startswith('mf'):
+            trialKeys |= blockKeys
+            blockKeys.clear()
+            continue
+
+        raise MalformedResultFileError(path, currentLine.strip())
+
+def tokenizeResultLines(lines, path='?'):
+    """Lazily yields a ResultSample for every sample line in an iterable of
+    result file lines. Lines are grouped into blocks by "---" separators and a
+    new trial starts whenever a key already seen in the current trial shows up
+    again, which covers every result file layout the experiments produce"""
+    for trial, _, (op, metric), value in _scanResultLines(lines, path):
+        yield ResultSample(trial, op, metric, value)
+
+def tokenizeResultFile(path):
+    """Lazily yields a ResultSample for every sample in a result file (see
+    tokenizeResultLines)"""
+    with open(str(path), 'r') as lines:
+        yield from tokenizeResultLines(lines, path)
+
+def parseResultFile(path):
+    """Parses a result file into a dict mapping each sample key (e.g. "r_energy")
+    to the list of its values in file order"""
+    samples = {}
+
+    with open(str(path), 'r') as lines:
+        for _, key, _, value in _scanResultLines(lines, path):
+            if key in samples:
+                samples[key].append(value)
+
+            else:
+                samples[key] = [value]
+
+    return samples
+
+def parseResultFileToColumns(path):
+    """Parses a result file into compact cache columns ({key: column})"""
+    return { key: encodeColumn(values) for key, values in parseResultFile(path).items() }
+
+def loadResultColumns(resultPropertiesObjects, useCache=True, jobs=None):
+    """Accepts a list of ResultProperties objects and returns a list of their
+    parsed samples as compact cache columns ({key: column}) in the same order.
+    Columns are read from and written back to each results directory's cache
+    when useCache is True, so only new or modified result files are parsed.
+    Parsing is spread over `jobs` processes (default: all cores)"""
+    caches = {}
+    columnsList = []
+    misses = []
+
+    for ndx, resultProperties in enumerate(resultPropertiesObjects):
+        path = resultProperties.path
+        columns = None
+        stat = None
+
+        if useCache:
+            directory = str(path.parent)
+
+            if directory not in caches:
+                caches[directory] = ResultsCache(directory)
+
+            stat = os.stat(str(path))
+            columns = caches[directory].lookup(path.name, stat)
+
+        if columns is None:
+            misses.append((ndx, path, stat))
+
+        columnsList.append(columns)
+
+    parsed = mapChunked(parseResultFileToColumns, [path for _, path, _ in misses], jobs)
+
+    for (ndx, path, stat), columns in zip(misses, parsed):
+        columnsList[ndx] = columns
+
+        if useCache:
+            caches[str(path.parent)].store(path.name, stat, columns)
+
+    for cache in caches.values():
+        cache.save()
+
+    return columnsList
+
+def loadResultSamples(resultPropertiesObjects, useCache=True, jobs=None):
+    """Accepts a list of ResultProperties objects and returns a list of their
+    parsed samples (see parseResultFile) in the same order (see
+    loadResultColumns)"""
+    return [
+        { key: decodeColumn(column) for key, column in columns.items() }
+            for columns in loadResultColumns(resultPropertiesObjects, useCache, jobs)
+    ]
+
+def aggregateResults(resultPropertiesObjects, metrics, exact=False, useCache=True, jobs=None):
+    """Accepts a list of ResultProperties objects and returns the batched
+    aggregates of their samples (see libcruncher.aggregate.aggregateColumns)"""
+    return aggregateColumns(loadResultColumns(resultPropertiesObjects, useCache, jobs), metrics, exact=exact)
+
+def loadResultRows(resultPropertiesObjects, storeIdent, computeRows):
+    """Accepts a list of ResultProperties objects and returns the list of rows
+    computeRows (a function mapping a list of ResultProperties objects to a list
+    of per-file rows) produces for them, along with how many rows had to be
+    recomputed. Rows are kept in a sidecar store named after storeIdent in each
+    results directory so only the rows of new or modified result files are
+    ever recomputed; rows of removed result files are dropped from the store"""
+    stores = {}
+    rows = []
+    misses = []
+
+    for ndx, resultProperties in enumerate(resultPropertiesObjects):
+        path = resultProperties.path
+        directory = str(path.parent)
+
+        if directory not in stores:
+            stores[directory] = ResultsCache(directory, RESULTS_ROW_STORE_FILE_NAME.format(storeIdent))
+
+        stat = os.stat(str(path))
+        row = stores[directory].lookup(path.name, stat)
+
+        if row is None:
+            misses.append((ndx, stat))
+
+        rows.append(row)
+
+    if misses:
+        computed = computeRows([resultPropertiesObjects[ndx] for ndx, _ in misses])
+
+        for (ndx, stat), row in zip(misses, computed):
+            path = resultPropertiesObjects[ndx].path
+            rows[ndx] = row
+            stores[str(path.parent)].store(path.name, stat, row)
+
+    for store in stores.values():
+        store.save()
+
+    return rows, len(misses)
+
+def pathsToResultProperties(paths, jobs=None):
+    """Converts a list of paths into a ResultPropertiesCollection (in the same
+    order) using `jobs` processes (default: all cores). Paths are decoded a
+    batch at a time, so the full list of ResultProperties objects never exists
+    all at once"""
+    # ? Decoding a file name is much cheaper than parsing a file, so only really
+    # ? big result trees are worth spinning up a process pool for
+    chunkSize = INGEST_CHUNK_SIZE * 16
+    batchSize = chunkSize * (jobs or os.cpu_count() or 1)
+    paths = list(paths)
+    collection = ResultPropertiesCollection()
+
+    for start in range(0, len(paths), batchSize):
+        for resultProperties in mapChunked(pathToResultProperties, paths[start:start + batchSize], jobs, chunkSize=chunkSize):
+            collection.append(resultProperties)
+
+    return collection
+
+def mapChunked(fn, items, jobs=None, chunkSize=INGEST_CHUNK_SIZE):
+    """Returns [fn(item) for item in items], splitting items into chunks that
+    are handed out to a pool of `jobs` processes (default: all cores). Small
+    inputs and jobs=1 skip the pool entirely. Order is always preserved"""
+    items = list(items)
+    jobs = jobs or os.cpu_count() or 1
+
+    if jobs == 1 or len(items) <= chunkSize:
+        return [fn(item) for item in items]
+
+    chunks = [(fn, items[i:i + chunkSize]) for i in range(0, len(items), chunkSize)]
+    results = []
+
+    with ProcessPoolExecutor(max_workers=min(jobs, len(chunks))) as executor:
+        for chunkResults in executor.map(_mapChunk, chunks):
+            results.extend(chunkResults)
+
+    return results
+
+def _mapChunk(fnAndItems):
+    fn, items = fnAndItems
+    return [fn(item) for item in items]
+
 def pathToResultProperties(path):
     """Converts a path into a ResultProperties object"""
-    try:
-        filename = path.name
-        data1 = filename.split('.')
-        data2 = data1[2].split('-')
-        data3 = data2[1].split('#')
-        data4 = data2[1].split('+')
-
-        data3Len = len(data3)
-
-        # ! If modifying file name metadata (i.e. ResultProperties), edit these
-
-        cipher = DEFAULT_CIPHER_IDENT
-        flakesize = DEFAULT_FLAKESIZE
-        flakesPerNugget = DEFAULT_FPN
-        swapStrategy = DEFAULT_STRATEGY
-        swapCipher = 0
-
-        if not (1 <= data3Len <= 6):
-            raise FilenameTranslationError('encountered invalid data3 length ({})'.format(data3Len))
-
-        if len(data4) >= 2:
-            data2[1], data4 = data4
-            data3 = data2[1].split('#')
-        else:
-            data4 = 0
-
-        usingDefaultCipher = data3Len == 1 or data3[1] == 'baseline'
-
-        if not usingDefaultCipher:
-            cipher = data3[1]
-
-        if data3Len >= 3:
-            flakesize = int(data3[2])
-
-        if data3Len >= 4:
-            flakesPerNugget = int(data3[3])
-
-        if data3Len >= 5:
-            swapCipher = data3[4]
-        else:
-            swapCipher = cipher
-
-        if data3Len >= 6:
-            swapStrategy = data3[5]
-
-        props = ResultProperties(
-            path,
-            filename,
-            data1[0],
-            data1[1],
-            data2[0],
-            data2[2],
-            data3[0],
-            cipher,
-            flakesize,
-            flakesPerNugget,
-            usingDefaultCipher and data3Len != 1,
-            swapCipher,
-            swapStrategy,
-            int(data4) or 4 # 4 => 0.25 * 4 == 100% == default ratio (i.e. the entire space)
-        )
-
-    except IndexError:
-        raise FilenameTranslationError(filename)
-
-    return props
+    return ResultProperties(path, path.name, *decodeResultFilename(path.name))
 
 # ! If modifying file name metadata (i.e. ResultProperties), edit this function
+# ! (and libcruncher.filename)
 def resultPropertiesToProperName(resultProperties, hideProperties=[]):
     """Converts a ResultProperties into a string (suitable for alt/mouseover
     text)"""
@@ -131,8 +297,8 @@ def resultPropertiesToProperName(resultProperties, hideProperties=[]):
     if 'fpn' not in hideProperties:
         properName.append('fpn={} '.format(resultProperties.fpn))
 
-    cipher = '-'.join(resultProperties.cipher.split('_')[1:])
-    swapCipher = '-'.join(resultProperties.swapCipher.split('_')[1:])
+    cipher = cipherToShortName(resultProperties.cipher)
+    swapCipher = cipherToShortName(resultProperties.swapCipher)
 
     if 'cipher' not in hideProperties and 'swapCipher' not in hideProperties and cipher == swapCipher:
         properName.append('{} '.format(cipher))
@@ -149,46 +315,28 @@ def resultPropertiesToProperName(resultProperties, hideProperties=[]):
             properName.append('{}{} '.format('(swap cipher) ' if 'cipher' in hideProperties else '', swapCipher))
 
     if 'swapStrategy' not in hideProperties:
-        properName.append('{} '.format('-'.join(resultProperties.swapStrategy.split('_')[1:])))
+        properName.append('{} '.format(cipherToShortName(resultProperties.swapStrategy)))
 
     if 'iops' not in hideProperties:
         properName.append('{} '.format(resultProperties.iops))
 
-    if 'swapRatio' not in hideProperties and resultProperties.swapRatio != 4:
+    if 'swapRatio' not in hideProperties and resultProperties.swapRatio != DEFAULT_SWAP_RATIO:
         properName.append('(P{})'.format(resultProperties.swapRatio))
 
     return ''.join(properName).strip() or ''
 
 def yieldResultsSubset(resultPropertiesObjects, includeProps=None, allowPartialMatch=True):
-    """Accepts a list of ResultProperties objects and returns a subset of them
-    depending on the property=value pairs passed into includeProps"""
-
-    results = []
-    includeProps = includeProps or []
+    """Accepts a list of ResultProperties objects, a ResultPropertiesCollection,
+    or a ResultsIndex over either and returns a subset of them (of the same
+    kind) depending on the property=value and range (e.g. flakesize>=4096)
+    filters passed into includeProps"""
 
-    for resultProperties in resultPropertiesObjects:
-        include = False
+    index = resultPropertiesObjects
 
-        for prop in includeProps:
-            try:
-                propValues = str(prop.value).split(',') or []
-                actualValue = str(getattr(resultProperties, str(prop.name)))
+    if not isinstance(index, ResultsIndex):
+        index = ResultsIndex(resultPropertiesObjects)
 
-                if actualValue in propValues:
-                    include = True
-
-                    if allowPartialMatch:
-                        break
-
-                elif not allowPartialMatch:
-                    include = False
-                    break
-
-            except AttributeError:
-                raise ResultPropertyAttributeError(prop.name)
-
-        if not includeProps or include:
-            results.append(resultProperties)
+    results = index.query(includeProps, allowPartialMatch)
 
     if not results:
         raise EmptyResultsSubsetError()
@@ -202,7 +350,7 @@ def argsToExecutionProperties(argv, description=''):
         'paths',
         nargs='+',
         metavar='file|dir',
-        action=_StorePathsAsResultPropertiesAction,
+        action=_StoreResultPathsAction,
         help='one or more *.results files or directories containing such files'
     )
 
@@ -212,7 +360,7 @@ def argsToExecutionProperties(argv, description=''):
         nargs='+',
         metavar='prop=val1,val2,...',
         type=_filterGenerateTuple,
-        help='filter results by only including those that satisfy at least one property=value pair (see ResultProperties) (commas are treated as special "or" syntax)'
+        help='filter results by only including those that satisfy at least one property=value pair (see ResultProperties) (commas are treated as special "or" syntax); numeric properties also accept range filters like flakesize>=4096 (>=, <=, >, <)'
     )
 
     parser.add_argument(
@@ -236,16 +384,49 @@ def argsToExecutionProperties(argv, description=''):
         help='results will be normalized from 0 to 1'
     )
 
+    parser.add_argument(
+        '-e',
+        '--exact',
+        action='store_true',
+        help='aggregate samples as exact decimals (slow; matches the originally published numbers) instead of float64 arrays'
+    )
+
+    parser.add_argument(
+        '-j',
+        '--jobs',
+        type=int,
+        metavar='N',
+        help='number of processes used to ingest result files (default is one per core)'
+    )
+
+    parser.add_argument(
+        '-C',
+        '--no-cache',
+        action='store_true',
+        help='always re-parse result files instead of using (and updating) the per-directory results cache'
+    )
+
+    parser.add_argument(
+        '-i',
+        '--incremental',
+        action='store_true',
+        help='reuse the crunched rows of unchanged result files kept from previous runs and only recompute those of new or modified files (scripts that support it)'
+    )
+
     args = parser.parse_args(argv)
-    resultsSubset = yieldResultsSubset(args.paths, args.filter, not args.strict_filtering)
+    resultsSubset = yieldResultsSubset(pathsToResultProperties(args.paths, args.jobs), args.filter, not args.strict_filtering)
 
     execCTX = ExecutionProperties(
         resultsSubset,
-        [resultProp for resultProp in resultsSubset if resultProp.isBaseline],
+        resultsSubset.subset(ndx for ndx, isBaseline in enumerate(resultsSubset.column('isBaseline')) if isBaseline),
         args.baseline,
         args.normalize,
         args.filter,
-        args.strict_filtering
+        args.strict_filtering,
+        not args.no_cache,
+        args.exact,
+        args.jobs,
+        args.incremental
     )
 
     return execCTX
@@ -268,14 +449,14 @@ def requireSudo():
         raise SudoRequired()
 
 def _filterGenerateTuple(value):
-    match = re.match(r'^(?P<prop>[A-Za-z0-9_]+)=(?P<val>[A-Z_,\-.*\/\\#a-z0-9]*)$', str(value))
+    match = re.match(r'^(?P<prop>[A-Za-z0-9_]+)(?P<op>>=|<=|>|<|=)(?P<val>[A-Z_,\-.*\/\\#a-z0-9]*)$', str(value))
 
     if match is None:
-         raise argparse.ArgumentTypeError('"{}" has invalid syntax; expected X=Y'.format(value))
+         raise argparse.ArgumentTypeError('"{}" has invalid syntax; expected X=Y or a range like X>=Y'.format(value))
 
-    return ResultProperty(match.group('prop'), match.group('val') or '')
+    return ResultProperty(match.group('prop'), match.group('val') or '', match.group('op'))
 
-class _StorePathsAsResultPropertiesAction(argparse.Action):
+class _StoreResultPathsAction(argparse.Action):
 
     def __init__(self,
                  option_strings,
@@ -289,7 +470,7 @@ class _StorePathsAsResultPropertiesAction(argparse.Action):
                  help=None,
                  metavar=None):
 
-        super(_StorePathsAsResultPropertiesAction, self).__init__(
+        super(_StoreResultPathsAction, self).__init__(
             option_strings=option_strings,
             dest=dest,
             nargs=nargs,
@@ -303,7 +484,6 @@ class _StorePathsAsResultPropertiesAction(argparse.Action):
 
     def __call__(self, parser, namespace, values, option_string=None):
         paths = getattr(namespace, self.dest) or []
-        actual = []
 
         for value in values:
             path = Path(os.path.realpath(value))
@@ -318,11 +498,7 @@ class _StorePathsAsResultPropertiesAction(argparse.Action):
                 paths.extend(path.glob('*.results'))
 
         paths.sort()
-
-        for path in paths:
-            actual.append(pathToResultProperties(path))
-
-        setattr(namespace, self.dest, actual)
+        setattr(namespace, self.dest, paths)
 
 # pathToResultProperties(Path('/home/odroid/bd3/repos/buselfs-experiments/results/filebench.ram.1k-f2fs#baseline-strongbox.results'))
 # pathToResultProperties(Path('/home/odroid/bd3/repos/buselfs-experiments/results/filebench.ram.1k-f2fs#baseline-strongbox.results'))
@@ -12,7 +12,7 @@ def printFilter(filters, indent=2):
     retval = '['
 
     for fltr in (filters or []):
-        retval += '\n{}{}={},'.format(' ' * indent, fltr.name, fltr.value)
+        retval += '\n{}{}{}{},'.format(' ' * indent, fltr.name, fltr.operator, fltr.value)
 
     retval = '{}{}]'.format(retval.strip(','), '\n' if filters else '')
 
@@ -26,6 +26,10 @@ print('resultFiles (count):', len(execProps.resultFileProps))
 print('observeBaseline:', execProps.observeBaseline)
 print('normalizeResults:', execProps.normalize)
 print('filterStrict:', execProps.filterStrict)
+print('useCache:', execProps.useCache)
+print('exactDecimals:', execProps.exactDecimals)
+print('jobs:', execProps.jobs or 'all cores')
+print('incremental:', execProps.incremental)
 print('filterPropsList: ', end='')
 print(printFilter(execProps.filterPropsList, indent=2), '\n')
 print('first and last results:\n')
@@ -0,0 +1,163 @@
+"""
+Batched aggregation of result samples. Every sample of a metric across a whole
+result set is loaded into a single typed NumPy array and the medians, means,
+extrema, and percentiles of every file are computed in one pass. An opt-in exact
+mode computes the same statistics file by file with decimal.Decimal so published
+numbers can be checked against the fast path. NumPy is only imported once the
+fast path actually runs.
+"""
+
+import statistics
+
+from decimal import Decimal
+
+from libcruncher.cache import COLUMN_FIXED, decodeColumn
+from libcruncher.util import DEFAULT_PERCENTILES
+
+def columnToArray(column):
+    """Converts a cache column into a float64 array, going through int64 when
+    the samples are whole numbers (e.g. nanoseconds or microjoules)"""
+    import numpy as np
+
+    kind, exponent, values = column
+
+    if kind != COLUMN_FIXED:
+        return np.array([float(value) for value in values], dtype=np.float64)
+
+    coefficients = np.frombuffer(values, dtype=np.int64) if len(values) else np.empty(0, dtype=np.int64)
+
+    if exponent >= 0:
+        return coefficients.astype(np.float64) * 10 ** exponent
+
+    scale = 10 ** -exponent
+
+    if not (coefficients % scale).any():
+        return (coefficients // scale).astype(np.float64)
+
+    return coefficients / scale
+
+def _gatherMetric(columnsList, keys):
+    """Concatenates the samples of the given keys across all files, returning
+    the values and the per-file sample counts"""
+    import numpy as np
+
+    arrays = []
+    counts = np.zeros(len(columnsList), dtype=np.int64)
+
+    for ndx, columns in enumerate(columnsList):
+        for key in keys:
+            if key in columns:
+                array = columnToArray(columns[key])
+                arrays.append(array)
+                counts[ndx] += len(array)
+
+    values = np.concatenate(arrays) if arrays else np.empty(0, dtype=np.float64)
+
+    return values, counts
+
+def _aggregateFast(values, counts, percentiles):
+    import numpy as np
+
+    fileCount = len(counts)
+    segments = np.repeat(np.arange(fileCount), counts)
+    ordered = values[np.lexsort((values, segments))]
+
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1])) if fileCount else counts
+    present = counts > 0
+    safeCounts = np.maximum(counts, 1)
+
+    def pick(indices):
+        result = np.full(fileCount, np.nan)
+        result[present] = ordered[indices[present]]
+        return result
+
+    def percentile(q):
+        position = (safeCounts - 1) * (q / 100)
+        floor = np.floor(position).astype(np.int64)
+        ceil = np.ceil(position).astype(np.int64)
+        low = pick(starts + floor)
+        return low + (pick(starts + ceil) - low) * (position - floor)
+
+    sums = np.bincount(segments, weights=values, minlength=fileCount)
+
+    stats = {
+        'count': counts,
+        'median': (pick(starts + (safeCounts - 1) // 2) + pick(starts + safeCounts // 2)) / 2,
+        'mean': np.where(present, sums / safeCounts, np.nan),
+        'min': pick(starts),
+        'max': pick(starts + safeCounts - 1),
+    }
+
+    for q in percentiles:
+        stats['p{}'.format(q)] = percentile(q)
+
+    return stats
+
+def _aggregateExact(columnsList, keys, percentiles):
+    def percentile(ordered, q):
+        position = (len(ordered) - 1) * Decimal(q) / 100
+        floor = int(position)
+        ceil = min(floor + 1, len(ordered) - 1)
+        return ordered[floor] + (ordered[ceil] - ordered[floor]) * (position - floor)
+
+    stats = { name: [] for name in ['count', 'median', 'mean', 'min', 'max'] + ['p{}'.format(q) for q in percentiles] }
+
+    for columns in columnsList:
+        samples = []
+
+        for key in keys:
+            if key in columns:
+                samples.extend(decodeColumn(columns[key]))
+
+        stats['count'].append(len(samples))
+
+        if not samples:
+            for name in stats:
+                if name != 'count':
+                    stats[name].append(None)
+
+            continue
+
+        ordered = sorted(samples)
+
+        stats['median'].append(statistics.median(samples))
+        stats['mean'].append(statistics.mean(samples))
+        stats['min'].append(ordered[0])
+        stats['max'].append(ordered[-1])
+
+        for q in percentiles:
+            stats['p{}'.format(q)].append(percentile(ordered, q))
+
+    return stats
+
+def aggregateColumns(columnsList, metrics, percentiles=DEFAULT_PERCENTILES, exact=False):
+    """Aggregates the samples of every file (columnsList holds one {key: column}
+    dict per file, see libcruncher.loadResultColumns). metrics maps each output
+    name to the tuple of sample keys pooled into it (e.g. 'read_energy' =>
+    ('r_energy', 'wi_energy')). Returns {name: {stat: per-file sequence}} where
+    stat is one of count, median, mean, min, max, and pQ for each percentile Q.
+    Files without samples get NaN (None when exact=True) for everything but
+    count. Sequences are float64 arrays, or lists of Decimal when exact=True"""
+    aggregates = {}
+
+    for name, keys in metrics.items():
+        if exact:
+            aggregates[name] = _aggregateExact(columnsList, keys, percentiles)
+
+        else:
+            values, counts = _gatherMetric(columnsList, keys)
+            aggregates[name] = _aggregateFast(values, counts, percentiles)
+
+    return aggregates
+
+def derivePower(energy, duration):
+    """Returns per-file power in watts given per-file energy in microjoules and
+    duration in nanoseconds (sometimes we can't trust the power we read!). Works
+    on float64 arrays or on lists of Decimal"""
+    if isinstance(energy, list):
+        return [
+            None if e is None or d is None else (e / Decimal(1000000)) / (d / Decimal(1000000000))
+                for e, d in zip(energy, duration)
+        ]
+
+    return (energy / 1000000) / (duration / 1000000000)
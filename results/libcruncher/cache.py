@@ -0,0 +1,126 @@
+"""
+Persistent columnar cache of parsed result file samples. One cache file lives in
+each results directory and holds the samples of every result file in that
+directory, keyed by file name and invalidated by mtime + size.
+"""
+
+import os
+import pickle
+
+from array import array
+from decimal import Decimal
+
+from libcruncher.util import RESULTS_CACHE_FILE_NAME, RESULTS_CACHE_VERSION
+
+# ? Column encodings: fixed point int64 coefficients sharing one exponent (the
+# ? common case, since the experiments print every value with the same format
+# ? string) or the original decimal strings as a fallback
+COLUMN_FIXED = 'q'
+COLUMN_STRING = 's'
+
+def encodeColumn(values):
+    """Converts a list of Decimal samples into a compact cache column"""
+    exponent = None
+    coefficients = array('q')
+
+    for value in values:
+        sign, digits, exp = value.as_tuple()
+
+        if not isinstance(exp, int) or (exponent is not None and exp != exponent):
+            break
+
+        coefficient = int(''.join(str(d) for d in digits))
+
+        # ? Negative zero (and anything that won't fit into an int64) can't be
+        # ? represented losslessly as a fixed point coefficient
+        if (sign and coefficient == 0) or coefficient >= 2**63:
+            break
+
+        exponent = exp
+        coefficients.append(-coefficient if sign else coefficient)
+
+    else:
+        return (COLUMN_FIXED, exponent or 0, coefficients)
+
+    return (COLUMN_STRING, 0, tuple(str(value) for value in values))
+
+def decodeColumn(column):
+    """Converts a cache column back into a list of Decimal samples"""
+    kind, exponent, values = column
+
+    if kind == COLUMN_FIXED:
+        return [Decimal('{}E{}'.format(coefficient, exponent)) for coefficient in values]
+
+    return [Decimal(value) for value in values]
+
+class ResultsCache():
+    """On-disk cache of the parsed samples of every result file in a directory.
+    Anything else derived from a single result file (e.g. a script's crunched
+    CSV rows) can be kept in a sidecar cache with its own fileName and version"""
+
+    def __init__(self, directory, fileName=RESULTS_CACHE_FILE_NAME, version=RESULTS_CACHE_VERSION):
+        self.directory = str(directory)
+        self.path = os.path.join(self.directory, fileName)
+        self.version = version
+        self.dirty = False
+        self._entries = {}
+
+        try:
+            with open(self.path, 'rb') as file:
+                contents = pickle.load(file)
+
+            if contents.get('version') == self.version:
+                self._entries = contents['entries']
+
+        except FileNotFoundError:
+            pass
+
+        except (OSError, EOFError, pickle.UnpicklingError, AttributeError, KeyError):
+            print('WARN: ignoring unreadable results cache at {}'.format(self.path))
+
+    @staticmethod
+    def fileKey(stat):
+        """Returns the invalidation key (mtime + size) for an os.stat result"""
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def lookup(self, name, stat):
+        """Returns the cached columns for the named result file or None if
+        they're missing or stale"""
+        entry = self._entries.get(name)
+
+        if entry is None or entry[0] != ResultsCache.fileKey(stat):
+            return None
+
+        return entry[1]
+
+    def store(self, name, stat, columns):
+        """Stores the columns ({key: column}) of the named result file"""
+        self._entries[name] = (ResultsCache.fileKey(stat), columns)
+        self.dirty = True
+
+    def save(self):
+        """Atomically writes the cache back to disk, dropping entries for result
+        files that no longer exist"""
+        if not self.dirty:
+            return
+
+        present = set(os.listdir(self.directory))
+        entries = { name: entry for name, entry in self._entries.items() if name in present }
+        tmpPath = '{}.{}.tmp'.format(self.path, os.getpid())
+
+        try:
+            with open(tmpPath, 'wb') as file:
+                pickle.dump({ 'version': self.version, 'entries': entries }, file, protocol=pickle.HIGHEST_PROTOCOL)
+
+            os.replace(tmpPath, self.path)
+            self._entries = entries
+            self.dirty = False
+
+        except OSError as e:
+            print('WARN: failed to write results cache to {} ({})'.format(self.path, e))
+
+            try:
+                os.remove(tmpPath)
+
+            except OSError:
+                pass
@@ -6,6 +6,13 @@ class ResultPropertyAttributeError(AttributeError):
         self.resultPropertyName = resultPropertyName
         super().__init__(self.message)
 
+class InvalidRangeFilterError(RuntimeError):
+    def __init__(self, resultPropertyName='?', operator='>='):
+        self.message = 'invalid range filter "{}{}..." (range filters need a known operator, a numeric value, and a numeric result property)'.format(resultPropertyName, operator)
+        self.resultPropertyName = resultPropertyName
+        self.operator = operator
+        super().__init__(self.message)
+
 class EmptyResultsSubsetError(RuntimeError):
     def __init__(self):
         self.message = 'inclusion/exclusion procedure returned an empty set (bad include props?)'
@@ -17,11 +24,36 @@ class InvalidPathError(RuntimeError):
         super().__init__(self.message)
 
 class FilenameTranslationError(RuntimeError):
-    def __init__(self, filename):
+    def __init__(self, filename, position=None, expected=None):
         self.message = 'failed to translate file name "{}" to ResultProperties object'.format(filename)
+        self.filename = filename
+        self.position = position
+        self.expected = expected
+
+        if position is not None:
+            self.message += ' (expected {} at position {}: "{}" <-- HERE "{}")'.format(
+                expected or 'something else',
+                position,
+                filename[:position],
+                filename[position:]
+            )
+
         super().__init__(self.message)
 
+    def __reduce__(self):
+        return (self.__class__, (self.filename, self.position, self.expected))
+
 class SudoRequired(RuntimeError):
     def __init__(self):
         self.message = 'this script must be run as the root user / with sudo permissions'
         super().__init__(self.message)
+
+class MalformedResultFileError(RuntimeError):
+    def __init__(self, path, line):
+        self.message = 'bad data in result file "{}": "{}"'.format(path, line)
+        self.path = path
+        self.line = line
+        super().__init__(self.message)
+
+    def __reduce__(self):
+        return (self.__class__, (self.path, self.line))
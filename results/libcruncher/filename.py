@@ -0,0 +1,163 @@
+"""
+The result file name grammar, in both directions. A result file name looks like:
+
+    {order}.{medium}.{iops}-{filesystem}[#{cipher}[#{flakesize}[#{fpn}[#{swapCipher}[#{swapStrategy}]]]]][+{swapRatio}]-{backstore}.results
+
+where {cipher} may be "baseline". Decoding is memoized by file name since the
+same archive tends to be loaded over and over again.
+"""
+
+import re
+
+from functools import lru_cache
+
+from libcruncher.exception import FilenameTranslationError
+from libcruncher.util import (DEFAULT_CIPHER_IDENT,
+                              DEFAULT_FLAKESIZE,
+                              DEFAULT_FPN,
+                              DEFAULT_STRATEGY,
+                              DEFAULT_SWAP_RATIO,
+                              RESULT_FILENAME_CACHE_SIZE)
+
+# ! If modifying file name metadata (i.e. ResultProperties), edit these
+
+_WORD = re.compile(r'[^.#+\-]+')
+_NUMBER = re.compile(r'[0-9]+')
+_ANY = re.compile(r'[^.]+')
+_EXTENSION = re.compile(r'\..*')
+
+# ? The optional "#" separated configuration fields, in order
+_CONFIG_FIELDS = (
+    ('cipher', _WORD),
+    ('flakesize', _NUMBER),
+    ('fpn', _NUMBER),
+    ('swapCipher', _WORD),
+    ('swapStrategy', _WORD),
+)
+
+class _Scanner():
+    """Consumes a file name left to right, reporting the exact position of the
+    first thing that doesn't match the grammar"""
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.pos = 0
+
+    def take(self, pattern, expected):
+        match = pattern.match(self.filename, self.pos)
+
+        if match is None:
+            raise FilenameTranslationError(self.filename, self.pos, expected)
+
+        self.pos = match.end()
+        return match.group(0)
+
+    def literal(self, char):
+        if not self.filename.startswith(char, self.pos):
+            raise FilenameTranslationError(self.filename, self.pos, '"{}"'.format(char))
+
+        self.pos += 1
+
+    def peek(self, char):
+        return self.filename.startswith(char, self.pos)
+
+@lru_cache(maxsize=RESULT_FILENAME_CACHE_SIZE)
+def decodeResultFilename(filename):
+    """Decodes a result file name into a tuple of every ResultProperties field
+    after path and name (order, medium, iops, backstore, filesystem, cipher,
+    flakesize, fpn, isBaseline, swapCipher, swapStrategy, swapRatio)"""
+    scanner = _Scanner(filename)
+
+    order = scanner.take(_ANY, 'order')
+    scanner.literal('.')
+    medium = scanner.take(_ANY, 'medium')
+    scanner.literal('.')
+    iops = scanner.take(_WORD, 'iops')
+    scanner.literal('-')
+    filesystem = scanner.take(_WORD, 'filesystem')
+
+    config = {}
+
+    for field, pattern in _CONFIG_FIELDS:
+        if not scanner.peek('#'):
+            break
+
+        scanner.literal('#')
+        config[field] = scanner.take(pattern, field)
+
+    swapRatio = DEFAULT_SWAP_RATIO
+
+    if scanner.peek('+'):
+        scanner.literal('+')
+        swapRatio = int(scanner.take(_NUMBER, 'swapRatio')) or DEFAULT_SWAP_RATIO
+
+    scanner.literal('-')
+    backstore = scanner.take(_WORD, 'backstore')
+
+    # ? Anything after the backstore's "-" (e.g. the "ext4-dmc" in
+    # ? "rdext4-fuse-ext4-dmc") has never been part of the backstore name
+    while scanner.peek('-'):
+        scanner.literal('-')
+        scanner.take(_WORD, 'backstore suffix')
+
+    scanner.take(_EXTENSION, 'file extension')
+
+    usingDefaultCipher = config.get('cipher', 'baseline') == 'baseline'
+    cipher = DEFAULT_CIPHER_IDENT if usingDefaultCipher else config['cipher']
+
+    return (
+        order,
+        medium,
+        iops,
+        backstore,
+        filesystem,
+        cipher,
+        int(config.get('flakesize', DEFAULT_FLAKESIZE)),
+        int(config.get('fpn', DEFAULT_FPN)),
+        usingDefaultCipher and 'cipher' in config,
+        config.get('swapCipher', cipher),
+        config.get('swapStrategy', DEFAULT_STRATEGY),
+        swapRatio
+    )
+
+def encodeResultFilename(resultProperties):
+    """Encodes a ResultProperties object (or anything with the same fields) into
+    its canonical result file name, i.e. the shortest name that decodes back
+    into the same properties"""
+    config = [
+        'baseline' if resultProperties.isBaseline else resultProperties.cipher,
+        str(resultProperties.flakesize),
+        str(resultProperties.fpn),
+        resultProperties.swapCipher,
+        resultProperties.swapStrategy
+    ]
+
+    defaults = [
+        None,
+        str(DEFAULT_FLAKESIZE),
+        str(DEFAULT_FPN),
+        resultProperties.cipher,
+        DEFAULT_STRATEGY
+    ]
+
+    while len(config) > 1 and config[-1] == defaults[len(config) - 1]:
+        config.pop()
+
+    if config == [DEFAULT_CIPHER_IDENT] and not resultProperties.isBaseline:
+        config = []
+
+    return '{}.{}.{}-{}{}{}-{}.results'.format(
+        resultProperties.order,
+        resultProperties.medium,
+        resultProperties.iops,
+        resultProperties.filesystem,
+        ''.join('#' + part for part in config),
+        '' if resultProperties.swapRatio == DEFAULT_SWAP_RATIO else '+{}'.format(resultProperties.swapRatio),
+        resultProperties.backstore
+    )
+
+@lru_cache(maxsize=None)
+def cipherToShortName(cipher):
+    """Converts a cipher or strategy identifier like "sc_chacha20_neon" into its
+    short display name ("chacha20-neon")"""
+    return '-'.join(cipher.split('_')[1:])
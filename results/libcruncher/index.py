@@ -0,0 +1,140 @@
+"""
+In-memory inverted index over ResultProperties objects. Equality filters are
+answered with per-field posting sets and range filters on numeric fields with a
+bisect over per-field sorted values, so repeated queries never rescan the whole
+result set.
+"""
+
+from bisect import bisect_left, bisect_right
+
+from libcruncher.exception import ResultPropertyAttributeError, InvalidRangeFilterError
+from libcruncher.util import ResultProperties, ResultPropertiesCollection, FILTER_RANGE_OPERATORS
+
+class ResultsIndex():
+    """Indexes a list of ResultProperties objects (or a
+    ResultPropertiesCollection, whose interned codes and typed arrays are used
+    directly) by every field. Each field's index is built lazily the first time
+    it is queried"""
+
+    def __init__(self, resultPropertiesObjects):
+        if isinstance(resultPropertiesObjects, ResultPropertiesCollection):
+            self.resultPropertiesObjects = resultPropertiesObjects
+
+        else:
+            self.resultPropertiesObjects = list(resultPropertiesObjects)
+        self._postings = {}
+        self._sorted = {}
+
+    def __len__(self):
+        return len(self.resultPropertiesObjects)
+
+    def _fieldPostings(self, field):
+        """Returns {str(value): set of positions} for the given field"""
+        if field not in self._postings:
+            if field not in ResultProperties._fields:
+                raise ResultPropertyAttributeError(field)
+
+            postings = {}
+
+            if isinstance(self.resultPropertiesObjects, ResultPropertiesCollection):
+                for (value,), positions in self.resultPropertiesObjects.groupBy(field).items():
+                    postings.setdefault(str(value), set()).update(positions)
+
+            else:
+                for ndx, resultProperties in enumerate(self.resultPropertiesObjects):
+                    postings.setdefault(str(getattr(resultProperties, field)), set()).add(ndx)
+
+            self._postings[field] = postings
+
+        return self._postings[field]
+
+    def _fieldSorted(self, field):
+        """Returns (sorted values, positions in the same order) for the given
+        numeric field"""
+        if field not in self._sorted:
+            if field not in ResultProperties._fields:
+                raise ResultPropertyAttributeError(field)
+
+            pairs = []
+
+            if isinstance(self.resultPropertiesObjects, ResultPropertiesCollection):
+                values = self.resultPropertiesObjects.column(field)
+
+            else:
+                values = [getattr(resultProperties, field) for resultProperties in self.resultPropertiesObjects]
+
+            for ndx, value in enumerate(values):
+                if isinstance(value, bool) or not isinstance(value, (int, float)):
+                    raise InvalidRangeFilterError(field)
+
+                pairs.append((value, ndx))
+
+            pairs.sort()
+            self._sorted[field] = ([value for value, _ in pairs], [ndx for _, ndx in pairs])
+
+        return self._sorted[field]
+
+    def lookup(self, prop):
+        """Returns the set of positions of the objects satisfying a single
+        ResultProperty filter"""
+        operator = prop.operator
+
+        if operator == '=':
+            postings = self._fieldPostings(str(prop.name))
+            positions = set()
+
+            for value in str(prop.value).split(','):
+                positions |= postings.get(value, set())
+
+            return positions
+
+        if operator not in FILTER_RANGE_OPERATORS:
+            raise InvalidRangeFilterError(prop.name, operator)
+
+        try:
+            bound = float(prop.value)
+
+        except ValueError:
+            raise InvalidRangeFilterError(prop.name, operator)
+
+        values, positions = self._fieldSorted(str(prop.name))
+
+        if operator == '>=':
+            return set(positions[bisect_left(values, bound):])
+
+        if operator == '>':
+            return set(positions[bisect_right(values, bound):])
+
+        if operator == '<=':
+            return set(positions[:bisect_right(values, bound)])
+
+        return set(positions[:bisect_left(values, bound)])
+
+    def query(self, includeProps=None, allowPartialMatch=True):
+        """Returns the objects (in their original order) satisfying at least
+        one (allowPartialMatch=True) or all (allowPartialMatch=False) of the
+        ResultProperty filters in includeProps; no filters returns everything"""
+        if not includeProps:
+            return self._select(range(len(self)))
+
+        matches = None
+
+        for prop in includeProps:
+            positions = self.lookup(prop)
+
+            if matches is None:
+                matches = positions
+
+            elif allowPartialMatch:
+                matches |= positions
+
+            else:
+                matches &= positions
+
+        return self._select(sorted(matches))
+
+    def _select(self, positions):
+        if isinstance(self.resultPropertiesObjects, ResultPropertiesCollection):
+            return self.resultPropertiesObjects.subset(positions)
+
+        return [self.resultPropertiesObjects[ndx] for ndx in positions]
@@ -2,8 +2,9 @@
 
 import hashlib
 
+from array import array
+from pathlib import Path
 from collections import namedtuple
-import plotly.graph_objects as go
 
 # 0 = least secure, 3 = most secure
 SC_SECURITY_RANKING = {
@@ -30,6 +31,32 @@ DEFAULT_CIPHER_IDENT = 'sc_chacha20'
 DEFAULT_FLAKESIZE = 4096
 DEFAULT_FPN = 64
 DEFAULT_STRATEGY = 'swap_disabled'
+DEFAULT_SWAP_RATIO = 4 # 4 => 0.25 * 4 == 100% == default ratio (i.e. the entire space)
+
+# ? Number of decoded result file names to keep memoized
+RESULT_FILENAME_CACHE_SIZE = 1 << 17
+
+# ? Every sample line in a result file looks like "{prefix}_{metric}: {value}"
+# ? r/w = read/write, wo/wi = battery saver total/to-X-seconds, d = debug
+RESULT_SAMPLE_PREFIXES = ('r', 'w', 'wo', 'wi', 'd')
+
+DEFAULT_PERCENTILES = (5, 25, 75, 95)
+
+RESULTS_CACHE_FILE_NAME = '.libcruncher.cache'
+RESULTS_CACHE_VERSION = 1
+
+# ? Sidecar stores of per-file crunched rows, one per script (see loadResultRows)
+RESULTS_ROW_STORE_FILE_NAME = RESULTS_CACHE_FILE_NAME + '.rows-{}'
+
+# ? Watch mode (see libcruncher.watch): seconds between summary refreshes and
+# ? the name of the continuously refreshed CSV summary
+WATCH_POLL_INTERVAL = 1
+WATCH_SUMMARY_FILE_NAME = 'watch-summary.csv'
+
+FILTER_RANGE_OPERATORS = ('>=', '<=', '>', '<')
+
+# ? Number of result files handed to an ingestion worker process at a time
+INGEST_CHUNK_SIZE = 256
 
 COLORS_A = ['rgb(49,130,189)', 'rgb(204,204,204)', 'rgb(255,102,0)']
 COLORS_B = ['rgb(25,65,95)', 'rgb(102,102,102)', 'rgb(255,102,0)']
@@ -51,23 +78,206 @@ ResultProperties = namedtuple('ResultProperties', [
     'swapRatio'
 ])
 
-ResultProperty = namedtuple('ResultProperty', ['name', 'value'])
+# ? One sample line of a result file, e.g. "r_energy: 55" in the second trial
+# ? becomes ResultSample(1, 'r', 'energy', Decimal('55'))
+ResultSample = namedtuple('ResultSample', ['trial', 'op', 'metric', 'value'])
+
+# ? operator is "=" (value may hold comma-separated alternatives) or one of the
+# ? FILTER_RANGE_OPERATORS (value must be numeric)
+ResultProperty = namedtuple('ResultProperty', ['name', 'value', 'operator'], defaults=['='])
 ExecutionProperties = namedtuple('ExecutionProperties', [
     'resultFileProps',
     'baselineFileProps',
     'observeBaseline',
     'normalize',
     'filterPropsList',
-    'filterStrict'
+    'filterStrict',
+    'useCache',
+    'exactDecimals',
+    'jobs',
+    'incremental'
 ])
 
+# ? How each ResultProperties field is stored by ResultPropertiesCollection
+COLLECTION_CATEGORICAL_FIELDS = ('order', 'medium', 'iops', 'backstore', 'filesystem', 'cipher', 'swapCipher', 'swapStrategy')
+COLLECTION_NUMERIC_FIELDS = ('flakesize', 'fpn', 'swapRatio')
+
+# ? Interned codes are stored as unsigned ints, so each categorical field (and
+# ? the directories) can have at most this many distinct values
+COLLECTION_CODE_TYPE = 'I'
+COLLECTION_MAX_SYMBOLS = 1 << (8 * array(COLLECTION_CODE_TYPE).itemsize)
+COLLECTION_NUMBER_TYPE = 'i'
+
+def _canonicalName(resultProperties):
+    # ? Imported here since libcruncher.filename imports this module
+    from libcruncher.filename import encodeResultFilename
+
+    return encodeResultFilename(resultProperties)
+
+class ResultPropertiesCollection():
+    """Compact, array-backed list of ResultProperties objects. Categorical
+    fields (and each result's directory) are interned into small integer codes,
+    numeric fields are stored in typed arrays, and ResultProperties views are
+    only materialized on demand. File names are only stored when they aren't
+    the canonical name of their properties (see encodeResultFilename)"""
+
+    __slots__ = ('_symbols', '_symbolCodes', '_codes', '_numbers', '_baselines', '_nameBytes', '_nameOffsets')
+
+    def __init__(self, resultPropertiesObjects=()):
+        # ? One symbol table per categorical field plus one for directories
+        self._symbols = { field: [] for field in COLLECTION_CATEGORICAL_FIELDS + ('path',) }
+        self._symbolCodes = { field: {} for field in self._symbols }
+        self._codes = { field: array(COLLECTION_CODE_TYPE) for field in self._symbols }
+        self._numbers = { field: array(COLLECTION_NUMBER_TYPE) for field in COLLECTION_NUMERIC_FIELDS }
+        self._baselines = array('b')
+        # ? Non-canonical file names are packed back to back into one buffer;
+        # ? canonical ones take up no space at all
+        self._nameBytes = bytearray()
+        self._nameOffsets = array('L', [0])
+
+        for resultProperties in resultPropertiesObjects:
+            self.append(resultProperties)
+
+    def _intern(self, field, value):
+        codes = self._symbolCodes[field]
+
+        if value not in codes:
+            if len(codes) >= COLLECTION_MAX_SYMBOLS:
+                raise OverflowError('too many distinct {} values (at most {} are supported)'.format(field, COLLECTION_MAX_SYMBOLS))
+
+            codes[value] = len(self._symbols[field])
+            self._symbols[field].append(value)
+
+        return codes[value]
+
+    def append(self, resultProperties):
+        """Adds a ResultProperties object to the end of the collection"""
+        for field in COLLECTION_CATEGORICAL_FIELDS:
+            self._codes[field].append(self._intern(field, getattr(resultProperties, field)))
+
+        for field in COLLECTION_NUMERIC_FIELDS:
+            self._numbers[field].append(getattr(resultProperties, field))
+
+        self._codes['path'].append(self._intern('path', str(Path(resultProperties.path).parent)))
+        self._baselines.append(bool(resultProperties.isBaseline))
+
+        if resultProperties.name != _canonicalName(resultProperties):
+            self._nameBytes.extend(resultProperties.name.encode('utf-8'))
+
+        self._nameOffsets.append(len(self._nameBytes))
+
+    def __len__(self):
+        return len(self._nameOffsets) - 1
+
+    def __iter__(self):
+        for ndx in range(len(self)):
+            yield self[ndx]
+
+    def __getitem__(self, ndx):
+        """Materializes the ResultProperties view at the given position"""
+        if ndx < 0:
+            ndx += len(self)
+
+        name = self._nameBytes[self._nameOffsets[ndx]:self._nameOffsets[ndx + 1]].decode('utf-8')
+        values = { field: self.value(field, ndx) for field in COLLECTION_CATEGORICAL_FIELDS + COLLECTION_NUMERIC_FIELDS }
+
+        resultProperties = ResultProperties(
+            path=None,
+            name=name,
+            isBaseline=bool(self._baselines[ndx]),
+            **values
+        )
+
+        if not name:
+            name = _canonicalName(resultProperties)
+
+        return resultProperties._replace(
+            path=Path(self._symbols['path'][self._codes['path'][ndx]]) / name,
+            name=name
+        )
+
+    def value(self, field, ndx):
+        """Returns a single field of the result at the given position without
+        materializing the whole view"""
+        if field in self._codes and field != 'path':
+            return self._symbols[field][self._codes[field][ndx]]
+
+        if field in self._numbers:
+            return self._numbers[field][ndx]
+
+        if field == 'isBaseline':
+            return bool(self._baselines[ndx])
+
+        return getattr(self[ndx], field)
+
+    def column(self, field):
+        """Returns every value of a field in order (numeric fields come
+        straight from their typed arrays)"""
+        if field in self._numbers:
+            return self._numbers[field]
+
+        return [self.value(field, ndx) for ndx in range(len(self))]
+
+    def symbols(self, field):
+        """Returns the distinct values of a categorical field in code order"""
+        return list(self._symbols[field])
+
+    def subset(self, indices):
+        """Returns a new collection holding only the results at the given
+        positions (in the given order). Codes are copied over as they are, so
+        no result is materialized along the way"""
+        indices = list(indices)
+        subset = ResultPropertiesCollection()
+
+        for field in self._symbols:
+            subset._symbols[field] = list(self._symbols[field])
+            subset._symbolCodes[field] = dict(self._symbolCodes[field])
+            subset._codes[field] = array(COLLECTION_CODE_TYPE, (self._codes[field][ndx] for ndx in indices))
+
+        for field in self._numbers:
+            subset._numbers[field] = array(COLLECTION_NUMBER_TYPE, (self._numbers[field][ndx] for ndx in indices))
+
+        subset._baselines = array('b', (self._baselines[ndx] for ndx in indices))
+
+        for ndx in indices:
+            subset._nameBytes.extend(self._nameBytes[self._nameOffsets[ndx]:self._nameOffsets[ndx + 1]])
+            subset._nameOffsets.append(len(subset._nameBytes))
+
+        return subset
+
+    def groupBy(self, *fields):
+        """Groups result positions by the given fields (e.g. 'cipher',
+        'swapCipher', 'swapRatio'), returning {tuple of values: [positions]}
+        with groups in order of first appearance"""
+        columns = []
+
+        for field in fields:
+            if field in self._codes and field != 'path':
+                columns.append((self._codes[field], self._symbols[field]))
+
+            elif field in self._numbers:
+                columns.append((self._numbers[field], None))
+
+            else:
+                columns.append(([self.value(field, ndx) for ndx in range(len(self))], None))
+
+        groups = {}
+
+        for ndx in range(len(self)):
+            groups.setdefault(tuple(column[ndx] for column, _ in columns), []).append(ndx)
+
+        return {
+            tuple(column[1][code] if column[1] is not None else code for column, code in zip(columns, key)): positions
+                for key, positions in groups.items()
+        }
+
 def generateTitleFrag(filters):
     """Returns a title fragment"""
     title_frag = ''
     filters = filters or []
 
     for fltr in filters:
-        title_frag += '{}={},'.format(fltr.name, fltr.value.replace(',', '|'))
+        title_frag += '{}{}{},'.format(fltr.name, fltr.operator, fltr.value.replace(',', '|'))
 
     return title_frag.strip(',')
 
@@ -76,6 +286,10 @@ def stringToValidFilename(string):
     return string.replace('|', '!').replace(':', '!').replace('/', '').replace('\\', '')
 
 def formatAndPlotFigure(file_ident, test_ident, trace, title, filesdir, axisCount, specialAxes=None):
+    # ? Imported here since plotly (and kaleido, which write_image loads) take
+    # ? hundreds of milliseconds to import and most callers never plot
+    import plotly.graph_objects as go
+
     figure = go.Figure(data=[trace], layout=generateSharedLayout(title, axisCount, {} if specialAxes is None else specialAxes))
     filename = '{}/{}-{}-{}{}'.format(
         filesdir,
@@ -89,6 +303,8 @@ def formatAndPlotFigure(file_ident, test_ident, trace, title, filesdir, axisCoun
 
 def generateSharedLayout(title, axisCount, specialAxes):
     """Returns a shared layout object for plotly"""
+    import plotly.graph_objects as go
+
     axis = {
         'showline': True,
         'zeroline': False,
@@ -0,0 +1,277 @@
+"""
+Watch mode. Tails the result files of a results directory while the experiments
+are still appending to them and folds every completed trial block (i.e. all the
+lines up to a "---" separator) into running per-file medians. Changes are picked
+up through inotify on Linux and by polling file sizes everywhere else.
+"""
+
+import os
+import heapq
+import select
+import struct
+import ctypes
+import ctypes.util
+
+from pathlib import Path
+from decimal import Decimal
+
+from libcruncher import tokenizeResultLines
+from libcruncher.exception import MalformedResultFileError
+from libcruncher.util import WATCH_POLL_INTERVAL
+
+# ? See inotify(7)
+_IN_MODIFY = 0x00000002
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_EVENT_HEADER = struct.Struct('iIII')
+
+def _negate(value):
+    # ? Unary minus on a Decimal rounds to the context's precision; this doesn't
+    return value.copy_negate() if isinstance(value, Decimal) else -value
+
+class RunningMedian():
+    """Median of a growing stream of numbers kept in two heaps, so adding a
+    number is O(log n) and reading the median is O(1)"""
+
+    def __init__(self):
+        self._lower = [] # ? max-heap (negated) of the smaller half
+        self._upper = [] # ? min-heap of the larger half
+
+    def __len__(self):
+        return len(self._lower) + len(self._upper)
+
+    def add(self, value):
+        if self._lower and value > _negate(self._lower[0]):
+            heapq.heappush(self._upper, value)
+
+        else:
+            heapq.heappush(self._lower, _negate(value))
+
+        if len(self._lower) > len(self._upper) + 1:
+            heapq.heappush(self._upper, _negate(heapq.heappop(self._lower)))
+
+        elif len(self._upper) > len(self._lower):
+            heapq.heappush(self._lower, _negate(heapq.heappop(self._upper)))
+
+    def median(self):
+        """Returns the median (same as statistics.median) or None if empty"""
+        if not self._lower:
+            return None
+
+        if len(self._lower) > len(self._upper):
+            return _negate(self._lower[0])
+
+        return (_negate(self._lower[0]) + self._upper[0]) / 2
+
+class ResultFileTail():
+    """Follows a single result file, only ever reading the bytes appended since
+    the last update"""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.reset()
+
+    def reset(self):
+        self.offset = 0
+        self.partial = b''
+        self.block = []
+        self.medians = {}
+
+    @property
+    def trials(self):
+        """Number of trials folded in so far"""
+        return max((len(median) for median in self.medians.values()), default=0)
+
+    def update(self):
+        """Reads whatever was appended to the file, returning True if at least
+        one new trial block was completed"""
+        try:
+            size = os.stat(str(self.path)).st_size
+
+        except FileNotFoundError:
+            return False
+
+        # ? The file was truncated or replaced, so start over
+        if size < self.offset:
+            self.reset()
+
+        if size == self.offset:
+            return False
+
+        with open(str(self.path), 'rb') as file:
+            file.seek(self.offset)
+            data = self.partial + file.read()
+
+        self.offset += len(data) - len(self.partial)
+        lines = data.split(b'\n')
+        self.partial = lines.pop()
+
+        completed = False
+
+        for line in lines:
+            line = line.decode('utf-8', 'replace')
+
+            if not line.startswith('---'):
+                self.block.append(line)
+                continue
+
+            completed = self._foldBlock() or completed
+
+        return completed
+
+    def _foldBlock(self):
+        block = self.block
+        self.block = []
+
+        try:
+            samples = list(tokenizeResultLines(block, self.path))
+
+        except MalformedResultFileError as e:
+            print('WARN: skipped trial block ({})'.format(e))
+            return False
+
+        for sample in samples:
+            key = '{}_{}'.format(sample.op, sample.metric)
+
+            if key not in self.medians:
+                self.medians[key] = RunningMedian()
+
+            self.medians[key].add(sample.value)
+
+        return bool(samples)
+
+class _InotifyWaiter():
+    """Waits for inotify(7) events on a directory"""
+
+    def __init__(self, directory):
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+
+        mask = _IN_MODIFY | _IN_CLOSE_WRITE | _IN_MOVED_TO | _IN_CREATE
+
+        if libc.inotify_add_watch(self.fd, os.fsencode(str(directory)), mask) < 0:
+            errno = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(errno, 'inotify_add_watch failed on {}'.format(directory))
+
+    def wait(self, timeout):
+        """Returns the names of the files that changed within timeout seconds"""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        names = set()
+
+        if not ready:
+            return names
+
+        data = os.read(self.fd, 65536)
+        offset = 0
+
+        while offset < len(data):
+            _, _, _, length = _IN_EVENT_HEADER.unpack_from(data, offset)
+            offset += _IN_EVENT_HEADER.size
+            names.add(os.fsdecode(data[offset:offset + length].rstrip(b'\0')))
+            offset += length
+
+        return names
+
+    def close(self):
+        os.close(self.fd)
+
+class _PollingWaiter():
+    """Waits by periodically comparing the sizes and mtimes of result files"""
+
+    def __init__(self, directory):
+        self.directory = Path(directory)
+        self.keys = self._snapshot()
+
+    def _snapshot(self):
+        keys = {}
+
+        for path in self.directory.glob('*.results'):
+            try:
+                stat = os.stat(str(path))
+                keys[path.name] = (stat.st_mtime_ns, stat.st_size)
+
+            except FileNotFoundError:
+                pass
+
+        return keys
+
+    def wait(self, timeout):
+        """Returns the names of the files that changed within timeout seconds"""
+        select.select([], [], [], timeout)
+        keys = self._snapshot()
+        names = { name for name, key in keys.items() if self.keys.get(name) != key }
+        self.keys = keys
+        return names
+
+    def close(self):
+        pass
+
+class ResultsWatcher():
+    """Tails every *.results file in a directory (including ones created later)"""
+
+    def __init__(self, directory, useInotify=True):
+        self.directory = Path(directory)
+        self.tails = {}
+        self.waiter = None
+
+        if useInotify:
+            try:
+                self.waiter = _InotifyWaiter(self.directory)
+
+            except (OSError, AttributeError) as e:
+                print('WARN: inotify unavailable ({}); falling back to polling'.format(e))
+
+        if self.waiter is None:
+            self.waiter = _PollingWaiter(self.directory)
+
+    def catchUp(self):
+        """Folds in everything already written to the directory's result files,
+        returning the names of the files with completed trial blocks"""
+        return self._update(path.name for path in self.directory.glob('*.results'))
+
+    def wait(self, timeout=WATCH_POLL_INTERVAL):
+        """Waits up to timeout seconds for the experiments to write something,
+        returning the names of the files with newly completed trial blocks"""
+        return self._update(name for name in self.waiter.wait(timeout) if name.endswith('.results'))
+
+    def _update(self, names):
+        updated = []
+
+        for name in sorted(set(names)):
+            if name not in self.tails:
+                self.tails[name] = ResultFileTail(self.directory / name)
+
+            if self.tails[name].update():
+                updated.append(name)
+
+        return updated
+
+    def close(self):
+        self.waiter.close()
+
+    def writeCsv(self, path):
+        """Atomically (re)writes a CSV summary holding each file's trial count
+        and the running median of every sample key"""
+        keys = sorted({ key for tail in self.tails.values() for key in tail.medians })
+        tmpPath = '{}.{}.tmp'.format(path, os.getpid())
+
+        with open(tmpPath, 'w') as file:
+            print('name,trials,', ','.join(keys), sep='', file=file)
+
+            for name, tail in sorted(self.tails.items()):
+                if not tail.medians:
+                    continue
+
+                print('{},{}'.format(name, tail.trials), end='', file=file)
+
+                for key in keys:
+                    print(',{}'.format(tail.medians[key].median() if key in tail.medians else ''), end='', file=file)
+
+                print('', file=file)
+
+        os.replace(tmpPath, str(path))
@@ -15,13 +15,11 @@ import os
 import sys
 import hashlib
 import copy
-import inspect
-import plotly.graph_objects as go
 from pathlib import Path
 from decimal import Decimal
 from statistics import median
 
-import initrunner
+import configvars
 
 TEST_IDENT = 'StrongBox-experiments-graphed1'
 
@@ -60,7 +58,7 @@ def filenameToProperName(filename):
     return "".join("".join(filename.split('.results')[0].split('sequential.ram.')).split('random.ram.'))
 
 if __name__ == "__main__":
-    CONFIG = initrunner.parseConfigVars()
+    CONFIG = configvars.parseConfigVars()
 
     filesdir = None
     durationBaseline = None
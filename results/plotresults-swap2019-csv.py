@@ -11,9 +11,8 @@ studio.
 """
 
 import sys
-from statistics import median
 
-import initrunner
+import configvars
 import libcruncher
 
 from libcruncher.util import generateTitleFrag, stringToValidFilename, SC_SECURITY_RANKING
@@ -46,36 +45,31 @@ RESULT_DO_NOT_PRINT = [
     'sc_chacha8_neon+sc_freestyle_balanced',
 ]
 
-################################################################################
-
-if __name__ == "__main__":
-    libcruncher.requireSudo()
-
-    print('crunching metrics...')
-
-    config = initrunner.parseConfigVars()
-    execCTX = libcruncher.argsToExecutionProperties(sys.argv[1:])
-
-    # ? This is only used to come up with title fragment, so it doesn't have to
-    # ? be super accurate!
-    assumedResultsPathList = str(execCTX.resultFileProps[0].path).strip('/').split('/')
+# ? Bump this whenever crunchRows changes what it returns
+ROW_STORE_VERSION = 1
 
-    print('aggregating data ({} items after filter)...'.format(len(execCTX.resultFileProps)))
+def crunchRows(resultFileProps, execCTX):
+    """Crunches each result file into its (pre-normalization) CSV row"""
+    columnsList = libcruncher.loadResultColumns(resultFileProps, execCTX.useCache, execCTX.jobs)
+    number = libcruncher.Decimal if execCTX.exactDecimals else float
+    metrics = {}
+    rows = []
 
-    data = { 'read': {}, 'write': {}, 'security': [], 'cipher': [], 'ratio': [], 'debug': {} }
-
-    noData = { 'read': False, 'write': False, 'write_inside': False }
-
-    for op in ['read', 'write']:
-        for metric in RESULT_FILE_METRICS:
-            data[op][metric] = []
+    for metric in RESULT_FILE_METRICS:
+        # ? Battery saver to-X-seconds write metrics are treated as read metrics
+        # ? and battery saver total write metrics are treated as write metrics
+        metrics['read_' + metric] = ('r_' + metric, 'wi_' + metric)
+        metrics['write_' + metric] = ('w_' + metric, 'wo_' + metric)
 
     for debug_metric in RESULT_DEBUG_METRICS:
-        data['debug'][debug_metric] = []
+        metrics['debug_' + debug_metric] = ('d_' + debug_metric,)
+
+    aggregates = libcruncher.aggregateColumns(columnsList, metrics, percentiles=(), exact=execCTX.exactDecimals)
 
     # Loop over results and begin the aggregation/accumulation process
-    for resultProps in execCTX.resultFileProps:
+    for ndx, resultProps in enumerate(resultFileProps):
         localData = { 'read': {}, 'write': {}, 'debug': {} }
+        noData = { 'read': False, 'write': False, 'write_inside': False }
 
         rankOrder = [SC_SECURITY_RANKING[resultProps.cipher], SC_SECURITY_RANKING[resultProps.swapCipher]]
         rankOrder.sort()
@@ -83,88 +77,40 @@ if __name__ == "__main__":
         if resultProps.swapRatio <= 0 or resultProps.swapRatio > 4:
             raise ValueError('Bad resultProps.swapRatio "{}" for {}'.format(resultProps.swapRatio, resultProps.name))
 
-        data['security'].append(
-            # security ranking = c1_rank + abs(c1_rank - c2_rank) * actual_swap_ratio
-            # where c1 <= c2
-            rankOrder[0] + abs(rankOrder[0] - rankOrder[1]) * (resultProps.swapRatio * 0.25)
-        )
-
-        data['ratio'].append(0 if resultProps.swapRatio == 4 else resultProps.swapRatio)
-
-        data['cipher'].append(('{}' if resultProps.cipher == resultProps.swapCipher else '{}+{}').format(resultProps.cipher, resultProps.swapCipher))
+        # security ranking = c1_rank + abs(c1_rank - c2_rank) * actual_swap_ratio
+        # where c1 <= c2
+        localData['security'] = rankOrder[0] + abs(rankOrder[0] - rankOrder[1]) * (resultProps.swapRatio * 0.25)
+        localData['ratio'] = 0 if resultProps.swapRatio == 4 else resultProps.swapRatio
+        localData['cipher'] = ('{}' if resultProps.cipher == resultProps.swapCipher else '{}+{}').format(resultProps.cipher, resultProps.swapCipher)
 
         for metric in RESULT_FILE_METRICS:
-            localData['read'][metric] = []
-            localData['write'][metric] = []
-
-        for debug_metric in RESULT_DEBUG_METRICS:
-            localData['debug'][debug_metric] = []
+            # We're dealing with read/write (rather than battery saver) metrics...
+            if 'r_' + metric in columnsList[ndx] or 'w_' + metric in columnsList[ndx]:
+                noData['write_inside'] = True
 
-        with open(resultProps.path.absolute().as_posix(), 'r') as lines:
-            for currentLine in lines:
-                for debug_metric in RESULT_DEBUG_METRICS:
-                    # We're dealing with debug duration metrics...
-                    if currentLine.startswith('d_' + debug_metric):
-                        localData['debug'][debug_metric].append(libcruncher.lineToNumber(currentLine))
-                        break
-
-                else:
-                    for metric in RESULT_FILE_METRICS:
-                        # We're dealing with read metrics...
-                        if currentLine.startswith('r_' + metric):
-                            localData['read'][metric].append(libcruncher.lineToNumber(currentLine))
-                            noData['write_inside'] = True
-                            break
-
-                        # We're dealing with write metrics...
-                        elif currentLine.startswith('w_' + metric):
-                            localData['write'][metric].append(libcruncher.lineToNumber(currentLine))
-                            noData['write_inside'] = True
-                            break
-
-                        # We're dealing with battery saver total write metrics...
-                        if currentLine.startswith('wo_' + metric):
-                            localData['write'][metric].append(libcruncher.lineToNumber(currentLine))
-                            break
-
-                        # We're dealing with battery saver to-X-seconds write metrics...
-                        elif currentLine.startswith('wi_' + metric):
-                            localData['read'][metric].append(libcruncher.lineToNumber(currentLine))
-                            break
-
-                        # These are technically comments/blank lines and are ignored
-                        elif currentLine.startswith('---') or len(currentLine.strip()) == 0 or currentLine.startswith('mf'):
-                            break
-                    else:
-                        raise ValueError('Bad data at read/write distinction: "{}"'.format(currentLine.strip()))
-
-        for metric in RESULT_FILE_METRICS:
             for op in ['read', 'write']:
-                if len(localData[op][metric]) == 0:
-                    localData[op][metric] = 1
+                if aggregates[op + '_' + metric]['count'][ndx] == 0:
+                    localData[op][metric] = number(1)
                     noData[op] = True
 
                 else:
-                    localData[op][metric] = median(localData[op][metric])
+                    localData[op][metric] = aggregates[op + '_' + metric]['median'][ndx]
 
         for debug_metric in RESULT_DEBUG_METRICS:
-            if len(localData['debug'][debug_metric]) == 0:
-                localData['debug'][debug_metric] = 0
+            if aggregates['debug_' + debug_metric]['count'][ndx] == 0:
+                localData['debug'][debug_metric] = number(0)
 
             else:
-                localData['debug'][debug_metric] = median(localData['debug'][debug_metric])
+                localData['debug'][debug_metric] = aggregates['debug_' + debug_metric]['median'][ndx]
 
-        if noData['read'] and noData['write']:
-            raise ValueError('No read or write data was collected (empty or malformed resultsets?)')
-
-        localData['read'][RESULT_FILE_METRICS[0]] /= libcruncher.Decimal(1000000)
-        localData['read'][RESULT_FILE_METRICS[2]] /= libcruncher.Decimal(1000000000)
+        localData['read'][RESULT_FILE_METRICS[0]] /= number(1000000)
+        localData['read'][RESULT_FILE_METRICS[2]] /= number(1000000000)
 
-        localData['write'][RESULT_FILE_METRICS[0]] /= libcruncher.Decimal(1000000)
-        localData['write'][RESULT_FILE_METRICS[2]] /= libcruncher.Decimal(1000000000)
+        localData['write'][RESULT_FILE_METRICS[0]] /= number(1000000)
+        localData['write'][RESULT_FILE_METRICS[2]] /= number(1000000000)
 
         for debug_metric in RESULT_DEBUG_METRICS:
-            localData['debug'][debug_metric] /= libcruncher.Decimal(1000000000)
+            localData['debug'][debug_metric] /= number(1000000000)
 
         # Sometimes we can't trust the power we read!
         localData['read'][RESULT_FILE_METRICS[1]] = (
@@ -175,6 +121,61 @@ if __name__ == "__main__":
             localData['write'][RESULT_FILE_METRICS[0]] / localData['write'][RESULT_FILE_METRICS[2]]
         )
 
+        localData['noData'] = noData
+        rows.append(localData)
+
+    return rows
+
+################################################################################
+
+if __name__ == "__main__":
+    libcruncher.requireSudo()
+
+    print('crunching metrics...')
+
+    config = configvars.parseConfigVars()
+    execCTX = libcruncher.argsToExecutionProperties(sys.argv[1:])
+
+    # ? This is only used to come up with title fragment, so it doesn't have to
+    # ? be super accurate!
+    assumedResultsPathList = str(execCTX.resultFileProps[0].path).strip('/').split('/')
+
+    print('aggregating data ({} items after filter)...'.format(len(execCTX.resultFileProps)))
+
+    data = { 'read': {}, 'write': {}, 'security': [], 'cipher': [], 'ratio': [], 'debug': {} }
+
+    noData = { 'read': False, 'write': False, 'write_inside': False }
+
+    for op in ['read', 'write']:
+        for metric in RESULT_FILE_METRICS:
+            data[op][metric] = []
+
+    for debug_metric in RESULT_DEBUG_METRICS:
+        data['debug'][debug_metric] = []
+
+    if execCTX.incremental:
+        rows, recrunched = libcruncher.loadResultRows(
+            execCTX.resultFileProps,
+            '{}-v{}{}'.format(TEST_IDENT, ROW_STORE_VERSION, '-exact' if execCTX.exactDecimals else ''),
+            lambda resultFileProps: crunchRows(resultFileProps, execCTX)
+        )
+
+        print('recrunched {} of {} rows (new or modified result files)'.format(recrunched, len(rows)))
+
+    else:
+        rows = crunchRows(execCTX.resultFileProps, execCTX)
+
+    for localData in rows:
+        for key in noData:
+            noData[key] = noData[key] or localData['noData'][key]
+
+        if noData['read'] and noData['write']:
+            raise ValueError('No read or write data was collected (empty or malformed resultsets?)')
+
+        data['security'].append(localData['security'])
+        data['ratio'].append(localData['ratio'])
+        data['cipher'].append(localData['cipher'])
+
         for op in ['read', 'write']:
             for metric in RESULT_FILE_METRICS:
                 data[op][metric].append(localData[op][metric])
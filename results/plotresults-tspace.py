@@ -12,10 +12,9 @@ use, security vs power, and security vs performance.
 
 import sys
 
-from statistics import median
 import plotly.graph_objects as go
 
-import initrunner
+import configvars
 import libcruncher
 
 from libcruncher.util import generateTitleFrag, stringToValidFilename, formatAndPlotFigure, SC_SECURITY_RANKING
@@ -121,7 +120,7 @@ if __name__ == "__main__":
 
     print('crunching metrics...')
 
-    config = initrunner.parseConfigVars()
+    config = configvars.parseConfigVars()
     execCTX = libcruncher.argsToExecutionProperties(sys.argv[1:])
     # ? This is only used to come up with title fragment, so it doesn't have to
     # ? be super accurate!
@@ -146,8 +145,22 @@ if __name__ == "__main__":
         data[op][PLOT_AXES[4]] = []
         data[op][PLOT_AXES[5]] = []
 
+    metrics = {}
+
+    for metric in RESULT_FILE_METRICS:
+        metrics['read_' + metric] = ('r_' + metric,)
+        metrics['write_' + metric] = ('w_' + metric,)
+
+    aggregates = libcruncher.aggregateResults(
+        execCTX.resultFileProps,
+        metrics,
+        exact=execCTX.exactDecimals,
+        useCache=execCTX.useCache,
+        jobs=execCTX.jobs
+    )
+
     # Loop over results and begin the aggregation/accumulation process
-    for resultProps in execCTX.resultFileProps:
+    for ndx, resultProps in enumerate(execCTX.resultFileProps):
         localData = { 'read': {}, 'write': {} }
 
         if resultProps.iops not in classmap:
@@ -159,42 +172,19 @@ if __name__ == "__main__":
         data['idents'].append(libcruncher.resultPropertiesToProperName(resultProps))
 
         for metric in RESULT_FILE_METRICS:
-            localData['read'][metric] = []
-            localData['write'][metric] = []
-
-        with open(resultProps.path.absolute().as_posix(), 'r') as lines:
-            for currentLine in lines:
-                for metric in RESULT_FILE_METRICS:
-                    # We're dealing with read metrics...
-                    if currentLine.startswith('r_' + metric):
-                        localData['read'][metric].append(libcruncher.lineToNumber(currentLine))
-                        break
-
-                    # We're dealing with write metrics...
-                    elif currentLine.startswith('w_' + metric):
-                        localData['write'][metric].append(libcruncher.lineToNumber(currentLine))
-                        break
-
-                    # These are technically comments/blank lines and are ignored
-                    elif currentLine.startswith('---') or len(currentLine.strip()) == 0 or currentLine.startswith('mf'):
-                        break
-                else:
-                    raise 'Bad data at read/write distinction: "{}"'.format(currentLine)
-
-        for metric in RESULT_FILE_METRICS:
-            if len(localData['read'][metric]) == 0:
+            if aggregates['read_' + metric]['count'][ndx] == 0:
                 localData['read'][metric] = 1
                 noReadData = True
 
             else:
-                localData['read'][metric] = median(localData['read'][metric])
+                localData['read'][metric] = aggregates['read_' + metric]['median'][ndx]
 
-            if len(localData['write'][metric]) == 0:
+            if aggregates['write_' + metric]['count'][ndx] == 0:
                 localData['write'][metric] = 1
                 noWriteData = True
 
             else:
-                localData['write'][metric] = median(localData['write'][metric])
+                localData['write'][metric] = aggregates['write_' + metric]['median'][ndx]
 
         if noReadData and noWriteData:
             raise 'No read or write data was collected (empty or malformed resultsets?)'
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+This script watches a results directory while a testrunner is still filling it.
+Every time an experiment finishes a trial block in one of the `*.results` files,
+that file's running medians are updated, a one line summary is printed, and a
+CSV summary of every file in the directory is rewritten. Bad configurations can
+then be spotted mid-campaign instead of hours later. Ctrl+C to stop.
+"""
+
+import os
+import sys
+import argparse
+
+import libcruncher
+
+from libcruncher.watch import ResultsWatcher
+from libcruncher.util import WATCH_POLL_INTERVAL, WATCH_SUMMARY_FILE_NAME
+
+# Running medians of these sample keys are printed with each summary line
+SUMMARY_KEYS = ('r_energy', 'r_duration', 'w_energy', 'w_duration', 'wo_energy', 'wi_energy')
+
+################################################################################
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='live-crunch *.results files as they are written')
+
+    parser.add_argument(
+        'directory',
+        nargs='?',
+        default=os.path.dirname(os.path.realpath(__file__)),
+        help='the results directory to watch (default is the directory holding this script)'
+    )
+
+    parser.add_argument(
+        '-o',
+        '--csv',
+        metavar='file',
+        help='where the CSV summary is written (default is {} in the watched directory)'.format(WATCH_SUMMARY_FILE_NAME)
+    )
+
+    parser.add_argument(
+        '-t',
+        '--interval',
+        type=float,
+        default=WATCH_POLL_INTERVAL,
+        metavar='seconds',
+        help='how long to wait for writes between summary refreshes (default is {})'.format(WATCH_POLL_INTERVAL)
+    )
+
+    parser.add_argument(
+        '-p',
+        '--poll',
+        action='store_true',
+        help='poll file sizes instead of using inotify (e.g. for network file systems)'
+    )
+
+    args = parser.parse_args(sys.argv[1:])
+    csvPath = args.csv or os.path.join(args.directory, WATCH_SUMMARY_FILE_NAME)
+
+    if not os.path.isdir(args.directory):
+        raise libcruncher.InvalidPathError(args.directory)
+
+    watcher = ResultsWatcher(args.directory, not args.poll)
+
+    print('watching {} (summary: {})...'.format(args.directory, csvPath))
+
+    try:
+        updated = watcher.catchUp()
+
+        while True:
+            for name in updated:
+                tail = watcher.tails[name]
+                medians = ['{}={}'.format(key, tail.medians[key].median()) for key in SUMMARY_KEYS if key in tail.medians]
+                print('{} ({} trials): {}'.format(name, tail.trials, ', '.join(medians)))
+
+            if updated:
+                watcher.writeCsv(csvPath)
+
+            updated = watcher.wait(args.interval)
+
+    except KeyboardInterrupt:
+        print('\nstopped watching')
+
+    finally:
+        watcher.close()
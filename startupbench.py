@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+
+"""Measures how long the command line tools (testrunner helpers, plotters,
+libcruncher) take to import, each in a fresh interpreter, and checks that none
+of them loads a heavy dependency it doesn't need at startup. Exits non-zero
+when one does (or, given --budget, when one takes too long) so startup time
+can't quietly creep back up"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+import subprocess
+
+REPO_PATH = os.path.dirname(os.path.realpath(__file__))
+
+# ? Optional dependencies that cost tens to hundreds of milliseconds to import
+HEAVY_MODULES = ('plotly', 'kaleido', 'numpy', 'tqdm', 'pexpect')
+
+# ? (directory, module or script to import from it, heavy modules it may load);
+# ? scripts are imported without running their __main__ blocks
+TARGETS = [
+    ('experiments', 'configvars', ()),
+    ('experiments', 'initgraph', ()),
+    ('experiments', 'initrunner', ()),
+    ('experiments', 'librunner', ()),
+    ('experiments', 'librunner.matrix', ()),
+    ('experiments', 'tracereport.py', ()),
+    ('results', 'libcruncher', ()),
+    ('results', 'watchresults.py', ()),
+    ('results', 'plotresults-swap2019-csv.py', ()),
+    ('results', 'plotresults-asplos17.py', ()),
+    ('results', 'plotresults-tspace.py', ('plotly',)),
+]
+
+def importCode(target):
+    """Returns the code importing target and then printing which of
+       HEAVY_MODULES were loaded (as JSON)
+    """
+
+    if target.endswith('.py'):
+        code = 'import runpy; runpy.run_path({!r}, run_name="startupbench")'.format(target)
+
+    else:
+        code = 'import {}'.format(target)
+
+    return '{}\nimport sys, json; print(json.dumps(sorted(m for m in {!r} if m in sys.modules)))'.format(code, HEAVY_MODULES)
+
+def timeImport(directory, code, runs):
+    """Runs code in runs fresh interpreters (with directory as the working
+       directory and, like experiments/, on the path since the plotters read
+       the config through configvars) and returns the wall times in
+       milliseconds along with the last run's output
+    """
+
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(
+        path for path in (directory, '{}/experiments'.format(REPO_PATH), env.get('PYTHONPATH')) if path
+    )
+
+    times = []
+    output = None
+
+    for _ in range(runs):
+        start = time.perf_counter()
+        proc = subprocess.run([sys.executable, '-c', code], cwd=directory, env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        times.append((time.perf_counter() - start) * 1000)
+
+        if proc.returncode != 0:
+            raise RuntimeError(proc.stderr.decode('utf-8', 'replace').strip().split('\n')[-1])
+
+        output = proc.stdout.decode('utf-8')
+
+    return times, output
+
+################################################################################
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='measure the import time of the command line tools in fresh interpreters')
+
+    parser.add_argument('-n', '--runs', type=int, default=10, metavar='n', help='interpreters to start per target (default: 10)')
+
+    parser.add_argument(
+        '-b',
+        '--budget',
+        type=float,
+        metavar='ms',
+        help='fail if a median import (minus bare interpreter startup) takes longer than this'
+    )
+
+    parser.add_argument('-m', '--match', metavar='substring', help='only measure targets containing this substring')
+
+    args = parser.parse_args(sys.argv[1:])
+    failures = []
+
+    bare, _ = timeImport(REPO_PATH, 'pass', args.runs)
+    bare = statistics.median(bare)
+
+    print('bare interpreter startup: {:.1f}ms (subtracted below)'.format(bare))
+    print()
+    print('{:<42}  {:>10}  {:>10}  {}'.format('target', 'median', 'min', 'heavy modules loaded'))
+
+    for directory, target, allowed in TARGETS:
+        label = '{}/{}'.format(directory, target)
+
+        if args.match and args.match not in label:
+            continue
+
+        try:
+            times, output = timeImport('{}/{}'.format(REPO_PATH, directory), importCode(target), args.runs)
+
+        except RuntimeError as e:
+            print('{:<42}  failed to import ({})'.format(label, e))
+            failures.append('{} failed to import'.format(label))
+            continue
+
+        loaded = json.loads(output.strip().split('\n')[-1])
+        median = statistics.median(times) - bare
+
+        print('{:<42}  {:>8.1f}ms  {:>8.1f}ms  {}'.format(label, median, min(times) - bare, ', '.join(loaded) or '-'))
+
+        unexpected = [module for module in loaded if module not in allowed]
+
+        if unexpected:
+            failures.append('{} loads {} at startup'.format(label, ', '.join(unexpected)))
+
+        if args.budget is not None and median > args.budget:
+            failures.append('{} takes {:.1f}ms to import (budget: {:.1f}ms)'.format(label, median, args.budget))
+
+    if failures:
+        print('\n'.join(['', 'FAILED:'] + failures))
+        sys.exit(1)